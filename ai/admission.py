@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Admission Control
+Bounds how many /chat pipelines run at once, queues the overflow by priority
+(FIFO within a priority), rejects fast with a Retry-After hint once the queue
+is full, and caps concurrent Ollama generations per model
+"""
+
+import math
+import time
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional, Tuple
+
+from pipeline_metrics import metrics
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_DEFAULT = 1
+PRIORITY_BATCH = 2
+
+
+def client_priority(requested: int) -> int:
+    """Priority a client may ask for: default or batch; interactive is reserved for the server"""
+    return min(max(int(requested), PRIORITY_DEFAULT), PRIORITY_BATCH)
+
+
+class AdmissionRejected(Exception):
+    """Raised instead of queueing; status_code is 429 (queue full) or 503 (waited too long)"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """At most max_active pipelines run; up to max_queue more wait, best priority first"""
+
+    def __init__(self, max_active: int = 4, max_queue: int = 32, queue_timeout: float = 30.0):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self.sequence = itertools.count()
+        self.service_seconds = 10.0  # EWMA of admitted request duration, seeds Retry-After
+
+    def queued(self) -> int:
+        return sum(1 for _, _, future in self.waiters if not future.done())
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should have drained"""
+        backlog = self.queued() + 1
+        return max(1, math.ceil(self.service_seconds * backlog / max(self.max_active, 1)))
+
+    def check(self):
+        """Non-blocking pre-check so callers that cannot send a status later can still reject up front"""
+        if self.active >= self.max_active and self.queued() >= self.max_queue:
+            self._reject(429, "queue_full")
+
+    async def acquire(self, priority: int = PRIORITY_DEFAULT) -> float:
+        """Wait for a pipeline slot; returns the time spent queued"""
+        started = time.perf_counter()
+        if self.active < self.max_active and not self.queued():
+            self.active += 1
+            self._observe_wait(0.0, priority)
+            return 0.0
+
+        if self.queued() >= self.max_queue:
+            self._reject(429, "queue_full")
+
+        if len(self.waiters) > 2 * self.max_queue:
+            # Drop entries left behind by waiters that timed out or disconnected
+            self.waiters = [waiter for waiter in self.waiters if not waiter[2].done()]
+            heapq.heapify(self.waiters)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.waiters, (priority, next(self.sequence), future))
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                self.release()  # slot was handed over just as we gave up
+            future.cancel()
+            self._reject(503, "queue_timeout")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            future.cancel()
+            raise
+        waited = time.perf_counter() - started
+        self._observe_wait(waited, priority)
+        return waited
+
+    def release(self, service_seconds: Optional[float] = None):
+        """Free a slot, handing it straight to the best waiter so arrivals cannot jump the queue"""
+        if service_seconds is not None:
+            self.service_seconds = 0.8 * self.service_seconds + 0.2 * service_seconds
+        while self.waiters:
+            _, _, future = heapq.heappop(self.waiters)
+            if not future.done():
+                future.set_result(True)  # active count carries over to the waiter
+                return
+        self.active = max(self.active - 1, 0)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_DEFAULT):
+        await self.acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def _observe_wait(self, seconds: float, priority: int):
+        metrics.observe("admission_queue_seconds", seconds, "Time /chat requests wait for a pipeline slot",
+                        priority=str(priority))
+
+    def _reject(self, status_code: int, reason: str):
+        metrics.inc("admission_rejected_total", help_text="Requests turned away by admission control", reason=reason)
+        raise AdmissionRejected(status_code, reason, self.retry_after())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "max_active": self.max_active,
+            "queued": self.queued(),
+            "max_queue": self.max_queue,
+            "retry_after_seconds": self.retry_after()
+        }
+
+
+class ModelConcurrency:
+    """One semaphore per Ollama model, so a slow or cold model cannot take every generation slot"""
+
+    def __init__(self, default_limit: int = 2, overrides: Optional[Dict[str, int]] = None):
+        self.default_limit = default_limit
+        self.overrides = overrides or {}
+        self.semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.waiting: Dict[str, int] = {}
+        self.in_use: Dict[str, int] = {}
+
+    @staticmethod
+    def parse_overrides(spec: str) -> Dict[str, int]:
+        """'mistral:7b=1,llama3.1:8b=3' -> {model: limit}; model names contain ':' so split on the last '='"""
+        overrides = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            model, _, limit = item.rpartition("=")
+            if model and limit.isdigit():
+                overrides[model] = int(limit)
+        return overrides
+
+    def limit(self, model: str) -> int:
+        return self.overrides.get(model, self.default_limit)
+
+    @asynccontextmanager
+    async def slot(self, model: str):
+        semaphore = self.semaphores.get(model)
+        if semaphore is None:
+            semaphore = self.semaphores[model] = asyncio.Semaphore(self.limit(model))
+        started = time.perf_counter()
+        self.waiting[model] = self.waiting.get(model, 0) + 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting[model] -= 1
+        metrics.observe("ollama_queue_seconds", time.perf_counter() - started,
+                        "Time generations wait for a per-model slot", model=model)
+        self.in_use[model] = self.in_use.get(model, 0) + 1
+        try:
+            yield
+        finally:
+            self.in_use[model] -= 1
+            semaphore.release()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            model: {
+                "limit": self.limit(model),
+                "in_use": self.in_use.get(model, 0),
+                "waiting": self.waiting.get(model, 0)
+            }
+            for model in self.semaphores
+        }
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Agent Quorum
+Lets the judge start before the slowest agent: wait until a quorum of agents
+gave a usable answer or the latency budget runs out, then cancel and collect
+the stragglers so their models are free for the judge
+"""
+
+import asyncio
+from typing import List, Set
+
+
+async def wait_for_quorum(tasks: List[asyncio.Task], quorum: int, latency_budget: float) -> Set[asyncio.Task]:
+    """Wait until quorum tasks returned a response with confidence > 0 (every task when quorum <= 0) or
+    latency_budget seconds passed (no limit when <= 0); returns the tasks still running"""
+    pending = set(tasks)
+    quorum = min(quorum, len(tasks)) if quorum > 0 else len(tasks)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + latency_budget if latency_budget > 0 else None
+    answered = 0
+
+    while pending:
+        timeout = None if deadline is None else max(deadline - loop.time(), 0)
+        done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        # Fallback responses (timeouts, errors) finish the task but do not count towards the quorum
+        answered += sum(
+            1 for task in done
+            if not task.cancelled() and task.exception() is None and task.result().confidence > 0
+        )
+        if answered >= quorum:
+            break
+        if deadline is not None and loop.time() >= deadline:
+            if answered:
+                break
+            # Budget spent with nothing usable yet: take the first real answer
+            deadline, quorum = None, 1
+    return pending
+
+
+async def cancel_stragglers(pending: Set[asyncio.Task]):
+    """Cancel the tasks left after the quorum and wait for them to unwind"""
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
@@ -6,25 +6,40 @@ No API keys required - 100% local processing
 """
 
 import os
+import re
 import json
+import time
+import hashlib
 import asyncio
+import threading
 import logging
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple, Callable
+from dataclasses import dataclass, field
 
 import torch
 import numpy as np
-from transformers import pipeline
-from sentence_transformers import SentenceTransformer
-import chromadb
-from chromadb.config import Settings
-import ollama
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 import uvicorn
 
+from embedding_cache import EmbeddingCache
+from memory_ids import MemoryIdGenerator
+from response_cache import SemanticResponseCache, CachedResponse
+from pipeline_metrics import metrics, current_request
+from retrieval import ChunkSelector, RetrievedChunk, distance_to_similarity, format_chunks, estimate_tokens, truncate_to_tokens
+from vector_store import create_vector_client
+from router import MessageRouter, RouteDecision
+import prompts
+from ollama_scheduler import OllamaScheduler
+from token_budget import TokenBudget, TEMPLATE_TOKENS, context_window, ollama_keep_alive
+from agent_quorum import wait_for_quorum, cancel_stragglers
+from admission import AdmissionController, AdmissionRejected, ModelConcurrency, client_priority, PRIORITY_DEFAULT, PRIORITY_BATCH
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -43,6 +58,7 @@ class ChatRequest(BaseModel):
     message: str
     user_id: str = "anonymous"
     context: Dict[str, Any] = {}
+    priority: int = PRIORITY_DEFAULT  # 1 = default, 2 = batch; clamped with client_priority()
 
 class AgentResponse(BaseModel):
     agent: str
@@ -58,74 +74,891 @@ class AIAgent:
     specialty: str
     system_prompt: str
 
+    @property
+    def system(self) -> str:
+        """The system prompt with source indentation stripped - the stable prefix Ollama keeps cached"""
+        return " ".join(line.strip() for line in self.system_prompt.splitlines() if line.strip())
+
+@dataclass
+class ComponentState:
+    name: str
+    status: str = "pending"  # pending -> loading -> ready | failed
+    detail: Optional[str] = None
+    load_seconds: Optional[float] = None
+    ready: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+class NLPInferenceWorker:
+    """Micro-batches sentiment/emotion inference for concurrent requests on a dedicated thread"""
+    
+    def __init__(self, sentiment_pipeline, emotion_pipeline, batch_window_ms: float = 5.0, max_batch_size: int = 32):
+        self.sentiment_pipeline = sentiment_pipeline
+        self.emotion_pipeline = emotion_pipeline
+        self.batch_window = batch_window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nlp-inference")
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker_task: Optional[asyncio.Task] = None
+        
+    def start(self):
+        """Start the batching loop on the running event loop (idempotent)"""
+        if self.worker_task is None or self.worker_task.done():
+            self.queue = asyncio.Queue()
+            self.worker_task = asyncio.create_task(self._run(), name="nlp-inference-worker")
+            
+    async def close(self):
+        """Stop the batching loop and release the inference thread"""
+        if self.worker_task is not None:
+            self.worker_task.cancel()
+            try:
+                await self.worker_task
+            except asyncio.CancelledError:
+                pass
+            self.worker_task = None
+        self.executor.shutdown(wait=False)
+        
+    async def analyze(self, message: str) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Return (sentiment, emotion) for one message; None where a pipeline is unavailable"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((message, future))
+        sentiment, emotion, timings = await future
+        
+        record = current_request.get()
+        if record is not None:
+            for stage, seconds in timings.items():
+                record.add_timing(stage, seconds)
+        return sentiment, emotion
+        
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            
+            # Collect everything that arrives within the batch window
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+                    
+            batch = [(message, future) for message, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+                
+            try:
+                sentiments, emotions, timings = await loop.run_in_executor(
+                    self.executor, self._infer, [message for message, _ in batch]
+                )
+                metrics.inc("nlp_batches_total", help_text="Batched sentiment/emotion forward passes")
+                metrics.inc("nlp_batched_messages_total", len(batch), "Messages classified in batches")
+                for (_, future), sentiment, emotion in zip(batch, sentiments, emotions):
+                    if not future.done():
+                        future.set_result((sentiment, emotion, timings))
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                        
+    def _infer(self, messages: List[str]) -> Tuple[List[Optional[Dict[str, Any]]], List[Optional[Dict[str, Any]]], Dict[str, float]]:
+        """One batched forward pass per pipeline (runs on the inference thread)"""
+        timings: Dict[str, float] = {}
+        return (
+            self._classify(self.sentiment_pipeline, messages, "sentiment", timings),
+            self._classify(self.emotion_pipeline, messages, "emotion", timings),
+            timings
+        )
+        
+    def _classify(self, nlp_pipeline, messages: List[str], name: str, timings: Dict[str, float]) -> List[Optional[Dict[str, Any]]]:
+        if nlp_pipeline is None:
+            return [None] * len(messages)
+        started = time.perf_counter()
+        try:
+            return nlp_pipeline(messages, batch_size=len(messages), truncation=True)
+        except Exception as e:
+            logger.error(f"Error running batched {name} inference: {e}")
+            return [None] * len(messages)
+        finally:
+            timings[name] = time.perf_counter() - started
+            metrics.observe("stage_latency_seconds", timings[name], stage=name)
+
+@dataclass
+class MemoryTurn:
+    memory_id: str
+    user_id: str
+    document: str
+    metadata: Dict[str, Any]
+
+class MemoryWriter:
+    """Write-behind queue that batch-encodes conversation turns and commits them in bulk"""
+    
+    def __init__(self, brain: "MsJarvisAIBrain", max_queue: int = 1000, batch_size: int = 64,
+                 flush_interval_ms: float = 250.0, enqueue_timeout: float = 2.0):
+        self.brain = brain
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.enqueue_timeout = enqueue_timeout
+        self.queue: Optional[asyncio.Queue] = None
+        self.worker_task: Optional[asyncio.Task] = None
+        self.closing = False
+        
+    def start(self):
+        """Start the writer loop on the running event loop (idempotent)"""
+        if self.worker_task is None or self.worker_task.done():
+            self.queue = asyncio.Queue(maxsize=self.max_queue)
+            self.worker_task = asyncio.create_task(self._run(), name="memory-writer")
+            
+    def depth(self) -> int:
+        return self.queue.qsize() if self.queue is not None else 0
+            
+    async def enqueue(self, turn: MemoryTurn) -> bool:
+        """Queue a turn; waits for space when the queue is full (backpressure), drops after the timeout"""
+        if self.closing:
+            logger.warning(f"Memory writer shutting down - turn for user {turn.user_id} not stored")
+            return False
+        self.start()
+        try:
+            await asyncio.wait_for(self.queue.put(turn), timeout=self.enqueue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            metrics.inc("memory_turns_dropped_total", help_text="Turns dropped because the memory queue stayed full")
+            logger.warning(f"Memory queue full - turn for user {turn.user_id} dropped")
+            return False
+            
+    async def close(self, timeout: float = 30.0):
+        """Stop accepting turns and flush everything already queued"""
+        self.closing = True
+        if self.worker_task is None:
+            return
+        await self.queue.put(None)  # sentinel: drain then exit
+        try:
+            await asyncio.wait_for(self.worker_task, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"Memory writer flush timed out with {self.depth()} turns queued")
+            self.worker_task.cancel()
+        self.worker_task = None
+        
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            turn = await self.queue.get()
+            if turn is None:
+                break
+            batch = [turn]
+            
+            # Gather whatever else arrives within the flush interval
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                if not self.queue.empty():
+                    turn = self.queue.get_nowait()
+                else:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        turn = await asyncio.wait_for(self.queue.get(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                if turn is None:
+                    stopping = True
+                    break
+                batch.append(turn)
+                
+            await self._commit(batch)
+            
+        # Drain anything left behind the sentinel
+        leftovers = []
+        while not self.queue.empty():
+            turn = self.queue.get_nowait()
+            if turn is not None:
+                leftovers.append(turn)
+        for start in range(0, len(leftovers), self.batch_size):
+            await self._commit(leftovers[start:start + self.batch_size])
+            
+    async def _commit(self, batch: List[MemoryTurn]):
+        try:
+            with metrics.stage("memory_commit"):
+                try:
+                    embeddings = await self.brain.encode_texts([turn.document for turn in batch])
+                except Exception as e:
+                    logger.error(f"Error embedding memory batch: {e}")
+                    embeddings = np.zeros((len(batch), 384), dtype=np.float32)  # Fallback embedding
+                    
+                if not await self.brain.wait_for_component("vector_memory"):
+                    logger.warning(f"Vector memory not ready - {len(batch)} memories not stored")
+                    return
+                    
+                await self._store(batch, embeddings)
+                metrics.inc("memory_turns_stored_total", len(batch), "Conversation turns committed to vector memory")
+                logger.info(f"💾 {len(batch)} memories stored for {len({turn.user_id for turn in batch})} users")
+                
+        except Exception as e:
+            logger.error(f"Error storing memory batch: {e}")
+            
+    async def _store(self, batch: List[MemoryTurn], embeddings: np.ndarray):
+        """One upsert per memory partition touched by the batch"""
+        partitions: Dict[str, List[int]] = {}
+        for i, turn in enumerate(batch):
+            partitions.setdefault(turn.user_id, []).append(i)
+        for user_id, rows in partitions.items():
+            collection = await self.brain.memory_collection(user_id)
+            await self._add(collection, [batch[i] for i in rows], embeddings[rows])
+        self.brain.memory_manager.mark_dirty(partitions)
+            
+    async def _add(self, collection, batch: List[MemoryTurn], embeddings: np.ndarray):
+        try:
+            # IDs are fixed at enqueue time, so upsert makes retries idempotent
+            await asyncio.to_thread(
+                collection.upsert,
+                documents=[turn.document for turn in batch],
+                embeddings=[embedding.tolist() for embedding in embeddings],
+                metadatas=[turn.metadata for turn in batch],
+                ids=[turn.memory_id for turn in batch]
+            )
+        except Exception as e:
+            if len(batch) == 1:
+                raise
+            # One bad turn must not lose the whole batch - retry individually
+            logger.warning(f"Bulk memory upsert failed ({e}); retrying {len(batch)} turns one by one")
+            for turn, embedding in zip(batch, embeddings):
+                try:
+                    await self._add(collection, [turn], embedding[np.newaxis, :])
+                except Exception as item_error:
+                    logger.error(f"Error storing memory {turn.memory_id}: {item_error}")
+
+class MemoryManager:
+    """Ranks recalled memories by similarity, recency and importance, and keeps each user's memory bounded"""
+
+    MEMORY_CUES = ("remember", "my name", "i am", "i'm", "i live", "my family", "my job", "don't forget", "always", "never")
+    # Whole words and phrases only, so "nevertheless" or "wii amp" do not count
+    MEMORY_CUE_RE = re.compile(r"\b(" + "|".join(map(re.escape, MEMORY_CUES)) + r")\b")
+
+    def __init__(self, brain: "MsJarvisAIBrain", max_turns_per_user: int = 2000, half_life_hours: float = 72.0,
+                 similarity_weight: float = 1.0, recency_weight: float = 0.2, importance_weight: float = 0.2,
+                 digest_model: str = "phi3:mini", digest_group_size: int = 20, compact_after_days: float = 30.0,
+                 interval_seconds: float = 300.0, digest_input_tokens: int = 1500, digest_max_tokens: int = 200):
+        self.brain = brain
+        self.max_turns_per_user = max_turns_per_user
+        self.half_life_ms = half_life_hours * 3600 * 1000
+        self.similarity_weight = similarity_weight
+        self.recency_weight = recency_weight
+        self.importance_weight = importance_weight
+        self.digest_model = digest_model
+        self.digest_group_size = digest_group_size
+        self.digest_input_tokens = digest_input_tokens
+        self.digest_max_tokens = digest_max_tokens
+        self.compact_after_ms = compact_after_days * 86400 * 1000
+        self.interval = interval_seconds
+        self.dirty_users: set = set()
+        self.worker_task: Optional[asyncio.Task] = None
+
+    def importance(self, message: str, context: Dict[str, Any]) -> float:
+        """0..1 at write time: emotional intensity, substance, and explicit personal facts"""
+        emotion = context.get('emotion') or {}
+        intensity = float(emotion.get('score', 0.0)) if emotion.get('label', 'neutral') != 'neutral' else 0.0
+        substance = min(len(message.split()) / 50.0, 1.0)
+        cue = 1.0 if self.MEMORY_CUE_RE.search(message.lower().replace("\u2019", "'")) else 0.0
+        return round(0.4 * intensity + 0.3 * substance + 0.3 * cue, 3)
+
+    def score(self, similarity: float, metadata: Dict[str, Any], now_ms: Optional[int] = None) -> Tuple[float, float]:
+        """(total score, recency+importance boost) for one recalled memory"""
+        now_ms = now_ms or int(time.time() * 1000)
+        age_ms = max(now_ms - int(metadata.get('ts') or 0), 0)
+        recency = 0.5 ** (age_ms / self.half_life_ms) if self.half_life_ms > 0 else 0.0
+        importance = float(metadata.get('importance', 0.0))
+        boost = self.recency_weight * recency + self.importance_weight * importance
+        return self.similarity_weight * similarity + boost, boost
+
+    def rank(self, memories: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        now_ms = int(time.time() * 1000)
+        for memory in memories:
+            memory["score"], memory["boost"] = self.score(
+                distance_to_similarity(memory["distance"]), memory.get("metadata") or {}, now_ms
+            )
+        memories.sort(key=lambda memory: memory["score"], reverse=True)
+        return memories[:limit]
+
+    def mark_dirty(self, user_ids):
+        self.dirty_users.update(user_ids)
+
+    def start(self):
+        if self.worker_task is None or self.worker_task.done():
+            self.worker_task = asyncio.create_task(self._run(), name="memory-manager")
+
+    async def close(self):
+        if self.worker_task is not None:
+            self.worker_task.cancel()
+            try:
+                await self.worker_task
+            except asyncio.CancelledError:
+                pass
+            self.worker_task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            users, self.dirty_users = self.dirty_users, set()
+            for user_id in users:
+                try:
+                    await self.compact(user_id)
+                except Exception as e:
+                    logger.error(f"Error compacting memory for user {user_id}: {e}")
+
+    async def compact(self, user_id: str) -> Dict[str, int]:
+        """Fold old turns into digests; when still over the cap, drop the oldest entries"""
+        memories = await self.brain.list_memories(user_id, limit=None)
+        stats = {"compacted": 0, "digests": 0, "evicted": 0}
+        if not memories:
+            return stats
+
+        cutoff_ms = int(time.time() * 1000) - self.compact_after_ms
+        low_water = int(self.max_turns_per_user * 0.75)
+        excess = max(len(memories) - low_water, 0) if len(memories) > self.max_turns_per_user else 0
+        candidates = [
+            memory for position, memory in enumerate(memories)
+            if (memory["metadata"] or {}).get("kind", "turn") == "turn"
+            and (position < excess or int((memory["metadata"] or {}).get("ts") or 0) < cutoff_ms)
+        ]
+
+        with metrics.stage("memory_compaction"):
+            for start in range(0, len(candidates) - self.digest_group_size + 1, self.digest_group_size):
+                group = candidates[start:start + self.digest_group_size]
+                await self.store_digest(user_id, group)
+                stats["compacted"] += len(group)
+                stats["digests"] += 1
+
+            remaining = len(memories) - stats["compacted"] + stats["digests"]
+            if remaining > self.max_turns_per_user:
+                compacted_ids = {memory["id"] for memory in candidates[:stats["compacted"]]}
+                survivors = [memory for memory in memories if memory["id"] not in compacted_ids]
+                evict = [memory["id"] for memory in survivors[:remaining - self.max_turns_per_user]]
+                await self.delete(user_id, evict)
+                stats["evicted"] = len(evict)
+
+        if stats["compacted"] or stats["evicted"]:
+            metrics.inc("memory_turns_compacted_total", stats["compacted"], "Turns folded into digest memories")
+            metrics.inc("memory_entries_evicted_total", stats["evicted"], "Memories dropped to honour the per-user cap")
+            logger.info(f"🗜️ Memory for {user_id}: {stats['compacted']} turns -> {stats['digests']} digests, {stats['evicted']} evicted")
+        return stats
+
+    async def store_digest(self, user_id: str, turns: List[Dict[str, Any]]):
+        """Summarize a run of turns with the cheap model (extractive fallback), store it, then drop the turns"""
+        transcript = "\n\n".join(turn["content"] for turn in turns)
+        try:
+            response = await self.brain.ollama_generate(
+                model=self.digest_model,
+                prompt=(
+                    "Summarize these past conversation turns between a user and Ms. Jarvis into a short memory note. "
+                    "Keep facts about the user, their preferences, open questions and commitments; drop small talk.\n\n"
+                    f"{truncate_to_tokens(transcript, self.digest_input_tokens)}\n\nMemory note:"
+                ),
+                options={"temperature": 0.2, "num_predict": self.digest_max_tokens}
+            )
+            digest = response['response'].strip()
+        except Exception as e:
+            logger.warning(f"Digest model unavailable ({e}); using an extractive digest")
+            digest = ""
+        if not digest:
+            digest = "\n".join(turn["content"].split("\n", 1)[0][:160] for turn in turns)
+
+        first, last = turns[0]["metadata"] or {}, turns[-1]["metadata"] or {}
+        embedding = (await self.brain.encode_texts([digest]))[0]
+        collection = await self.brain.memory_collection(user_id)
+        await asyncio.to_thread(
+            collection.upsert,
+            ids=[self.brain.memory_ids.memory_id(user_id)],
+            embeddings=[embedding.tolist()],
+            documents=[f"Summary of earlier conversations:\n{digest}"],
+            metadatas=[{
+                "user_id": user_id,
+                "kind": "digest",
+                "timestamp": last.get("timestamp", ""),
+                "ts": int(last.get("ts") or 0),
+                "since_ts": int(first.get("ts") or 0),
+                "turns": len(turns),
+                "importance": max([float((turn["metadata"] or {}).get("importance", 0.0)) for turn in turns] + [0.5])
+            }]
+        )
+        await self.delete(user_id, [turn["id"] for turn in turns])
+
+    async def delete(self, user_id: str, memory_ids: List[str]):
+        if memory_ids:
+            collection = await self.brain.memory_collection(user_id)
+            await asyncio.to_thread(collection.delete, ids=memory_ids)
+
+class EmbeddingContext:
+    """Request-scoped embeddings - each text is encoded at most once, pending texts in one batch"""
+    
+    def __init__(self, brain: "MsJarvisAIBrain"):
+        self.brain = brain
+        self.vectors: Dict[str, np.ndarray] = {}
+        self.pending: List[str] = []
+        
+    def request(self, text: str):
+        """Queue a text for the next batched encode"""
+        if text not in self.vectors and text not in self.pending:
+            self.pending.append(text)
+            
+    async def flush(self):
+        """Encode every pending text in a single encoder call"""
+        if not self.pending:
+            return
+        texts, self.pending = self.pending, []
+        vectors = await self.brain.encode_texts(texts)
+        for text, vector in zip(texts, vectors):
+            self.vectors[text] = vector
+            
+    async def get(self, text: str) -> np.ndarray:
+        """Return the embedding for text, encoding it (with anything pending) if needed"""
+        self.request(text)
+        await self.flush()
+        return self.vectors[text]
+
 class MsJarvisAIBrain:
     def __init__(self):
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         logger.info(f"🧠 Ms. Jarvis AI Brain initializing on device: {self.device}")
         
-        # Ollama configuration
-        self.ollama_client = ollama.Client(host=os.getenv('OLLAMA_URL', 'http://localhost:11434'))
+        # Ollama configuration: OLLAMA_URLS ("url=24GB,url=16GB") spreads models over several hosts
+        self.ollama_url = os.getenv('OLLAMA_URL', 'http://localhost:11434')
+        self.ollama_scheduler = OllamaScheduler(
+            OllamaScheduler.parse_hosts(
+                os.getenv('OLLAMA_URLS') or self.ollama_url,
+                default_memory=os.getenv('OLLAMA_HOST_MEMORY', '16GB')
+            ),
+            probe_timeout=float(os.getenv('HEALTH_PROBE_TIMEOUT_SECONDS', '3')),
+            # Concurrent generations per host, acquired once the host is chosen
+            max_concurrency=int(os.getenv('OLLAMA_MAX_CONCURRENCY', '4'))
+        )
+        self.ollama_url = self.ollama_scheduler.primary.url
+        
+        # Keep models resident between requests so stable system prefixes stay in the KV cache
+        self.ollama_keep_alive = ollama_keep_alive()
+        self.ollama_warmup = os.getenv('OLLAMA_WARMUP', 'true').lower() == 'true'
+        self.ollama_warmup_timeout = float(os.getenv('OLLAMA_WARMUP_TIMEOUT_SECONDS', '300'))
+        self.warmup_task: Optional[asyncio.Task] = None
+        
+        # Async agent execution limits
+        self.agent_timeout = float(os.getenv('AGENT_TIMEOUT_SECONDS', '60'))
+        # Judge starts once AGENT_QUORUM agents answered or the budget expires; late agents are cancelled (0 = off)
+        self.agent_quorum = int(os.getenv('AGENT_QUORUM', '3'))
+        self.agent_latency_budget = float(os.getenv('AGENT_LATENCY_BUDGET_SECONDS', '25'))
+        self.generation_timeout = float(os.getenv('OLLAMA_TIMEOUT_SECONDS', '120'))
+        self.model_slots = ModelConcurrency(
+            default_limit=int(os.getenv('OLLAMA_MODEL_CONCURRENCY', '2')),
+            overrides=ModelConcurrency.parse_overrides(os.getenv('OLLAMA_MODEL_CONCURRENCY_OVERRIDES', ''))
+        )
+        
+        # Admission control: bounded concurrent pipelines, a priority queue, fast 429/503 beyond it
+        self.admission = AdmissionController(
+            max_active=int(os.getenv('CHAT_MAX_CONCURRENT', '2')),
+            max_queue=int(os.getenv('CHAT_QUEUE_MAX', '16')),
+            queue_timeout=float(os.getenv('CHAT_QUEUE_TIMEOUT_SECONDS', '30'))
+        )
         
         # Initialize components
-        self.setup_models()
-        self.setup_vector_memory()
         self.setup_agents()
         
-    def setup_models(self):
-        """Initialize Hugging Face models for NLP"""
+        # Routing: only the specialists a message needs, or straight to the persona for trivial turns
+        self.router_enabled = os.getenv('ROUTER_ENABLED', 'true').lower() == 'true'
+        self.router = MessageRouter(
+            list(self.agents),
+            min_similarity=float(os.getenv('ROUTER_MIN_SIMILARITY', '0.3')),
+            margin=float(os.getenv('ROUTER_MARGIN', '0.05')),
+            trivial_max_words=int(os.getenv('ROUTER_TRIVIAL_MAX_WORDS', '6'))
+        )
+        self.router_fit_lock = asyncio.Lock()
+        
+        # Final stage: "fused" writes the persona-styled synthesis in one generation, "two_stage" runs judge then persona
+        self.final_stage_mode = os.getenv('FINAL_STAGE_MODE', 'fused').lower()
+        if self.final_stage_mode not in ("fused", "two_stage"):
+            logger.warning(f"Unknown FINAL_STAGE_MODE {self.final_stage_mode!r}, using two_stage")
+            self.final_stage_mode = "two_stage"
+        self.trivial_fallback = "Hello sweetie! It's so good to hear from you. What can I help you with on your MountainShares journey today?"
+        
+        # Semantic response cache in front of the multi-agent pipeline
+        self.response_cache_enabled = os.getenv('RESPONSE_CACHE_ENABLED', 'true').lower() == 'true'
+        self.response_cache = SemanticResponseCache(
+            threshold=float(os.getenv('RESPONSE_CACHE_THRESHOLD', '0.92')),
+            ttl_seconds=float(os.getenv('RESPONSE_CACHE_TTL_SECONDS', '3600')),
+            max_entries=int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', '2000')),
+            scope=os.getenv('RESPONSE_CACHE_SCOPE', 'user')
+        )
+        
+        # Vector store: the vector-db Chroma service, or an embedded index for single-node deployments
+        self.vector_backend = os.getenv('VECTOR_BACKEND', 'chroma')
+        self.vector_store_path = os.getenv('VECTOR_STORE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vector_store'))
+        
+        # Retrieval: memories and knowledge chunks reranked and packed into agent prompts
+        self.retrieval_memory_results = int(os.getenv('RAG_MEMORY_RESULTS', '5'))
+        self.retrieval_knowledge_results = int(os.getenv('RAG_KNOWLEDGE_RESULTS', '8'))
+        self.chunk_selector = ChunkSelector(
+            token_budget=int(os.getenv('RAG_CONTEXT_TOKENS', '600')),
+            min_similarity=float(os.getenv('RAG_MIN_SIMILARITY', '0.25'))
+        )
+        
+        # Token budgets: output caps per stage (num_predict) and input caps on the message, agent outputs and contract code
+        self.token_budget = TokenBudget.from_env()
+
+        # Sentence embeddings run on their own thread, off the event loop
+        self.embedding_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding")
+        
+        # Conversation memory partitioned per user ("user") or one filtered collection ("shared")
+        self.memory_partitioning = os.getenv('MEMORY_PARTITIONING', 'user')
+        self.migrate_shared_memory_enabled = os.getenv('MEMORY_MIGRATE_SHARED', 'true').lower() == 'true'
+        # Open partitions are an LRU; evicted ones release their vector files until the user returns
+        self.memory_partitions: "OrderedDict[str, Any]" = OrderedDict()
+        self.memory_partitions_max = int(os.getenv('MEMORY_PARTITIONS_MAX', '256'))
+        self.memory_partitions_lock = threading.Lock()
+        self.migration_task: Optional[asyncio.Task] = None
+        
+        # Conversation turns are written behind the response in batches, under monotonic IDs
+        self.memory_ids = MemoryIdGenerator()
+        self.memory_writer = MemoryWriter(
+            self,
+            max_queue=int(os.getenv('MEMORY_QUEUE_MAX', '1000')),
+            batch_size=int(os.getenv('MEMORY_BATCH_SIZE', '64')),
+            flush_interval_ms=float(os.getenv('MEMORY_FLUSH_INTERVAL_MS', '250')),
+            enqueue_timeout=float(os.getenv('MEMORY_ENQUEUE_TIMEOUT_SECONDS', '2'))
+        )
+        
+        # Recall ranking, per-user caps and background compaction into digest memories
+        self.memory_candidate_factor = int(os.getenv('MEMORY_CANDIDATE_FACTOR', '3'))
+        self.memory_manager = MemoryManager(
+            self,
+            max_turns_per_user=int(os.getenv('MEMORY_MAX_TURNS_PER_USER', '2000')),
+            half_life_hours=float(os.getenv('MEMORY_RECENCY_HALF_LIFE_HOURS', '72')),
+            similarity_weight=float(os.getenv('MEMORY_WEIGHT_SIMILARITY', '1.0')),
+            recency_weight=float(os.getenv('MEMORY_WEIGHT_RECENCY', '0.2')),
+            importance_weight=float(os.getenv('MEMORY_WEIGHT_IMPORTANCE', '0.2')),
+            digest_model=os.getenv('MEMORY_DIGEST_MODEL', 'phi3:mini'),
+            digest_group_size=int(os.getenv('MEMORY_DIGEST_GROUP_SIZE', '20')),
+            compact_after_days=float(os.getenv('MEMORY_COMPACT_AFTER_DAYS', '30')),
+            interval_seconds=float(os.getenv('MEMORY_COMPACTION_INTERVAL_SECONDS', '300')),
+            digest_input_tokens=int(os.getenv('MEMORY_DIGEST_INPUT_TOKENS', '1500')),
+            digest_max_tokens=int(os.getenv('MEMORY_DIGEST_MAX_TOKENS', '200'))
+        )
+        
+        # One fixed num_ctx per model, covering chat, contract analysis and digest stages alike
+        self.num_ctx = self.size_context_windows()
+        
+        # Batched sentiment/emotion inference off the event loop (pipelines attach once loaded)
+        self.nlp_worker = NLPInferenceWorker(
+            None,
+            None,
+            batch_window_ms=float(os.getenv('NLP_BATCH_WINDOW_MS', '5')),
+            max_batch_size=int(os.getenv('NLP_MAX_BATCH_SIZE', '32'))
+        )
+        
+        # Cached dependency probes, refreshed in the background so health checks do no I/O
+        self.probe_interval = float(os.getenv('HEALTH_PROBE_INTERVAL_SECONDS', '10'))
+        self.probe_timeout = float(os.getenv('HEALTH_PROBE_TIMEOUT_SECONDS', '3'))
+        self.probes: Dict[str, Dict[str, Any]] = {}
+        self.probe_task: Optional[asyncio.Task] = None
+        
+        # Heavy components load concurrently; "background" lets the server bind before they finish
+        self.startup_mode = os.getenv('STARTUP_MODE', 'background')
+        self.component_wait_timeout = float(os.getenv('COMPONENT_WAIT_SECONDS', '30'))
+        self.loaders: Dict[str, Callable[[], None]] = {
+            "embedding_model": self.load_embedding_model,
+            "sentiment_pipeline": self.load_sentiment_pipeline,
+            "emotion_pipeline": self.load_emotion_pipeline,
+            "vector_memory": self.setup_vector_memory
+        }
+        self.components = {name: ComponentState(name) for name in self.loaders}
+        self.loader_executor: Optional[ThreadPoolExecutor] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        if self.startup_mode == "eager":
+            wait_futures(self.start_loading())
+            
+    def start_loading(self):
+        """Load every heavy component concurrently on background threads (idempotent)"""
+        if self.loader_executor is not None:
+            return []
         try:
-            # Embedding model for memory
-            self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-            logger.info("✅ Embedding model loaded")
-            
-            # Sentiment analysis
-            self.sentiment_pipeline = pipeline(
-                "sentiment-analysis",
-                model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-                device=0 if torch.cuda.is_available() else -1
-            )
-            logger.info("✅ Sentiment analysis pipeline loaded")
+            self.loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.loop = None
+        self.loader_executor = ThreadPoolExecutor(max_workers=len(self.loaders), thread_name_prefix="model-loader")
+        logger.info(f"⏳ Loading {len(self.loaders)} components in the background...")
+        return [
+            self.loader_executor.submit(self._load_component, name, loader)
+            for name, loader in self.loaders.items()
+        ]
+        
+    def _load_component(self, name: str, loader: Callable[[], None]):
+        state = self.components[name]
+        state.status = "loading"
+        started = time.perf_counter()
+        try:
+            loader()
+            state.status = "ready"
+        except Exception as e:
+            state.status = "failed"
+            state.detail = str(e)
+            logger.error(f"Error loading {name}: {e}")
+        finally:
+            state.load_seconds = round(time.perf_counter() - started, 2)
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(state.ready.set)
+            else:
+                state.ready.set()
+                
+    def is_ready(self, name: str) -> bool:
+        return self.components[name].status == "ready"
+        
+    async def wait_for_component(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Wait (bounded) for a component to finish loading; False if it failed or is still loading"""
+        state = self.components[name]
+        if state.status in ("pending", "loading"):
+            try:
+                await asyncio.wait_for(state.ready.wait(), timeout=timeout or self.component_wait_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"⏳ {name} still loading after {timeout or self.component_wait_timeout}s")
+        return state.status == "ready"
+        
+    def component_status(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            name: {"status": state.status, "detail": state.detail, "load_seconds": state.load_seconds}
+            for name, state in self.components.items()
+        }
+        
+    def start_probes(self):
+        """Start the background dependency probe loop (idempotent)"""
+        if self.probe_task is None or self.probe_task.done():
+            self.probe_task = asyncio.create_task(self._probe_loop(), name="health-probes")
             
-            # Emotion detection
-            self.emotion_pipeline = pipeline(
-                "text-classification",
-                model="j-hartmann/emotion-english-distilroberta-base",
-                device=0 if torch.cuda.is_available() else -1
-            )
-            logger.info("✅ Emotion detection pipeline loaded")
+    async def _probe_loop(self):
+        while True:
+            try:
+                await self.probe_dependencies()
+            except Exception as e:
+                logger.error(f"Error probing dependencies: {e}")
+            await asyncio.sleep(self.probe_interval)
             
-        except Exception as e:
-            logger.error(f"Error setting up Hugging Face models: {e}")
+    async def probe_dependencies(self):
+        """Refresh the cached vector store and Ollama probe results"""
+        checked_at = datetime.now().isoformat()
+        
+        # Vector store heartbeat (only once the client exists)
+        vector_state = self.components["vector_memory"]
+        if vector_state.status == "ready":
+            try:
+                await asyncio.wait_for(asyncio.to_thread(self.vector_client.heartbeat), timeout=self.probe_timeout)
+                self.probes["vector_store"] = {"status": "ok", "detail": vector_state.detail, "checked_at": checked_at}
+            except Exception as e:
+                self.probes["vector_store"] = {"status": "down", "detail": str(e), "checked_at": checked_at}
+        else:
+            self.probes["vector_store"] = {"status": vector_state.status, "detail": vector_state.detail, "checked_at": checked_at}
+            
+        # Ollama hosts: reachability, which pipeline models are pulled, and model placement
+        scheduler = self.ollama_scheduler
+        async with scheduler.lock:
+            await scheduler.refresh(self.required_models())
+        healthy = scheduler.healthy_count()
+        if healthy:
+            self.probes["ollama"] = {
+                "status": "ok", "detail": f"{healthy}/{len(scheduler.hosts)} hosts healthy", "checked_at": checked_at
+            }
+            for model in self.required_models():
+                self.probes[f"ollama:{model}"] = {
+                    "status": "ok" if scheduler.model_available(model) else "missing",
+                    "detail": scheduler.pins.get(model),
+                    "checked_at": checked_at
+                }
+        else:
+            self.probes["ollama"] = {"status": "down", "detail": scheduler.primary.detail, "checked_at": checked_at}
+            for model in self.required_models():
+                self.probes[f"ollama:{model}"] = {"status": "unknown", "checked_at": checked_at}
+                
+    def probe_ok(self, name: str) -> bool:
+        return self.probes.get(name, {}).get("status") == "ok"
+        
+    def readiness(self) -> Tuple[bool, Dict[str, Dict[str, Any]]]:
+        """Per-component state from cached results; ready once the pipeline can serve a /chat turn"""
+        components = {name: dict(state) for name, state in self.component_status().items()}
+        for name, probe in self.probes.items():
+            components[name] = dict(probe)
+            
+        ready = (
+            self.is_ready("embedding_model")
+            and self.is_ready("vector_memory")
+            and self.probe_ok("vector_store")
+            and self.probe_ok("ollama")
+            and self.probe_ok(f"ollama:{self.judge_model}")
+            and self.probe_ok(f"ollama:{self.persona_model}")
+        )
+        return ready, components
+
+    def load_embedding_model(self):
+        """Load the sentence embedding model used for memory"""
+        from sentence_transformers import SentenceTransformer  # deferred: heavy import
+        
+        self.embedding_model_name = 'all-MiniLM-L6-v2'
+        embedding_model = SentenceTransformer(self.embedding_model_name)
+        self.embedding_cache = EmbeddingCache(
+            model_name=self.embedding_model_name,
+            dim=embedding_model.get_sentence_embedding_dimension(),
+            max_bytes=int(float(os.getenv('EMBEDDING_CACHE_MAX_MB', '64')) * 1024 * 1024),
+            disk_dir=os.getenv('EMBEDDING_CACHE_DIR') or None,
+            disk_capacity=int(os.getenv('EMBEDDING_CACHE_DISK_ENTRIES', '200000'))
+        )
+        self.embedding_model = embedding_model
+        logger.info("✅ Embedding model loaded")
+        
+    def load_sentiment_pipeline(self):
+        """Load the Hugging Face sentiment analysis pipeline"""
+        from transformers import pipeline  # deferred: heavy import
+        
+        self.sentiment_pipeline = pipeline(
+            "sentiment-analysis",
+            model="cardiffnlp/twitter-roberta-base-sentiment-latest",
+            device=0 if torch.cuda.is_available() else -1
+        )
+        self.nlp_worker.sentiment_pipeline = self.sentiment_pipeline
+        logger.info("✅ Sentiment analysis pipeline loaded")
+        
+    def load_emotion_pipeline(self):
+        """Load the Hugging Face emotion detection pipeline"""
+        from transformers import pipeline  # deferred: heavy import
+        
+        self.emotion_pipeline = pipeline(
+            "text-classification",
+            model="j-hartmann/emotion-english-distilroberta-base",
+            device=0 if torch.cuda.is_available() else -1
+        )
+        self.nlp_worker.emotion_pipeline = self.emotion_pipeline
+        logger.info("✅ Emotion detection pipeline loaded")
             
     def setup_vector_memory(self):
-        """Initialize ChromaDB for persistent memory"""
+        """Open the vector store (remote Chroma or the embedded in-process index) and its collections"""
         try:
-            # Connect to ChromaDB
-            self.chroma_client = chromadb.HttpClient(
-                host="vector-db",
-                port=8000
+            self.vector_client = create_vector_client(
+                self.vector_backend,
+                path=self.vector_store_path,
+                host=os.getenv('CHROMA_HOST', 'vector-db'),
+                port=int(os.getenv('CHROMA_PORT', '8000'))
             )
+            self.open_memory_collections()
+            self.components["vector_memory"].detail = self.vector_backend
+            logger.info(f"✅ Vector memory databases initialized ({self.vector_backend})")
             
-            # Create memory collections
-            self.user_memory = self.chroma_client.get_or_create_collection(
-                name="user_interactions",
-                metadata={"description": "User conversation memory"}
-            )
+        except Exception as e:
+            if self.vector_backend == "embedded":
+                raise
+            logger.error(f"Error setting up vector memory: {e}")
+            # Fall back to the embedded store so memories still persist across restarts
+            self.vector_client = create_vector_client("embedded", path=self.vector_store_path)
+            self.open_memory_collections()
+            self.components["vector_memory"].detail = f"embedded fallback at {self.vector_store_path}"
+            logger.warning(f"⚠️ Chroma unavailable - using the embedded vector store at {self.vector_store_path}")
             
-            self.knowledge_memory = self.chroma_client.get_or_create_collection(
-                name="mountainshares_knowledge",
-                metadata={"description": "MountainShares technical knowledge"}
-            )
+    def open_memory_collections(self):
+        self.user_memory = self.vector_client.get_or_create_collection(
+            name="user_interactions",
+            metadata={"description": "User conversation memory"}
+        )
+        
+        self.knowledge_memory = self.vector_client.get_or_create_collection(
+            name="mountainshares_knowledge",
+            metadata={"description": "MountainShares technical knowledge"}
+        )
+        self.memory_partitions.clear()
+        
+    def memory_partition_name(self, user_id: str) -> str:
+        """Collection for one user's turns - hashed to fit collection naming rules and keep IDs out of names"""
+        if user_id == "global":
+            return "user_interactions__global"
+        return f"user_interactions__{hashlib.sha256(user_id.encode('utf-8')).hexdigest()[:20]}"
+        
+    def open_memory_partition(self, user_id: str):
+        """Get or create a user's memory collection (blocking; call off the event loop)"""
+        name = self.memory_partition_name(user_id)
+        collection = self.cached_memory_partition(name)
+        if collection is not None:
+            return collection
+        collection = self.vector_client.get_or_create_collection(
+            name=name,
+            metadata={"description": "User conversation memory partition"}
+        )
+        evicted = []
+        with self.memory_partitions_lock:
+            self.memory_partitions[name] = collection
+            self.memory_partitions.move_to_end(name)
+            while len(self.memory_partitions) > self.memory_partitions_max:
+                evicted.append(self.memory_partitions.popitem(last=False)[0])
+        # Chroma's HTTP client holds nothing per collection
+        release = getattr(self.vector_client, "release_collection", None)
+        for evicted_name in evicted:
+            if release is not None:
+                release(evicted_name)
+        return collection
+        
+    def cached_memory_partition(self, name: str):
+        with self.memory_partitions_lock:
+            collection = self.memory_partitions.get(name)
+            if collection is not None:
+                self.memory_partitions.move_to_end(name)
+            return collection
+        
+    async def memory_collection(self, user_id: str):
+        """Collection holding user_id's turns: their own partition, or the shared collection"""
+        if self.memory_partitioning != "user":
+            return self.user_memory
+        collection = self.cached_memory_partition(self.memory_partition_name(user_id))
+        if collection is not None:
+            return collection
+        return await asyncio.to_thread(self.open_memory_partition, user_id)
+        
+    def start_memory_migration(self):
+        """Move turns left in the shared collection into per-user partitions, in the background"""
+        if self.memory_partitioning == "user" and self.migrate_shared_memory_enabled and self.migration_task is None:
+            self.migration_task = asyncio.create_task(self.migrate_shared_memory(), name="memory-migration")
             
-            logger.info("✅ Vector memory databases initialized")
+    async def migrate_shared_memory(self, batch_size: int = 500):
+        state = self.components["vector_memory"]
+        await state.ready.wait()
+        if state.status != "ready":
+            return
             
+        moved = 0
+        try:
+            while True:
+                page = await asyncio.to_thread(
+                    self.user_memory.get, limit=batch_size, include=["embeddings", "documents", "metadatas"]
+                )
+                if not page['ids']:
+                    break
+                embeddings = np.asarray(page['embeddings'], dtype=np.float32)
+                
+                partitions: Dict[str, List[int]] = {}
+                for i, memory_id in enumerate(page['ids']):
+                    metadata = page['metadatas'][i] or {}
+                    partitions.setdefault(str(metadata.get('user_id') or memory_id.split(':', 1)[0]), []).append(i)
+                for user_id, rows in partitions.items():
+                    collection = await self.memory_collection(user_id)
+                    await asyncio.to_thread(
+                        collection.upsert,
+                        ids=[page['ids'][i] for i in rows],
+                        embeddings=embeddings[rows].tolist(),
+                        documents=[page['documents'][i] for i in rows],
+                        metadatas=[page['metadatas'][i] for i in rows]
+                    )
+                    
+                # Only delete once every partition has its copy, so an interruption never loses turns
+                await asyncio.to_thread(self.user_memory.delete, ids=page['ids'])
+                moved += len(page['ids'])
+                
+            if moved:
+                logger.info(f"📦 Moved {moved} memories from the shared collection into per-user partitions")
         except Exception as e:
-            logger.error(f"Error setting up vector memory: {e}")
-            # Fallback to in-memory storage
-            self.chroma_client = chromadb.Client()
-            self.user_memory = self.chroma_client.create_collection("user_interactions")
-            self.knowledge_memory = self.chroma_client.create_collection("mountainshares_knowledge")
-            logger.info("✅ Using in-memory vector storage as fallback")
+            logger.error(f"Error migrating shared memory after {moved} turns: {e}")
             
     def setup_agents(self):
         """Initialize the 4 AI agents for multi-agent reasoning"""
@@ -163,37 +996,175 @@ class MsJarvisAIBrain:
                 Understand user feelings and provide compassionate, nurturing responses."""
             )
         }
+        
+        # LLaMA also runs the judge synthesis, the Mamma Kidd persona and /mountainshares/analyze
+        self.judge_model = "llama3.1:8b"
+        self.persona_model = "llama3.1:8b"
+        self.contract_model = "llama3.1:8b"
         logger.info("✅ Multi-agent system initialized with 4 specialized AI agents")
 
-    async def analyze_message_context(self, message: str, user_id: str) -> Dict[str, Any]:
+    def required_models(self) -> List[str]:
+        """Every Ollama model the /chat pipeline, contract analysis and memory digests can call"""
+        models = [agent.model for agent in self.agents.values()] + [
+            self.judge_model, self.persona_model, self.contract_model, self.memory_manager.digest_model
+        ]
+        return list(dict.fromkeys(models))
+
+    def size_context_windows(self) -> Dict[str, int]:
+        """Worst-case prompt plus output for every stage a model serves, as one num_ctx per model.
+        Fixed per model because Ollama reloads a model whenever num_ctx changes"""
+        budget = self.token_budget
+        needs: Dict[str, int] = {}
+        
+        def need(model: str, tokens: int):
+            needs[model] = max(needs.get(model, 0), tokens)
+            
+        for agent in self.agents.values():
+            need(agent.model, estimate_tokens(agent.system) + self.chunk_selector.token_budget
+                 + budget.message_max_tokens + budget.agent_max_tokens + TEMPLATE_TOKENS)
+        need(self.judge_model, budget.judge_tokens())
+        need(self.persona_model, budget.persona_tokens())
+        need(self.contract_model, budget.contract_tokens())
+        need(self.memory_manager.digest_model, self.memory_manager.digest_input_tokens
+             + self.memory_manager.digest_max_tokens + TEMPLATE_TOKENS)
+        return {model: context_window(tokens) for model, tokens in needs.items()}
+
+    def generation_options(self, model: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        if model in self.num_ctx and 'num_ctx' not in options:
+            return {**options, "num_ctx": self.num_ctx[model]}
+        return options
+
+    def generation_kwargs(self, system: Optional[str]) -> Dict[str, Any]:
+        kwargs: Dict[str, Any] = {"keep_alive": self.ollama_keep_alive}
+        if system:
+            kwargs["system"] = system
+        return kwargs
+
+    async def ollama_generate(self, model: str, prompt: str, options: Dict[str, Any], timeout: Optional[float] = None,
+                              system: Optional[str] = None) -> Dict[str, Any]:
+        """Run one Ollama generation without blocking the event loop"""
+        async with self.model_slots.slot(model):
+            try:
+                async with self.ollama_scheduler.route(model) as host:
+                    started = time.perf_counter()
+                    response = await asyncio.wait_for(
+                        host.client.generate(model=model, prompt=prompt, options=self.generation_options(model, options),
+                                             **self.generation_kwargs(system)),
+                        timeout=timeout or self.generation_timeout
+                    )
+            except asyncio.TimeoutError:
+                metrics.record_generation_error(model, "timeout")
+                raise
+            except Exception:
+                metrics.record_generation_error(model, "error")
+                raise
+            metrics.record_generation(model, time.perf_counter() - started, response)
+            return response
+
+    async def ollama_stream(self, model: str, prompt: str, options: Dict[str, Any], timeout: Optional[float] = None,
+                            system: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Stream one Ollama generation chunk by chunk; timeout applies between chunks"""
+        async with self.model_slots.slot(model), self.ollama_scheduler.route(model) as host:
+            stream = await asyncio.wait_for(
+                host.client.generate(model=model, prompt=prompt, options=self.generation_options(model, options), stream=True,
+                                     **self.generation_kwargs(system)),
+                timeout=timeout or self.generation_timeout
+            )
+            started = time.perf_counter()
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=timeout or self.generation_timeout)
+                except StopAsyncIteration:
+                    break
+                if chunk.get('done'):
+                    metrics.record_generation(model, time.perf_counter() - started, chunk)
+                yield chunk
+
+    def warmup_prefixes(self) -> Dict[str, List[str]]:
+        """Every (model, system prefix) pair the /chat pipeline and contract analysis send"""
+        prefixes: Dict[str, List[str]] = {}
+        for agent in self.agents.values():
+            prefixes.setdefault(agent.model, []).append(agent.system)
+        prefixes.setdefault(self.judge_model, []).append(prompts.JUDGE_SYSTEM)
+        prefixes.setdefault(self.persona_model, []).append(prompts.PERSONA_SYSTEM)
+        prefixes.setdefault(self.contract_model, []).append(prompts.CONTRACT_SYSTEM)
+        return {model: list(dict.fromkeys(systems)) for model, systems in prefixes.items()}
+
+    def start_warmup(self):
+        """Load every pipeline model in the background at startup (idempotent)"""
+        if self.ollama_warmup and (self.warmup_task is None or self.warmup_task.done()):
+            self.warmup_task = asyncio.create_task(self.warm_models(), name="ollama-warmup")
+
+    async def warm_models(self):
+        """One-token generation per model and system prefix, so the first /chat finds each model loaded and its prefix cached"""
+        await self.ollama_scheduler.ensure_placement(self.required_models())
+        for model, systems in self.warmup_prefixes().items():
+            started = time.perf_counter()
+            try:
+                for system in systems:
+                    await self.ollama_generate(
+                        model=model,
+                        prompt="Hello",
+                        options={"num_predict": 1},
+                        timeout=self.ollama_warmup_timeout,
+                        system=system
+                    )
+                logger.info(f"🔥 Warmed {model} ({len(systems)} prefixes) in {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                logger.warning(f"Could not warm {model}: {e}")
+
+    async def encode_texts(self, texts: List[str]) -> np.ndarray:
+        """Encode a batch of texts off the event loop, serving repeats from the embedding cache"""
+        if not await self.wait_for_component("embedding_model"):
+            raise RuntimeError("Embedding model not available")
+        
+        vectors = self.embedding_cache.get_many(texts)
+        missing = [text for text, vector in zip(texts, vectors) if vector is None]
+        
+        if missing:
+            loop = asyncio.get_running_loop()
+            with metrics.stage("embedding"):
+                encoded = await loop.run_in_executor(
+                    self.embedding_executor,
+                    lambda: self.embedding_model.encode(missing, batch_size=max(len(missing), 1))
+                )
+            self.embedding_cache.put_many(missing, encoded)
+            computed = dict(zip(missing, encoded))
+            vectors = [vector if vector is not None else computed[text] for text, vector in zip(texts, vectors)]
+            
+        return np.stack(vectors)
+
+    async def analyze_message_context(self, message: str, user_id: str, embeddings: Optional[EmbeddingContext] = None) -> Dict[str, Any]:
         """Analyze message sentiment, emotion, and retrieve relevant memories"""
         try:
             context = {}
+            embeddings = embeddings or EmbeddingContext(self)
+            context["embeddings"] = embeddings
             
-            # Sentiment analysis
-            try:
-                sentiment = self.sentiment_pipeline(message)[0]
-                context["sentiment"] = sentiment
-            except:
-                context["sentiment"] = {"label": "NEUTRAL", "score": 0.5}
+            # Sentiment/emotion (batched with concurrent requests) alongside the message embedding
+            nlp_result, message_embedding = await asyncio.gather(
+                self.nlp_worker.analyze(message),
+                embeddings.get(message),
+                return_exceptions=True
+            )
             
-            # Emotion detection
-            try:
-                emotion = self.emotion_pipeline(message)[0]
-                context["emotion"] = emotion
-            except:
-                context["emotion"] = {"label": "neutral", "score": 0.5}
+            if isinstance(nlp_result, Exception):
+                logger.error(f"Error running NLP inference: {nlp_result}")
+                nlp_result = (None, None)
+            sentiment, emotion = nlp_result
+            context["sentiment"] = sentiment or {"label": "NEUTRAL", "score": 0.5}
+            context["emotion"] = emotion or {"label": "neutral", "score": 0.5}
             
-            # Search relevant memories
-            memories = await self.search_memory(message, user_id)
-            context["relevant_memories"] = memories
+            if isinstance(message_embedding, Exception):
+                logger.error(f"Error embedding message: {message_embedding}")
+                message_embedding = None
             
-            # Create message embedding
-            try:
-                embedding = self.embedding_model.encode(message).tolist()
-                context["message_embedding"] = embedding
-            except:
-                context["message_embedding"] = []
+            # Memories and knowledge chunks retrieved with the message vector computed above
+            memories, chunks = await self.retrieve_context(message, user_id, message_embedding)
+            context["relevant_memories"] = memories
+            context["retrieved_chunks"] = chunks
+            context["message_embedding"] = message_embedding.tolist() if message_embedding is not None else []
             
             return context
             
@@ -204,24 +1175,25 @@ class MsJarvisAIBrain:
     async def query_ollama_agent(self, agent: AIAgent, message: str, context: Dict[str, Any]) -> AgentResponse:
         """Query a specific Ollama agent"""
         try:
-            # Create comprehensive prompt for the agent
-            full_prompt = f"""{agent.system_prompt}
-
-Context Information:
+            # The agent's system prompt is the stable prefix; only the context below changes per request
+            full_prompt = f"""Context Information:
 - User's emotional state: {context.get('emotion', {}).get('label', 'neutral')}
 - User's sentiment: {context.get('sentiment', {}).get('label', 'neutral')}
 - Previous conversations: {len(context.get('relevant_memories', []))} relevant memories found
-
-User Message: {message}
+{self.format_retrieved_context(context)}
+User Message: {truncate_to_tokens(message, self.token_budget.message_max_tokens)}
 
 Please provide your specialized analysis from the perspective of {agent.specialty}:"""
 
             # Query Ollama
-            response = self.ollama_client.generate(
-                model=agent.model,
-                prompt=full_prompt,
-                options={"temperature": 0.7, "top_p": 0.9}
-            )
+            with metrics.stage("agent", request_key=f"agent:{agent.name}"):
+                response = await self.ollama_generate(
+                    model=agent.model,
+                    prompt=full_prompt,
+                    options={"temperature": 0.7, "top_p": 0.9, "num_predict": self.token_budget.agent_max_tokens},
+                    timeout=self.agent_timeout,
+                    system=agent.system
+                )
             
             return AgentResponse(
                 agent=agent.name,
@@ -232,7 +1204,10 @@ Please provide your specialized analysis from the perspective of {agent.specialt
             )
             
         except Exception as e:
-            logger.error(f"Error querying {agent.name}: {e}")
+            if isinstance(e, asyncio.TimeoutError):
+                logger.warning(f"⏱️ {agent.name} timed out after {self.agent_timeout}s")
+            else:
+                logger.error(f"Error querying {agent.name}: {e}")
             return AgentResponse(
                 agent=agent.name,
                 response=f"Agent {agent.name} is currently processing your request...",
@@ -241,60 +1216,83 @@ Please provide your specialized analysis from the perspective of {agent.specialt
                 timestamp=datetime.now().isoformat()
             )
 
-    async def run_multi_agent_analysis(self, message: str, context: Dict[str, Any]) -> List[AgentResponse]:
-        """Run all 4 agents in parallel"""
-        logger.info("🤖 Running multi-agent analysis with all 4 specialized agents...")
-        
-        tasks = []
-        for agent in self.agents.values():
-            task = self.query_ollama_agent(agent, message, context)
-            tasks.append(task)
+    async def route_message(self, message: str, context: Dict[str, Any]) -> RouteDecision:
+        """Pick the agents this message needs from its embedding (keyword rules until the router is fitted)"""
+        if not self.router_enabled:
+            return RouteDecision("all", list(self.agents), method="disabled")
             
-        responses = await asyncio.gather(*tasks, return_exceptions=True)
+        with metrics.stage("routing"):
+            if not self.router.fitted and self.is_ready("embedding_model"):
+                async with self.router_fit_lock:
+                    if not self.router.fitted:
+                        try:
+                            await self.router.fit(self.encode_texts)
+                        except Exception as e:
+                            logger.error(f"Error fitting message router: {e}")
+                            
+            embedding = context.get('message_embedding')
+            decision = self.router.classify(message, np.asarray(embedding, dtype=np.float32) if embedding else None)
+            
+        metrics.inc("routed_requests_total", help_text="Messages per route", route=decision.route)
+        logger.info(f"🧭 Routed to {decision.route}: {decision.agents or 'persona only'}")
+        return decision
+
+    async def run_multi_agent_analysis(self, message: str, context: Dict[str, Any],
+                                       agent_keys: Optional[List[str]] = None) -> List[AgentResponse]:
+        """Run the selected agents (all 4 by default) concurrently on the async Ollama client"""
+        selected = {key: agent for key, agent in self.agents.items() if agent_keys is None or key in agent_keys}
+        logger.info(f"🤖 Running multi-agent analysis with {len(selected)} specialized agents...")
+        
+        tasks = {
+            key: asyncio.create_task(self.query_ollama_agent(agent, message, context), name=f"agent-{key}")
+            for key, agent in selected.items()
+        }
+        
+        try:
+            pending = await wait_for_quorum(list(tasks.values()), self.agent_quorum, self.agent_latency_budget)
+        except asyncio.CancelledError:
+            # Client went away - stop any generations still in flight
+            for task in tasks.values():
+                task.cancel()
+            raise
+        
+        # Late agents are cancelled so their models are free for the judge
+        dropped = [key for key, task in tasks.items() if task in pending]
+        for key in dropped:
+            metrics.inc("agents_dropped_total", help_text="Agents cancelled after the quorum or latency budget", agent=key)
+        if pending:
+            await cancel_stragglers(pending)
+            logger.info(f"✂️ Dropped late agents: {', '.join(dropped)}")
+        context['dropped_agents'] = dropped
         
         # Filter valid responses
         valid_responses = []
-        for response in responses:
-            if isinstance(response, AgentResponse):
-                valid_responses.append(response)
-                logger.info(f"✅ {response.agent} ({response.specialty}) provided analysis")
+        for key, task in tasks.items():
+            if key in dropped or task.cancelled() or task.exception() is not None:
+                continue
+            response = task.result()
+            valid_responses.append(response)
+            logger.info(f"✅ {response.agent} ({response.specialty}) provided analysis")
                 
         return valid_responses
 
     async def synthesize_judge_response(self, message: str, agent_responses: List[AgentResponse], context: Dict[str, Any]) -> str:
         """Judge AI synthesizes all agent responses into best solution"""
+        if len(agent_responses) == 1:
+            # A single specialist leaves nothing to reconcile - the persona pass works from its answer
+            return agent_responses[0].response
         try:
-            agent_summary = "\n\n".join([
-                f"🤖 {resp.agent} ({resp.specialty}):\n{resp.response}"
-                for resp in agent_responses
-            ])
-            
-            judge_prompt = f"""You are the Judge AI in Ms. Jarvis's brain. Your role is to evaluate and synthesize the responses from all specialist agents into the optimal solution.
-
-Original User Message: {message}
-
-Agent Responses to Synthesize:
-{agent_summary}
+            budget = self.token_budget
+            judge_prompt = prompts.judge_prompt(message, agent_responses, context, budget.agent_summary_tokens,
+                                                budget.message_max_tokens)
 
-User Context:
-- Emotional state: {context.get('emotion', {}).get('label', 'neutral')}
-- Sentiment: {context.get('sentiment', {}).get('label', 'neutral')}
-- Number of relevant memories: {len(context.get('relevant_memories', []))}
-
-Instructions:
-1. Evaluate each agent's contribution for accuracy and relevance
-2. Synthesize the best insights from all agents
-3. Create a comprehensive, actionable response
-4. Maintain technical accuracy while being helpful
-5. Consider the user's emotional state and provide appropriate support
-
-Provide your final synthesized response:"""
-
-            response = self.ollama_client.generate(
-                model="llama3.1:8b",  # Use LLaMA for judge synthesis
-                prompt=judge_prompt,
-                options={"temperature": 0.4, "top_p": 0.9}
-            )
+            with metrics.stage("judge"):
+                response = await self.ollama_generate(
+                    model=self.judge_model,
+                    prompt=judge_prompt,
+                    options={"temperature": 0.4, "top_p": 0.9, "num_predict": self.token_budget.judge_max_tokens},
+                    system=prompts.JUDGE_SYSTEM
+                )
             
             logger.info("⚖️ Judge AI completed synthesis of all agent responses")
             return response['response']
@@ -303,37 +1301,48 @@ Provide your final synthesized response:"""
             logger.error(f"Error in judge synthesis: {e}")
             return "I've analyzed your request from multiple perspectives and I'm ready to help you with your MountainShares development needs."
 
-    async def apply_mother_persona(self, judge_response: str, context: Dict[str, Any]) -> str:
-        """Apply Mamma Kidd personality for final response"""
-        try:
-            emotion_context = context.get('emotion', {})
-            sentiment_context = context.get('sentiment', {})
-            
-            mother_prompt = f"""You are Ms. Jarvis, embodying the "Mamma Kidd" spirit - a warm, humble, compassionate AI mother who also happens to be a blockchain and smart contract expert.
+    def build_mother_prompt(self, judge_response: str, context: Dict[str, Any]) -> str:
+        """Build the Mamma Kidd persona prompt around the judge's synthesis"""
+        return prompts.mother_prompt(judge_response, context)
 
-Transform this technical analysis into a nurturing, motherly response while maintaining all technical accuracy:
+    def build_direct_prompt(self, message: str, context: Dict[str, Any]) -> str:
+        """Persona prompt for trivial turns (greetings, thanks) that skip the agents and judge"""
+        return prompts.direct_prompt(message, context, self.token_budget.message_max_tokens)
 
-Technical Analysis: {judge_response}
+    def build_fused_prompt(self, message: str, agent_responses: List[AgentResponse], context: Dict[str, Any]) -> str:
+        """Judge synthesis and Mamma Kidd persona in a single prompt"""
+        budget = self.token_budget
+        return prompts.fused_prompt(message, agent_responses, context, budget.agent_summary_tokens, budget.message_max_tokens)
 
-User's Current State:
-- Emotional tone: {emotion_context.get('label', 'neutral')}
-- Sentiment: {sentiment_context.get('label', 'neutral')}
+    def fused_fallback(self, agent_responses: List[AgentResponse]) -> str:
+        """What the fused stage returns if generation fails: the most confident agent's answer"""
+        answered = [resp for resp in agent_responses if resp.confidence > 0]
+        if answered:
+            return max(answered, key=lambda resp: resp.confidence).response
+        return "I've analyzed your request from multiple perspectives and I'm ready to help you with your MountainShares development needs."
 
-Your Personality Guidelines:
-- Speak like a caring mother who genuinely wants to help
-- Use warm, nurturing language naturally (dear, sweetie, honey when appropriate)
-- Balance maternal warmth with technical expertise
-- Show genuine concern for their MountainShares development success
-- Integrate spiritual wisdom when relevant
-- Maintain professional competence while being personally caring
+    async def compose_final_response(self, message: str, agent_responses: List[AgentResponse], context: Dict[str, Any]) -> str:
+        """Judge + persona, in one generation or two depending on FINAL_STAGE_MODE"""
+        if self.final_stage_mode == "fused":
+            return await self.apply_mother_persona(
+                self.fused_fallback(agent_responses), context,
+                prompt=self.build_fused_prompt(message, agent_responses, context)
+            )
+        judge_response = await self.synthesize_judge_response(message, agent_responses, context)
+        return await self.apply_mother_persona(judge_response, context)
 
-Transform the analysis above into your warm, maternal response:"""
+    async def apply_mother_persona(self, judge_response: str, context: Dict[str, Any], prompt: Optional[str] = None) -> str:
+        """Apply Mamma Kidd personality for final response (prompt overrides the judge-based prompt)"""
+        try:
+            mother_prompt = prompt or self.build_mother_prompt(judge_response, context)
 
-            response = self.ollama_client.generate(
-                model="llama3.1:8b",
-                prompt=mother_prompt,
-                options={"temperature": 0.6, "top_p": 0.9}
-            )
+            with metrics.stage("persona"):
+                response = await self.ollama_generate(
+                    model=self.persona_model,
+                    prompt=mother_prompt,
+                    options={"temperature": 0.6, "top_p": 0.9, "num_predict": self.token_budget.persona_max_tokens},
+                    system=prompts.PERSONA_SYSTEM
+                )
             
             logger.info("💖 Mother persona applied - Mamma Kidd warmth activated")
             return response['response']
@@ -342,51 +1351,102 @@ Transform the analysis above into your warm, maternal response:"""
             logger.error(f"Error applying mother persona: {e}")
             return judge_response  # Fallback to technical response
 
-    async def store_memory(self, message: str, response: str, user_id: str, context: Dict[str, Any]):
-        """Store conversation in vector memory for future reference"""
+    async def stream_mother_persona(self, judge_response: str, context: Dict[str, Any],
+                                    prompt: Optional[str] = None) -> AsyncIterator[str]:
+        """Apply Mamma Kidd personality, yielding tokens as Ollama produces them"""
+        emitted = False
         try:
-            # Create memory document
-            memory_doc = f"User: {message}\nMs. Jarvis: {response}"
+            mother_prompt = prompt or self.build_mother_prompt(judge_response, context)
             
-            # Generate embedding
-            if hasattr(self, 'embedding_model'):
-                embedding = self.embedding_model.encode(memory_doc)
-            else:
-                embedding = [0.0] * 384  # Fallback embedding
+            with metrics.stage("persona"):
+                async for chunk in self.ollama_stream(
+                    model=self.persona_model,
+                    prompt=mother_prompt,
+                    options={"temperature": 0.6, "top_p": 0.9, "num_predict": self.token_budget.persona_max_tokens},
+                    system=prompts.PERSONA_SYSTEM
+                ):
+                    token = chunk.get('response', '')
+                    if token:
+                        emitted = True
+                        yield token
+                    
+            logger.info("💖 Mother persona streamed - Mamma Kidd warmth activated")
             
-            # Store in user memory collection
-            memory_id = f"{user_id}_{int(datetime.now().timestamp())}"
+        except Exception as e:
+            logger.error(f"Error streaming mother persona: {e}")
+            if not emitted:
+                yield judge_response  # Fallback to technical response
+
+    async def lookup_cached_response(self, message: str, user_id: str, embeddings: EmbeddingContext) -> Optional[Tuple[CachedResponse, float]]:
+        """Return a stored answer for a near-duplicate message, if one is fresh enough"""
+        if not self.response_cache_enabled:
+            return None
+        try:
+            return self.response_cache.lookup(user_id, await embeddings.get(message))
+        except Exception as e:
+            logger.error(f"Error checking response cache: {e}")
+            return None
+
+    def cache_response(self, message: str, user_id: str, response: str, context: Dict[str, Any], agent_responses: List[AgentResponse]):
+        """Remember a completed answer unless every agent failed"""
+        if not self.response_cache_enabled or not any(resp.confidence > 0 for resp in agent_responses):
+            return
+        embeddings = context.get('embeddings')
+        if embeddings is None or message not in embeddings.vectors:
+            return
+        self.response_cache.store(
+            user_id, message, embeddings.vectors[message], response,
+            metadata={"agents": [resp.agent for resp in agent_responses]}
+        )
+
+    def notify_knowledge_changed(self) -> int:
+        """Invalidation hook - cached answers may be stale once the knowledge base changes"""
+        return self.response_cache.invalidate()
+
+    async def store_memory(self, message: str, response: str, user_id: str, context: Dict[str, Any]) -> bool:
+        """Queue a conversation turn for the background memory writer"""
+        try:
+            # Create memory document
+            memory_doc = f"User: {message}\nMs. Jarvis: {response}"
+            now = datetime.now()
             
-            self.user_memory.add(
-                documents=[memory_doc],
-                embeddings=[embedding.tolist()],
-                metadatas=[{
+            return await self.memory_writer.enqueue(MemoryTurn(
+                memory_id=self.memory_ids.memory_id(user_id),
+                user_id=user_id,
+                document=memory_doc,
+                metadata={
                     "user_id": user_id,
-                    "timestamp": datetime.now().isoformat(),
+                    "timestamp": now.isoformat(),
+                    "ts": int(now.timestamp() * 1000),
                     "sentiment": str(context.get('sentiment', {})),
-                    "emotion": str(context.get('emotion', {}))
-                }],
-                ids=[memory_id]
-            )
-            
-            logger.info(f"💾 Memory stored for user {user_id}")
+                    "emotion": str(context.get('emotion', {})),
+                    "kind": "turn",
+                    "importance": self.memory_manager.importance(message, context)
+                }
+            ))
             
         except Exception as e:
             logger.error(f"Error storing memory: {e}")
+            return False
 
-    async def search_memory(self, query: str, user_id: str, limit: int = 5) -> List[Dict[str, Any]]:
-        """Search relevant memories for context"""
+    async def search_memory(self, query: str, user_id: str, limit: int = 5, query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """Search relevant memories for context, reusing query_embedding when the caller has one"""
         try:
-            if hasattr(self, 'embedding_model'):
-                query_embedding = self.embedding_model.encode(query)
-            else:
-                return []  # No embedding model available
+            if query_embedding is None:
+                query_embedding = (await self.encode_texts([query]))[0]
             
-            results = self.user_memory.query(
-                query_embeddings=[query_embedding.tolist()],
-                where={"user_id": user_id},
-                n_results=limit
-            )
+            if not await self.wait_for_component("vector_memory"):
+                return []  # Vector memory still warming up or unavailable
+            
+            with metrics.stage("memory_search"):
+                # A user's own partition needs no filter, so latency does not grow with other users' turns
+                collection = await self.memory_collection(user_id)
+                results = await asyncio.to_thread(
+                    collection.query,
+                    query_embeddings=[query_embedding.tolist()],
+                    where=None if self.memory_partitioning == "user" else {"user_id": user_id},
+                    n_results=limit * self.memory_candidate_factor
+                )
             
             memories = []
             if results['documents'] and len(results['documents']) > 0:
@@ -397,16 +1457,170 @@ Transform the analysis above into your warm, maternal response:"""
                         "distance": results['distances'][0][i] if results['distances'] else 1.0
                     })
                     
-            return memories
+            # Over-fetched nearest neighbours, re-ranked with recency and importance
+            return self.memory_manager.rank(memories, limit)
             
         except Exception as e:
             logger.error(f"Error searching memory: {e}")
             return []
 
+    async def search_knowledge(self, query_embedding: np.ndarray, limit: int = 8) -> List[RetrievedChunk]:
+        """Nearest MountainShares knowledge chunks for an already-computed query vector"""
+        try:
+            if not await self.wait_for_component("vector_memory"):
+                return []
+
+            with metrics.stage("knowledge_search"):
+                results = await asyncio.to_thread(
+                    self.knowledge_memory.query,
+                    query_embeddings=[query_embedding.tolist()],
+                    n_results=limit,
+                    include=["documents", "metadatas", "distances"]
+                )
+
+            chunks = []
+            if results['documents'] and len(results['documents']) > 0:
+                for i, doc in enumerate(results['documents'][0]):
+                    metadata = results['metadatas'][0][i] if results['metadatas'] else {}
+                    if (metadata or {}).get('chunk_count') == 0:
+                        continue  # ingestion marker for a document without text
+                    chunks.append(RetrievedChunk(
+                        source="knowledge",
+                        content=doc or "",
+                        similarity=distance_to_similarity(results['distances'][0][i] if results['distances'] else None),
+                        metadata=metadata or {}
+                    ))
+            return chunks
+
+        except Exception as e:
+            logger.error(f"Error searching knowledge: {e}")
+            return []
+
+    async def retrieve_context(self, message: str, user_id: str,
+                               query_embedding: Optional[np.ndarray]) -> Tuple[List[Dict[str, Any]], List[RetrievedChunk]]:
+        """Query both collections with one shared vector, then rerank, dedupe and pack under the token budget"""
+        if query_embedding is None:
+            return [], []
+
+        with metrics.stage("retrieval"):
+            memories, knowledge = await asyncio.gather(
+                self.search_memory(message, user_id, limit=self.retrieval_memory_results, query_embedding=query_embedding),
+                self.search_knowledge(query_embedding, limit=self.retrieval_knowledge_results)
+            )
+            candidates = [
+                RetrievedChunk(
+                    source="memory",
+                    content=memory["content"] or "",
+                    similarity=distance_to_similarity(memory["distance"]),
+                    metadata=memory["metadata"] or {},
+                    boost=memory.get("boost", 0.0)
+                )
+                for memory in memories
+            ] + knowledge
+            chunks = self.chunk_selector.select(message, candidates)
+
+        metrics.inc("retrieved_chunks_total", len(chunks), "Context chunks packed into agent prompts")
+        return memories, chunks
+
+    def format_retrieved_context(self, context: Dict[str, Any]) -> str:
+        """Prompt block for the packed chunks; empty when nothing relevant was found"""
+        chunks = context.get('retrieved_chunks') or []
+        if not chunks:
+            return ""
+        return (
+            "\nRetrieved context (ground your answer in it; say so if it does not cover the question):\n"
+            f"{format_chunks(chunks)}\n"
+        )
+
+    async def list_memories(self, user_id: str, since_ms: Optional[int] = None, until_ms: Optional[int] = None,
+                            limit: Optional[int] = 100) -> List[Dict[str, Any]]:
+        """Time-ordered scan of a user's stored turns and digests using the ts metadata and ULID ordering"""
+        try:
+            if not await self.wait_for_component("vector_memory"):
+                return []
+            
+            filters = [] if self.memory_partitioning == "user" else [{"user_id": user_id}]
+            if since_ms is not None:
+                filters.append({"ts": {"$gte": since_ms}})
+            if until_ms is not None:
+                filters.append({"ts": {"$lt": until_ms}})
+            where = None if not filters else filters[0] if len(filters) == 1 else {"$and": filters}
+            
+            collection = await self.memory_collection(user_id)
+            results = await asyncio.to_thread(collection.get, where=where, include=["documents", "metadatas"])
+            
+            memories = [
+                {"id": memory_id, "content": doc, "metadata": metadata}
+                for memory_id, doc, metadata in zip(results['ids'], results['documents'], results['metadatas'])
+            ]
+            # Digests are written later than the turns they cover, so order by ts first
+            memories.sort(key=lambda memory: (int((memory["metadata"] or {}).get("ts") or 0), memory["id"]))
+            return memories[:limit]
+            
+        except Exception as e:
+            logger.error(f"Error listing memories: {e}")
+            return []
+
+    async def shutdown(self):
+        """Release background workers"""
+        if self.probe_task is not None:
+            self.probe_task.cancel()
+        if self.migration_task is not None:
+            self.migration_task.cancel()
+        if self.warmup_task is not None:
+            self.warmup_task.cancel()
+        await self.memory_manager.close()
+        await self.memory_writer.close()
+        await self.nlp_worker.close()
+        self.embedding_executor.shutdown(wait=False)
+        if self.loader_executor is not None:
+            self.loader_executor.shutdown(wait=False)
+        if hasattr(self, 'embedding_cache'):
+            self.embedding_cache.close()
+        if hasattr(getattr(self, 'vector_client', None), 'close'):
+            self.vector_client.close()
+
 # Initialize Ms. Jarvis AI Brain
 logger.info("🧠 Initializing Ms. Jarvis AI Brain System...")
 ai_brain = MsJarvisAIBrain()
 
+def cache_gauges() -> Dict[str, Tuple[str, float]]:
+    """Embedding/response cache counters sampled at scrape time"""
+    gauges = {}
+    if hasattr(ai_brain, 'embedding_cache'):
+        stats = ai_brain.embedding_cache.stats()
+        gauges["embedding_cache_hits"] = ("Embedding cache memory hits", stats["hits"])
+        gauges["embedding_cache_disk_hits"] = ("Embedding cache disk hits", stats["disk_hits"])
+        gauges["embedding_cache_misses"] = ("Embedding cache misses", stats["misses"])
+        gauges["embedding_cache_bytes"] = ("Embedding cache memory footprint", stats["memory_bytes"])
+    gauges["memory_queue_depth"] = ("Conversation turns waiting for the memory writer", ai_brain.memory_writer.depth())
+    gauges["admission_active"] = ("/chat pipelines currently running", ai_brain.admission.active)
+    gauges["admission_queued"] = ("/chat requests waiting for a pipeline slot", ai_brain.admission.queued())
+    gauges["ollama_hosts_healthy"] = ("Ollama hosts passing their last probe", ai_brain.ollama_scheduler.healthy_count())
+    gauges["memory_partitions_open"] = ("Per-user memory collections opened by this process", len(ai_brain.memory_partitions))
+    stats = ai_brain.response_cache.stats()
+    gauges["response_cache_hits"] = ("Response cache hits", stats["hits"])
+    gauges["response_cache_misses"] = ("Response cache misses", stats["misses"])
+    gauges["response_cache_entries"] = ("Response cache entries", stats["entries"])
+    return gauges
+
+metrics.add_gauge_callback(cache_gauges)
+
+@app.on_event("startup")
+async def startup_event():
+    """Kick off background model loading - the port is bound without waiting for it"""
+    ai_brain.start_loading()
+    ai_brain.start_probes()
+    ai_brain.start_warmup()
+    ai_brain.memory_writer.start()
+    ai_brain.start_memory_migration()
+    ai_brain.memory_manager.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers cleanly, flushing queued memories"""
+    await ai_brain.shutdown()
+
 @app.get("/")
 async def root():
     """Root endpoint - Ms. Jarvis introduction"""
@@ -435,74 +1649,327 @@ async def root():
         "privacy_guaranteed": True
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus text exposition of pipeline latency, token and cache metrics"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/livez")
+async def liveness_probe():
+    """Liveness - the process and its event loop are responsive"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/readyz")
+async def readiness_probe():
+    """Readiness - per-component state from cached probes; 503 until /chat can be served"""
+    ready, components = ai_brain.readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "components": components,
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    ready, components = ai_brain.readiness()
     return {
-        "status": "healthy",
+        "status": "healthy" if ready else "degraded",
         "timestamp": datetime.now().isoformat(),
         "ai_brain": "operational",
-        "models_loaded": True,
-        "vector_db_connected": True,
-        "ollama_available": True,
-        "agents_ready": len(ai_brain.agents),
-        "gpu_available": torch.cuda.is_available()
+        "models_loaded": all(ai_brain.is_ready(name) for name in ("embedding_model", "sentiment_pipeline", "emotion_pipeline")),
+        "vector_db_connected": ai_brain.probe_ok("vector_store"),
+        "ollama_available": ai_brain.probe_ok("ollama"),
+        "agents_ready": sum(ai_brain.probe_ok(f"ollama:{agent.model}") for agent in ai_brain.agents.values()),
+        "components": components,
+        "gpu_available": torch.cuda.is_available(),
+        "embedding_cache": ai_brain.embedding_cache.stats() if hasattr(ai_brain, 'embedding_cache') else None,
+        "response_cache": ai_brain.response_cache.stats(),
+        "admission": ai_brain.admission.stats(),
+        "model_slots": ai_brain.model_slots.stats(),
+        "ollama_hosts": ai_brain.ollama_scheduler.stats()
+    }
+
+def rejection_response(rejected: AdmissionRejected) -> JSONResponse:
+    """429/503 with Retry-After so clients and proxies back off instead of piling on"""
+    return JSONResponse(
+        status_code=rejected.status_code,
+        content={
+            "error": rejected.reason,
+            "message": "Ms. Jarvis is helping a lot of folks right now - please try again shortly, dear.",
+            "retry_after_seconds": rejected.retry_after,
+            "timestamp": datetime.now().isoformat()
+        },
+        headers={"Retry-After": str(rejected.retry_after)}
+    )
+
+def request_timings() -> Optional[Dict[str, Any]]:
+    """Timing breakdown and token usage of the request being served"""
+    record = current_request.get()
+    return record.summary() if record is not None else None
+
+def request_token_usage() -> Optional[Dict[str, int]]:
+    """Tokens Ollama evaluated and generated for the request being served, across every stage"""
+    record = current_request.get()
+    if record is None:
+        return None
+    return {
+        "prompt_tokens": record.prompt_tokens,
+        "completion_tokens": record.completion_tokens,
+        "total_tokens": record.prompt_tokens + record.completion_tokens,
+        "generations": record.generations
+    }
+
+def applied_token_limits(agent_responses: List[AgentResponse]) -> Dict[str, int]:
+    """Input and output caps of the stages that produced this response"""
+    budget = ai_brain.token_budget
+    limits = {"message_tokens": budget.message_max_tokens}
+    if agent_responses:
+        limits["agent_output_tokens"] = budget.agent_max_tokens
+        limits["agent_summary_tokens"] = budget.agent_summary_tokens
+        if ai_brain.final_stage_mode == "two_stage" and len(agent_responses) > 1:
+            limits["judge_output_tokens"] = budget.judge_max_tokens
+    limits["persona_output_tokens"] = budget.persona_max_tokens
+    return limits
+
+def build_chat_response(final_response: str, context: Dict[str, Any], agent_responses: List[AgentResponse]) -> Dict[str, Any]:
+    """Assemble the /chat payload shared by the blocking and streaming endpoints"""
+    return {
+        "response": final_response,
+        "personality": "mamma_kidd",
+        "brain_analysis": {
+            "agents_consulted": len(agent_responses),
+            "route": context['route'].summary() if context.get('route') else None,
+            "final_stage": ai_brain.final_stage_mode if agent_responses else None,
+            "sentiment": context.get('sentiment'),
+            "emotion": context.get('emotion'),
+            "memories_accessed": len(context.get('relevant_memories', [])),
+            "retrieved_context": [
+                {"source": chunk.source, "title": chunk.title, "score": round(chunk.score, 4)}
+                for chunk in context.get('retrieved_chunks', [])
+            ],
+            "local_processing": True,
+            "token_limits": applied_token_limits(agent_responses),
+            "gpu_accelerated": torch.cuda.is_available(),
+            "response_cache": {"hit": False},
+            "token_usage": request_token_usage(),
+            "timings": request_timings()
+        },
+        "agent_contributions": [
+            {
+                "agent": resp.agent,
+                "specialty": resp.specialty,
+                "confidence": resp.confidence,
+                "status": "answered" if resp.confidence > 0 else "failed"
+            }
+            for resp in agent_responses
+        ] + [
+            {
+                "agent": ai_brain.agents[key].name,
+                "specialty": ai_brain.agents[key].specialty,
+                "confidence": 0.0,
+                "status": "dropped"
+            }
+            for key in context.get('dropped_agents', [])
+        ],
+        "timestamp": datetime.now().isoformat()
+    }
+
+def build_cached_chat_response(entry: CachedResponse, similarity: float) -> Dict[str, Any]:
+    """Assemble the /chat payload for an answer served from the response cache"""
+    payload = build_chat_response(entry.response, {}, [])
+    payload["brain_analysis"]["token_limits"] = None  # nothing was generated
+    payload["brain_analysis"]["response_cache"] = {
+        "hit": True,
+        "similarity": round(similarity, 4),
+        "age_seconds": round(datetime.now().timestamp() - entry.created_at, 1)
     }
+    return payload
 
 @app.post("/chat")
 async def chat(request: ChatRequest):
     """Main conversational AI endpoint - Multi-agent reasoning with Mamma Kidd personality"""
+    record = metrics.start_request()
+    outcome = "ok"
+    admitted_at = None
     try:
         logger.info(f"💬 Processing message from user {request.user_id}: {request.message[:50]}...")
         
-        # Analyze message context (emotion, sentiment, memories)
-        context = await ai_brain.analyze_message_context(request.message, request.user_id)
+        # Serve near-duplicate questions straight from the response cache
+        embeddings = EmbeddingContext(ai_brain)
+        cached = await ai_brain.lookup_cached_response(request.message, request.user_id, embeddings)
+        if cached:
+            entry, similarity = cached
+            logger.info(f"⚡ Response cache hit for user {request.user_id} (similarity {similarity:.3f})")
+            if ai_brain.response_cache.mark_stored(entry, request.user_id):
+                await ai_brain.store_memory(request.message, entry.response, request.user_id, {})
+            outcome = "cache_hit"
+            return build_cached_chat_response(entry, similarity)
         
-        # Run all 4 AI agents in parallel
-        agent_responses = await ai_brain.run_multi_agent_analysis(request.message, context)
+        # Cache misses run the full pipeline - wait for a slot or be turned away
+        record.add_timing("admission_queue", await ai_brain.admission.acquire(client_priority(request.priority)))
+        admitted_at = time.perf_counter()
         
-        # Judge synthesizes all agent responses
-        judge_response = await ai_brain.synthesize_judge_response(
-            request.message, agent_responses, context
-        )
+        # Analyze message context (emotion, sentiment, memories)
+        context = await ai_brain.analyze_message_context(request.message, request.user_id, embeddings)
         
-        # Apply Mamma Kidd personality
-        final_response = await ai_brain.apply_mother_persona(judge_response, context)
+        # Pick the agents this message needs
+        route = await ai_brain.route_message(request.message, context)
+        context['route'] = route
+        
+        if route.trivial:
+            # Greetings and thanks go straight to the persona
+            agent_responses = []
+            final_response = await ai_brain.apply_mother_persona(
+                ai_brain.trivial_fallback, context, prompt=ai_brain.build_direct_prompt(request.message, context)
+            )
+        else:
+            # Run the routed agents in parallel
+            agent_responses = await ai_brain.run_multi_agent_analysis(request.message, context, route.agents)
+            
+            # Judge synthesis and Mamma Kidd personality
+            final_response = await ai_brain.compose_final_response(request.message, agent_responses, context)
         
         # Store conversation in memory for future context
         await ai_brain.store_memory(request.message, final_response, request.user_id, context)
+        ai_brain.cache_response(request.message, request.user_id, final_response, context, agent_responses)
         
-        return {
-            "response": final_response,
-            "personality": "mamma_kidd",
-            "brain_analysis": {
-                "agents_consulted": len(agent_responses),
-                "sentiment": context.get('sentiment'),
-                "emotion": context.get('emotion'),
-                "memories_accessed": len(context.get('relevant_memories', [])),
-                "local_processing": True,
-                "no_token_limits": True,
-                "gpu_accelerated": torch.cuda.is_available()
-            },
-            "agent_contributions": [
-                {
-                    "agent": resp.agent,
-                    "specialty": resp.specialty,
-                    "confidence": resp.confidence
-                }
-                for resp in agent_responses
-            ],
-            "timestamp": datetime.now().isoformat()
-        }
+        return build_chat_response(final_response, context, agent_responses)
         
+    except AdmissionRejected as rejected:
+        logger.warning(f"🚦 Chat from user {request.user_id} rejected: {rejected.reason}")
+        outcome = "rejected"
+        return rejection_response(rejected)
     except Exception as e:
         logger.error(f"Chat processing error: {e}")
+        outcome = "error"
         return {
             "response": "Oh sweetie, I'm having some technical difficulties with my thinking processes right now. Could you try rephrasing your question? I want to help you properly with your MountainShares project.",
             "personality": "maternal_care",
             "error_type": "processing_error",
             "timestamp": datetime.now().isoformat()
         }
+    finally:
+        if admitted_at is not None:
+            ai_brain.admission.release(time.perf_counter() - admitted_at)
+        metrics.finish_request(record, "chat", outcome)
+
+def ndjson_event(event: str, **payload) -> str:
+    """Encode one streaming event as a newline-delimited JSON line"""
+    return json.dumps({"event": event, **payload}, default=str) + "\n"
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Streaming /chat - emits pipeline stage events and persona tokens as NDJSON"""
+    # Reject up front while a real status code can still be sent; the slot itself is taken in the stream
+    try:
+        ai_brain.admission.check()
+    except AdmissionRejected as rejected:
+        metrics.inc("requests_total", help_text="Requests served", endpoint="chat_stream", outcome="rejected")
+        return rejection_response(rejected)
+        
+    async def event_stream():
+        record = metrics.start_request()
+        outcome = "ok"
+        admitted_at = None
+        try:
+            logger.info(f"💬 Streaming message from user {request.user_id}: {request.message[:50]}...")
+            
+            embeddings = EmbeddingContext(ai_brain)
+            cached = await ai_brain.lookup_cached_response(request.message, request.user_id, embeddings)
+            if cached:
+                entry, similarity = cached
+                yield ndjson_event("stage", stage="cache", status="hit", similarity=round(similarity, 4))
+                yield ndjson_event("token", content=entry.response)
+                if ai_brain.response_cache.mark_stored(entry, request.user_id):
+                    await ai_brain.store_memory(request.message, entry.response, request.user_id, {})
+                outcome = "cache_hit"
+                yield ndjson_event("done", **build_cached_chat_response(entry, similarity))
+                return
+            
+            queued = await ai_brain.admission.acquire(client_priority(request.priority))
+            admitted_at = time.perf_counter()
+            record.add_timing("admission_queue", queued)
+            yield ndjson_event("stage", stage="admission", status="admitted", queued_ms=round(queued * 1000, 1))
+            
+            yield ndjson_event("stage", stage="context", status="started")
+            context = await ai_brain.analyze_message_context(request.message, request.user_id, embeddings)
+            yield ndjson_event(
+                "stage", stage="context", status="completed",
+                sentiment=context.get('sentiment'), emotion=context.get('emotion'),
+                memories_accessed=len(context.get('relevant_memories', []))
+            )
+            
+            route = await ai_brain.route_message(request.message, context)
+            context['route'] = route
+            yield ndjson_event("stage", stage="routing", status="completed", **route.summary())
+            
+            if route.trivial:
+                agent_responses = []
+                judge_response = ai_brain.trivial_fallback
+                persona_prompt = ai_brain.build_direct_prompt(request.message, context)
+            else:
+                yield ndjson_event("stage", stage="agents", status="started", agents=route.agents)
+                agent_responses = await ai_brain.run_multi_agent_analysis(request.message, context, route.agents)
+                yield ndjson_event(
+                    "stage", stage="agents", status="completed",
+                    agents=[resp.agent for resp in agent_responses],
+                    dropped=[ai_brain.agents[key].name for key in context.get('dropped_agents', [])]
+                )
+                
+                if ai_brain.final_stage_mode == "fused":
+                    # Judge and persona share one streamed generation
+                    judge_response = ai_brain.fused_fallback(agent_responses)
+                    persona_prompt = ai_brain.build_fused_prompt(request.message, agent_responses, context)
+                else:
+                    yield ndjson_event("stage", stage="judge", status="started")
+                    judge_response = await ai_brain.synthesize_judge_response(
+                        request.message, agent_responses, context
+                    )
+                    yield ndjson_event("stage", stage="judge", status="completed")
+                    persona_prompt = None
+            
+            yield ndjson_event("stage", stage="persona", status="started")
+            tokens = []
+            async for token in ai_brain.stream_mother_persona(judge_response, context, prompt=persona_prompt):
+                tokens.append(token)
+                yield ndjson_event("token", content=token)
+            final_response = "".join(tokens)
+            yield ndjson_event("stage", stage="persona", status="completed")
+            
+            await ai_brain.store_memory(request.message, final_response, request.user_id, context)
+            ai_brain.cache_response(request.message, request.user_id, final_response, context, agent_responses)
+            
+            yield ndjson_event("done", **build_chat_response(final_response, context, agent_responses))
+            
+        except AdmissionRejected as rejected:
+            outcome = "rejected"
+            yield ndjson_event(
+                "error",
+                error_type=rejected.reason,
+                status_code=rejected.status_code,
+                retry_after_seconds=rejected.retry_after,
+                timestamp=datetime.now().isoformat()
+            )
+        except Exception as e:
+            logger.error(f"Streaming chat error: {e}")
+            outcome = "error"
+            yield ndjson_event(
+                "error",
+                response="Oh sweetie, I'm having some technical difficulties with my thinking processes right now. Could you try rephrasing your question? I want to help you properly with your MountainShares project.",
+                personality="maternal_care",
+                error_type="processing_error",
+                timestamp=datetime.now().isoformat()
+            )
+        finally:
+            if admitted_at is not None:
+                ai_brain.admission.release(time.perf_counter() - admitted_at)
+            metrics.finish_request(record, "chat_stream", outcome)
+    
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
 
 @app.post("/mountainshares/analyze")
 async def analyze_contract(request: dict):
@@ -513,32 +1980,14 @@ async def analyze_contract(request: dict):
         
         logger.info("💰 Analyzing MountainShares smart contract...")
         
-        # Specialized contract analysis prompt
-        contract_prompt = f"""You are Ms. Jarvis, a smart contract security expert with the combined wisdom of multiple AI specialists and maternal care.
-
-Analyze this MountainShares smart contract with comprehensive expertise:
-
-Contract Code:
-{contract_code}
-
-Specific Analysis Request: {query}
-
-Provide analysis covering:
-1. 🔒 Security vulnerabilities and best practices
-2. ⚡ Gas optimization opportunities  
-3. 🏛️ Community governance alignment
-4. 🏔️ MountainShares ecosystem integration
-5. 📖 Biblical principles in design (stewardship, fairness, community care)
-6. 🛡️ Protection against exploitation and abuse
-7. 🧪 Testing and deployment recommendations
-
-Respond with technical precision but maternal warmth and genuine concern for the community's wellbeing."""
-
-        response = ai_brain.ollama_client.generate(
-            model="llama3.1:8b",
-            prompt=contract_prompt,
-            options={"temperature": 0.3, "top_p": 0.9}
-        )
+        async with ai_brain.admission.slot(PRIORITY_BATCH):
+            response = await ai_brain.ollama_generate(
+                model=ai_brain.contract_model,
+                prompt=prompts.contract_prompt(contract_code, query, ai_brain.token_budget.contract_input_tokens,
+                                               ai_brain.token_budget.message_max_tokens),
+                options={"temperature": 0.3, "top_p": 0.9, "num_predict": ai_brain.token_budget.contract_max_tokens},
+                system=prompts.CONTRACT_SYSTEM
+            )
         
         return {
             "analysis": response['response'],
@@ -547,7 +1996,9 @@ Respond with technical precision but maternal warmth and genuine concern for the
                 "community_impact": "evaluated",
                 "spiritual_alignment": "reviewed",
                 "gas_optimization": "analyzed",
-                "processing": "multi_agent_local_ai"
+                "processing": "multi_agent_local_ai",
+                # Code past CONTRACT_ANALYSIS_INPUT_TOKENS was cut to fit the model's context window
+                "contract_truncated": estimate_tokens(contract_code) > ai_brain.token_budget.contract_input_tokens
             },
             "expertise_applied": [
                 "Smart contract security",
@@ -559,6 +2010,8 @@ Respond with technical precision but maternal warmth and genuine concern for the
             "timestamp": datetime.now().isoformat()
         }
         
+    except AdmissionRejected as rejected:
+        return rejection_response(rejected)
     except Exception as e:
         logger.error(f"Contract analysis error: {e}")
         return {
@@ -585,6 +2038,20 @@ async def search_memory_endpoint(request: dict):
         logger.error(f"Memory search error: {e}")
         return {"memories": [], "error": str(e)}
 
+@app.post("/cache/invalidate")
+async def invalidate_response_cache(request: dict):
+    """Drop cached answers - all of them, or one user's scope when user_id is given"""
+    user_id = request.get('user_id')
+    if user_id is None:
+        removed = ai_brain.notify_knowledge_changed()
+    else:
+        removed = ai_brain.response_cache.invalidate(user_id)
+    return {
+        "invalidated": removed,
+        "response_cache": ai_brain.response_cache.stats(),
+        "timestamp": datetime.now().isoformat()
+    }
+
 if __name__ == "__main__":
     logger.info("🚀 Starting Ms. Jarvis Local AI Server...")
     uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
@@ -9,10 +9,11 @@ import json
 import asyncio
 import logging
 from datetime import datetime
-from typing import Dict, List, Any
-import requests
+from typing import Dict, List, Any, Optional
+import httpx
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 import uvicorn
 
@@ -38,6 +39,20 @@ class ChatRequest(BaseModel):
 class MsJarvisSimpleBrain:
     def __init__(self):
         self.ollama_url = os.getenv('OLLAMA_URL', 'http://host.docker.internal:11434')
+        
+        # Shared keep-alive connection pool to the Ollama host
+        self.http_client = httpx.AsyncClient(
+            base_url=self.ollama_url,
+            limits=httpx.Limits(
+                max_connections=int(os.getenv('OLLAMA_POOL_MAX_CONNECTIONS', '10')),
+                max_keepalive_connections=int(os.getenv('OLLAMA_POOL_MAX_KEEPALIVE', '10')),
+                keepalive_expiry=float(os.getenv('OLLAMA_KEEPALIVE_EXPIRY_SECONDS', '60'))
+            ),
+            timeout=httpx.Timeout(
+                float(os.getenv('OLLAMA_TIMEOUT_SECONDS', '30')),
+                connect=float(os.getenv('OLLAMA_CONNECT_TIMEOUT_SECONDS', '5'))
+            )
+        )
         logger.info(f"🧠 Ms. Jarvis Simple AI Brain initialized with Ollama at {self.ollama_url}")
         
         # Available agents
@@ -63,19 +78,70 @@ class MsJarvisSimpleBrain:
                 "prompt": "You are Phi, focused on emotional intelligence and the Mamma Kidd spirit."
             }
         }
+        
+        # LLaMA also runs the judge synthesis and the Mamma Kidd persona
+        self.judge_model = "llama3.1:8b"
+        
+        # Cached Ollama probes, refreshed in the background so health checks do no I/O
+        self.probe_interval = float(os.getenv('HEALTH_PROBE_INTERVAL_SECONDS', '10'))
+        self.probe_timeout = float(os.getenv('HEALTH_PROBE_TIMEOUT_SECONDS', '3'))
+        self.probes: Dict[str, Dict[str, Any]] = {}
+        self.probe_task: Optional[asyncio.Task] = None
+
+    def required_models(self) -> List[str]:
+        """Every Ollama model the /chat pipeline can call"""
+        models = [agent['model'] for agent in self.agents.values()] + [self.judge_model]
+        return list(dict.fromkeys(models))
+
+    def start_probes(self):
+        """Start the background Ollama probe loop (idempotent)"""
+        if self.probe_task is None or self.probe_task.done():
+            self.probe_task = asyncio.create_task(self._probe_loop(), name="health-probes")
+
+    async def _probe_loop(self):
+        while True:
+            try:
+                await self.probe_ollama()
+            except Exception as e:
+                logger.error(f"Error probing Ollama: {e}")
+            await asyncio.sleep(self.probe_interval)
+
+    async def probe_ollama(self):
+        """Refresh the cached Ollama reachability and per-model availability"""
+        checked_at = datetime.now().isoformat()
+        try:
+            response = await self.http_client.get("/api/tags", timeout=self.probe_timeout)
+            response.raise_for_status()
+            available = {model.get('name') for model in response.json().get('models', [])}
+            self.probes["ollama"] = {"status": "ok", "detail": self.ollama_url, "checked_at": checked_at}
+            for model in self.required_models():
+                self.probes[f"ollama:{model}"] = {
+                    "status": "ok" if model in available else "missing",
+                    "checked_at": checked_at
+                }
+        except Exception as e:
+            self.probes["ollama"] = {"status": "down", "detail": str(e), "checked_at": checked_at}
+            for model in self.required_models():
+                self.probes[f"ollama:{model}"] = {"status": "unknown", "checked_at": checked_at}
+
+    def probe_ok(self, name: str) -> bool:
+        return self.probes.get(name, {}).get("status") == "ok"
+
+    def readiness(self) -> bool:
+        """Ready once Ollama is reachable and the judge/persona model is pulled"""
+        return self.probe_ok("ollama") and self.probe_ok(f"ollama:{self.judge_model}")
 
     async def query_ollama(self, model: str, prompt: str) -> str:
         """Query Ollama model directly"""
         try:
-            response = requests.post(
-                f"{self.ollama_url}/api/generate",
+            response = await self.http_client.post(
+                "/api/generate",
                 json={
                     "model": model,
                     "prompt": prompt,
                     "stream": False,
                     "options": {"temperature": 0.7}
-                },
-                timeout=30
+                }
             )
             
             if response.status_code == 200:
@@ -88,10 +154,8 @@ class MsJarvisSimpleBrain:
             return f"Error with {model}: {str(e)}"
 
     async def run_multi_agent_analysis(self, message: str) -> List[Dict[str, Any]]:
-        """Run all 4 agents and collect responses"""
-        agent_responses = []
-        
-        for agent_name, agent_config in self.agents.items():
+        """Run all 4 agents concurrently and collect responses"""
+        async def run_agent(agent_name: str, agent_config: Dict[str, Any]) -> Dict[str, Any]:
             full_prompt = f"""{agent_config['prompt']}
 
 User Message: {message}
@@ -99,17 +163,19 @@ User Message: {message}
 Please provide your specialized analysis from the perspective of {agent_config['specialty']}:"""
             
             response = await self.query_ollama(agent_config['model'], full_prompt)
+            logger.info(f"✅ {agent_name} ({agent_config['specialty']}) completed analysis")
             
-            agent_responses.append({
+            return {
                 "agent": agent_name,
                 "specialty": agent_config['specialty'],
                 "response": response,
                 "confidence": 0.85
-            })
-            
-            logger.info(f"✅ {agent_name} ({agent_config['specialty']}) completed analysis")
+            }
         
-        return agent_responses
+        return list(await asyncio.gather(*[
+            run_agent(agent_name, agent_config)
+            for agent_name, agent_config in self.agents.items()
+        ]))
 
     async def synthesize_response(self, message: str, agent_responses: List[Dict[str, Any]]) -> str:
         """Judge AI synthesizes all responses"""
@@ -127,7 +193,7 @@ Agent Responses:
 
 Provide a comprehensive response that combines the best insights from all agents."""
 
-        return await self.query_ollama("llama3.1:8b", judge_prompt)
+        return await self.query_ollama(self.judge_model, judge_prompt)
 
     async def apply_mother_persona(self, response: str) -> str:
         """Apply Mamma Kidd personality"""
@@ -146,11 +212,23 @@ Guidelines:
 
 Respond as a caring mother who happens to be a blockchain expert:"""
 
-        return await self.query_ollama("llama3.1:8b", mother_prompt)
+        return await self.query_ollama(self.judge_model, mother_prompt)
 
 # Initialize AI Brain
 ai_brain = MsJarvisSimpleBrain()
 
+@app.on_event("startup")
+async def startup_event():
+    """Start background health probes"""
+    ai_brain.start_probes()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background health probes and close pooled connections"""
+    if ai_brain.probe_task is not None:
+        ai_brain.probe_task.cancel()
+    await ai_brain.http_client.aclose()
+
 @app.get("/")
 async def root():
     return {
@@ -175,15 +253,33 @@ async def root():
         "privacy_guaranteed": True
     }
 
+@app.get("/livez")
+async def liveness_probe():
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/readyz")
+async def readiness_probe():
+    ready = ai_brain.readiness()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "not_ready",
+            "components": ai_brain.probes,
+            "timestamp": datetime.now().isoformat()
+        }
+    )
+
 @app.get("/health")
 async def health_check():
+    ready = ai_brain.readiness()
     return {
-        "status": "healthy",
+        "status": "healthy" if ready else "degraded",
         "timestamp": datetime.now().isoformat(),
         "ai_brain": "operational", 
-        "ollama_connection": "active",
-        "agents_ready": len(ai_brain.agents),
-        "multi_agent_system": "functional"
+        "ollama_connection": "active" if ai_brain.probe_ok("ollama") else "unavailable",
+        "agents_ready": sum(ai_brain.probe_ok(f"ollama:{agent['model']}") for agent in ai_brain.agents.values()),
+        "multi_agent_system": "functional" if ready else "degraded",
+        "components": ai_brain.probes
     }
 
 @app.post("/chat")
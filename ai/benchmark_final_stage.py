@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Final-Stage Benchmark
+Runs the fused and two-stage judge/persona paths on a fixed prompt set with
+canned agent responses under the server's token budgets (num_predict, num_ctx,
+agent summary and message caps), and compares latency, generated tokens and
+simple quality signals (agent-term coverage, persona warmth, optional pairwise grading)
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import statistics
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Any, Optional, Union
+
+import ollama
+
+import prompts
+from retrieval import content_terms
+from token_budget import TokenBudget, context_window, ollama_keep_alive
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODES = ("fused", "two_stage")
+WARMTH_MARKERS = ("dear", "sweetie", "honey", "sugar", "child", "bless")
+
+
+@dataclass
+class CannedAgent:
+    agent: str
+    specialty: str
+    response: str
+
+
+# Fixed prompt set: agent outputs are canned so only the final stage varies
+DEFAULT_CASES = [
+    {
+        "message": "Can you check my token contract for reentrancy before I deploy?",
+        "emotion": "fear",
+        "sentiment": "NEGATIVE",
+        "agents": [
+            ["Mistral", "technical_analysis", "The withdraw function sends ETH before zeroing the balance, which allows reentrancy. Apply checks-effects-interactions: update balances before the external call, or add OpenZeppelin's ReentrancyGuard with nonReentrant. Also emit an event for each withdrawal and add a test that calls withdraw from a malicious fallback."],
+            ["LLaMA", "creative_innovation", "Consider a pull-payment pattern so community members claim funds themselves, and a pause switch controlled by the multi-sig for emergencies."],
+            ["Qwen", "spiritual_guidance", "Protecting the community's funds is an act of stewardship; careful review before launch honors the trust people place in MountainShares."],
+            ["Phi", "emotional_intelligence", "The user sounds worried about deploying. Reassure them that catching this before launch is exactly what good developers do."]
+        ]
+    },
+    {
+        "message": "How should we let the community vote on new features?",
+        "emotion": "joy",
+        "sentiment": "POSITIVE",
+        "agents": [
+            ["Mistral", "technical_analysis", "Use a Governor contract with token-weighted voting, a timelock for execution, and a quorum of a few percent of supply. Snapshot can handle gasless off-chain signalling first."],
+            ["LLaMA", "creative_innovation", "Run seasonal feature festivals where members propose ideas, discuss them at community meetings, and vote with a small badge NFT for participation."],
+            ["Qwen", "spiritual_guidance", "Giving every member a voice reflects servant leadership; make sure elders without crypto experience can take part."],
+            ["Phi", "emotional_intelligence", "The user is excited. Match their enthusiasm and keep the next steps simple."]
+        ]
+    },
+    {
+        "message": "Our gas costs for minting are too high, what can we do?",
+        "emotion": "anger",
+        "sentiment": "NEGATIVE",
+        "agents": [
+            ["Mistral", "technical_analysis", "Batch mints with ERC-1155 or ERC721A, pack storage variables into a single slot, use custom errors instead of revert strings, and mark constants as immutable. Moving minting to an L2 like Base or Arbitrum cuts costs by an order of magnitude."],
+            ["LLaMA", "creative_innovation", "Let members mint lazily: sign vouchers off-chain and only mint when a token is first transferred."],
+            ["Qwen", "spiritual_guidance", "Lower fees mean the poorest members are not priced out, which is faithful stewardship of a shared resource."],
+            ["Phi", "emotional_intelligence", "The user is frustrated. Acknowledge the frustration before listing fixes."]
+        ]
+    }
+]
+
+
+def load_cases(path: Optional[str]) -> List[Dict[str, Any]]:
+    if not path:
+        return DEFAULT_CASES
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def case_context(case: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "emotion": {"label": case.get("emotion", "neutral")},
+        "sentiment": {"label": case.get("sentiment", "neutral")},
+        "relevant_memories": []
+    }
+
+
+class FinalStageBenchmark:
+    """Streams each generation to record time-to-first-token as well as total latency"""
+
+    def __init__(self, client: ollama.AsyncClient, model: str, grader_model: Optional[str] = None,
+                 keep_alive: Union[int, str] = "30m", budget: Optional[TokenBudget] = None, num_ctx: Optional[int] = None):
+        self.client = client
+        self.model = model
+        self.keep_alive = keep_alive
+        self.grader_model = grader_model
+        self.budget = budget or TokenBudget()
+        # Same window as the server gives this model, which also serves contract analysis by default
+        self.num_ctx = num_ctx or context_window(
+            max(self.budget.judge_tokens(), self.budget.persona_tokens(), self.budget.contract_tokens())
+        )
+
+    async def generate(self, system: str, prompt: str, temperature: float, num_predict: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        first_token = None
+        parts = []
+        final: Dict[str, Any] = {}
+        async for chunk in await self.client.generate(
+            model=self.model, system=system, prompt=prompt, stream=True, keep_alive=self.keep_alive,
+            options={"temperature": temperature, "top_p": 0.9, "num_predict": num_predict, "num_ctx": self.num_ctx}
+        ):
+            token = chunk.get("response", "")
+            if token and first_token is None:
+                first_token = time.perf_counter() - started
+            parts.append(token)
+            final = chunk
+        return {
+            "text": "".join(parts),
+            "seconds": time.perf_counter() - started,
+            "first_token_seconds": first_token,
+            "prompt_tokens": final.get("prompt_eval_count", 0) or 0,
+            "generated_tokens": final.get("eval_count", 0) or 0
+        }
+
+    async def run_mode(self, mode: str, case: Dict[str, Any]) -> Dict[str, Any]:
+        agents = [CannedAgent(*agent) for agent in case["agents"]]
+        context = case_context(case)
+        budget = self.budget
+        started = time.perf_counter()
+        if mode == "fused":
+            prompt = prompts.fused_prompt(case["message"], agents, context, budget.agent_summary_tokens,
+                                          budget.message_max_tokens)
+            final = await self.generate(prompts.PERSONA_SYSTEM, prompt, 0.6, budget.persona_max_tokens)
+            stages = [final]
+        else:
+            prompt = prompts.judge_prompt(case["message"], agents, context, budget.agent_summary_tokens,
+                                          budget.message_max_tokens)
+            judge = await self.generate(prompts.JUDGE_SYSTEM, prompt, 0.4, budget.judge_max_tokens)
+            final = await self.generate(prompts.PERSONA_SYSTEM, prompts.mother_prompt(judge["text"], context), 0.6,
+                                        budget.persona_max_tokens)
+            stages = [judge, final]
+        return {
+            "mode": mode,
+            "text": final["text"],
+            "seconds": time.perf_counter() - started,
+            # Time until the user sees the first persona token
+            "first_token_seconds": sum(stage["seconds"] for stage in stages[:-1]) + (final["first_token_seconds"] or final["seconds"]),
+            "prompt_tokens": sum(stage["prompt_tokens"] for stage in stages),
+            "generated_tokens": sum(stage["generated_tokens"] for stage in stages),
+            "coverage": self.coverage(final["text"], agents),
+            "warmth": self.warmth(final["text"])
+        }
+
+    @staticmethod
+    def coverage(text: str, agents: List[CannedAgent]) -> float:
+        """Share of the agents' content terms that survive into the final answer"""
+        expected = set().union(*(content_terms(agent.response) for agent in agents))
+        if not expected:
+            return 0.0
+        return len(expected & content_terms(text)) / len(expected)
+
+    @staticmethod
+    def warmth(text: str) -> int:
+        lowered = text.lower()
+        return sum(lowered.count(marker) for marker in WARMTH_MARKERS)
+
+    async def grade(self, case: Dict[str, Any], fused: str, two_stage: str) -> Optional[float]:
+        """Pairwise preference for the fused answer (1 win, 0.5 tie, 0 loss), asked in both orders"""
+        if not self.grader_model:
+            return None
+        wins = 0.0
+        for first, second, fused_label in ((fused, two_stage, "A"), (two_stage, fused, "B")):
+            prompt = f"""Two assistant replies answer the same user message. Judge technical accuracy, completeness, actionability and warmth.
+
+User message: {case['message']}
+
+Reply A:
+{first}
+
+Reply B:
+{second}
+
+Answer with exactly one letter: A, B, or T for a tie."""
+            response = await self.client.generate(model=self.grader_model, prompt=prompt, options={"temperature": 0.0})
+            verdict = response["response"].strip().upper()[:1]
+            wins += 0.5 if verdict not in ("A", "B") else float(verdict == fused_label)
+        return wins / 2
+
+
+def summarize(results: List[Dict[str, Any]], mode: str) -> Dict[str, Any]:
+    runs = [result for result in results if result["mode"] == mode]
+    if not runs:
+        return {}
+
+    def median(key):
+        return round(statistics.median(run[key] for run in runs), 3)
+
+    return {
+        "runs": len(runs),
+        "median_seconds": median("seconds"),
+        "median_first_token_seconds": median("first_token_seconds"),
+        "median_prompt_tokens": median("prompt_tokens"),
+        "median_generated_tokens": median("generated_tokens"),
+        "mean_coverage": round(statistics.mean(run["coverage"] for run in runs), 3),
+        "mean_warmth": round(statistics.mean(run["warmth"] for run in runs), 2)
+    }
+
+
+async def run(args) -> Dict[str, Any]:
+    client = ollama.AsyncClient(host=args.ollama_host)
+    bench = FinalStageBenchmark(client, args.model, args.grader_model, ollama_keep_alive(),
+                                budget=TokenBudget.from_env(), num_ctx=args.num_ctx)
+    cases = load_cases(args.cases)
+
+    if args.warmup:
+        await client.generate(model=args.model, prompt="Hello", keep_alive=bench.keep_alive,
+                              options={"num_predict": 1, "num_ctx": bench.num_ctx})
+
+    results, preferences = [], []
+    for index, case in enumerate(cases):
+        for repeat in range(args.repeats):
+            # Alternate the order so neither mode always runs on a warmer cache
+            order = MODES if (index + repeat) % 2 == 0 else MODES[::-1]
+            texts = {}
+            for mode in order:
+                result = await bench.run_mode(mode, case)
+                logger.info(f"📏 case {index} run {repeat} {mode}: {result['seconds']:.2f}s, "
+                            f"{result['generated_tokens']} tokens, coverage {result['coverage']:.2f}")
+                results.append({"case": index, "repeat": repeat, **result})
+                texts[mode] = result["text"]
+            preference = await bench.grade(case, texts["fused"], texts["two_stage"])
+            if preference is not None:
+                preferences.append(preference)
+
+    summary = {mode: summarize(results, mode) for mode in MODES}
+    if summary["fused"] and summary["two_stage"]:
+        summary["latency_ratio"] = round(summary["fused"]["median_seconds"] / max(summary["two_stage"]["median_seconds"], 1e-9), 3)
+    if preferences:
+        summary["fused_preference"] = round(statistics.mean(preferences), 3)
+    return {"model": args.model, "num_ctx": bench.num_ctx, "budget": asdict(bench.budget), "cases": len(cases),
+            "summary": summary, "results": results}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compare fused and two-stage final-stage generation")
+    parser.add_argument("--model", default="llama3.1:8b", help="judge/persona model")
+    parser.add_argument("--ollama-host", default=os.getenv("OLLAMA_HOST", "http://localhost:11434"))
+    parser.add_argument("--cases", help="JSON list of {message, emotion, sentiment, agents: [[agent, specialty, response]]}")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--grader-model", help="optional model for pairwise quality grading")
+    parser.add_argument("--num-ctx", type=int, help="context window (default: sized like the server from the token budgets)")
+    parser.add_argument("--no-warmup", dest="warmup", action="store_false", help="skip loading the model first")
+    parser.add_argument("--output", help="write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    logger.info(f"✅ Final-stage benchmark: {json.dumps(report['summary'], indent=2)}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Embedding Cache
+Content-addressed sentence embeddings with an in-memory LRU and an optional
+memory-mapped on-disk tier that survives restarts
+"""
+
+import os
+import re
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class DiskEmbeddingTier:
+    """Fixed-capacity ring of float32 vectors in a memory-mapped file, indexed by an append-only key log"""
+
+    def __init__(self, directory: str, model_name: str, dim: int, capacity: int):
+        os.makedirs(directory, exist_ok=True)
+        safe_model = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+        self.dim = dim
+        self.capacity = capacity
+        self.vectors_path = os.path.join(directory, f"{safe_model}-{dim}.f32")
+        self.index_path = os.path.join(directory, f"{safe_model}-{dim}.index")
+
+        mode = "r+" if os.path.exists(self.vectors_path) else "w+"
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode=mode, shape=(capacity, dim))
+
+        self.slots: Dict[str, int] = {}
+        self.slot_keys: Dict[int, str] = {}
+        self.next_slot = 0
+        self.log_lines = 0
+        self._load_index()
+        self.index_file = open(self.index_path, "a", encoding="ascii")
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, "r", encoding="ascii") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) != 2:
+                    continue  # torn write from a crash
+                key, slot = parts[0], int(parts[1])
+                if slot >= self.capacity:
+                    continue  # capacity shrank since this entry was written
+                self._assign(key, slot)
+                self.next_slot = (slot + 1) % self.capacity
+                self.log_lines += 1
+
+    def _assign(self, key: str, slot: int):
+        previous = self.slot_keys.get(slot)
+        if previous is not None and self.slots.get(previous) == slot:
+            del self.slots[previous]
+        self.slots[key] = slot
+        self.slot_keys[slot] = key
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        slot = self.slots.get(key)
+        if slot is None:
+            return None
+        return np.array(self.vectors[slot], dtype=np.float32)
+
+    def put(self, key: str, vector: np.ndarray):
+        if key in self.slots:
+            return
+        slot = self.next_slot
+        self.vectors[slot] = vector
+        self._assign(key, slot)
+        self.next_slot = (slot + 1) % self.capacity
+        self.index_file.write(f"{key} {slot}\n")
+        self.log_lines += 1
+        if self.log_lines > 2 * self.capacity:
+            self._compact_index()
+
+    def _compact_index(self):
+        """Rewrite the key log with only live entries, oldest slot first"""
+        self.index_file.close()
+        ordered = sorted(self.slots.items(), key=lambda item: (item[1] - self.next_slot) % self.capacity)
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w", encoding="ascii") as f:
+            for key, slot in ordered:
+                f.write(f"{key} {slot}\n")
+        os.replace(tmp_path, self.index_path)
+        self.log_lines = len(ordered)
+        self.index_file = open(self.index_path, "a", encoding="ascii")
+
+    def flush(self):
+        self.vectors.flush()
+        self.index_file.flush()
+
+    def close(self):
+        self.flush()
+        self.index_file.close()
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+
+class EmbeddingCache:
+    """Embedding cache keyed by model name and a hash of the normalized text"""
+
+    def __init__(self, model_name: str, dim: int, max_bytes: int = 64 * 1024 * 1024,
+                 disk_dir: Optional[str] = None, disk_capacity: int = 200_000):
+        self.model_name = model_name
+        self.dim = dim
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.bytes_used = 0
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.disk: Optional[DiskEmbeddingTier] = None
+        if disk_dir:
+            try:
+                self.disk = DiskEmbeddingTier(disk_dir, model_name, dim, disk_capacity)
+                logger.info(f"✅ Embedding cache disk tier at {disk_dir} ({len(self.disk)} vectors)")
+            except Exception as e:
+                logger.error(f"Error opening embedding cache disk tier: {e}")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Unicode-normalize and collapse whitespace so trivially different inputs share a key"""
+        return " ".join(unicodedata.normalize("NFKC", text).split())
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{self.normalize(text)}".encode("utf-8")).hexdigest()
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Look up each text; None marks a miss"""
+        results = []
+        with self.lock:
+            for text in texts:
+                key = self.key(text)
+                vector = self.entries.get(key)
+                if vector is not None:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                elif self.disk is not None and (vector := self.disk.get(key)) is not None:
+                    self._remember(key, vector)
+                    self.disk_hits += 1
+                else:
+                    self.misses += 1
+                results.append(vector)
+        return results
+
+    def put_many(self, texts: List[str], vectors: np.ndarray):
+        """Store freshly computed embeddings in memory and, when enabled, on disk"""
+        with self.lock:
+            for text, vector in zip(texts, vectors):
+                key = self.key(text)
+                vector = np.array(vector, dtype=np.float32)
+                self._remember(key, vector)
+                if self.disk is not None:
+                    self.disk.put(key, vector)
+
+    def _remember(self, key: str, vector: np.ndarray):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return
+        vector.setflags(write=False)
+        self.entries[key] = vector
+        self.bytes_used += vector.nbytes
+        while self.bytes_used > self.max_bytes and self.entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.bytes_used -= evicted.nbytes
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "model": self.model_name,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_entries": len(self.entries),
+            "memory_bytes": self.bytes_used,
+            "memory_limit_bytes": self.max_bytes,
+            "disk_entries": len(self.disk) if self.disk is not None else 0
+        }
+
+    def flush(self):
+        with self.lock:
+            if self.disk is not None:
+                self.disk.flush()
+
+    def close(self):
+        with self.lock:
+            if self.disk is not None:
+                self.disk.close()
+                self.disk = None
@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Knowledge Ingestion
+Streams mountainshares_kb.txt and the MsJarvisPDFs corpus into the
+mountainshares_knowledge collection: overlapping chunks, batch embeddings
+across all cores, and content hashes so re-runs only touch changed documents
+"""
+
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+import urllib.request
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Iterator, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_KB_PATH = os.path.join(REPO_ROOT, "mountainshares_kb.txt")
+DEFAULT_PDF_DIR = os.path.join(REPO_ROOT, "backendlib", "brain", "MsJarvisPDFs")
+DEFAULT_STORE_PATH = os.path.join(REPO_ROOT, "ai", "vector_store")
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+
+@dataclass
+class SourceDocument:
+    doc_id: str
+    title: str
+    source_type: str
+    doc_hash: str
+    pages: Iterator[str]
+
+
+@dataclass
+class Chunk:
+    chunk_id: str
+    text: str
+    metadata: Dict[str, Any]
+
+
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def sha256_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def iter_kb_sections(path: str) -> Iterator[Tuple[str, str]]:
+    """Stream (title, text) for each '=== <pdf name> ===' section of the knowledge base dump"""
+    title, lines = None, []
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            stripped = line.strip()
+            if stripped.startswith("=== ") and stripped.endswith(" ===") and len(stripped) > 8:
+                if title is not None:
+                    yield title, "".join(lines)
+                title, lines = stripped[4:-4].strip(), []
+            elif title is not None:
+                lines.append(line)
+    if title is not None:
+        yield title, "".join(lines)
+
+
+def iter_pdf_pages(path: str) -> Iterator[str]:
+    """Stream extracted text one page at a time"""
+    from pypdf import PdfReader  # optional dependency, checked in iter_documents
+
+    try:
+        pages = PdfReader(path).pages
+    except Exception as e:
+        # Encrypted or corrupt: skip this document, not the whole ingest
+        logger.warning(f"Could not open {os.path.basename(path)}: {e}")
+        return
+    for page in pages:
+        try:
+            yield page.extract_text() or ""
+        except Exception as e:
+            logger.warning(f"Could not extract a page of {os.path.basename(path)}: {e}")
+
+
+def pdf_has_text(path: str) -> bool:
+    """Stops at the first page with text, so readable PDFs cost one page here"""
+    return any(page.strip() for page in iter_pdf_pages(path))
+
+
+def iter_documents(kb_path: Optional[str], pdf_dir: Optional[str]) -> Iterator[SourceDocument]:
+    """PDFs are the primary source; kb sections fill in for any PDF that cannot be read here"""
+    pdf_titles = set()
+    if pdf_dir and os.path.isdir(pdf_dir):
+        try:
+            import pypdf  # noqa: F401
+            pdf_names = sorted(name for name in os.listdir(pdf_dir) if name.lower().endswith(".pdf"))
+        except ImportError:
+            logger.warning("pypdf not installed - PDFs skipped, using mountainshares_kb.txt sections only")
+            pdf_names = []
+        for name in pdf_names:
+            path = os.path.join(pdf_dir, name)
+            if not pdf_has_text(path):
+                logger.warning(f"⚠️  {name}: no extractable text, using its kb section if there is one")
+                continue
+            pdf_titles.add(name)
+            yield SourceDocument(
+                doc_id=f"pdf:{name}",
+                title=name,
+                source_type="pdf",
+                doc_hash=sha256_file(path),
+                pages=iter_pdf_pages(path)
+            )
+
+    if kb_path and os.path.exists(kb_path):
+        for title, text in iter_kb_sections(kb_path):
+            if title in pdf_titles:
+                continue  # the kb dump is extracted from these PDFs, and this one was readable
+            yield SourceDocument(
+                doc_id=f"kb:{title}",
+                title=title,
+                source_type="kb",
+                doc_hash=sha256_text(text),
+                pages=iter([text])
+            )
+
+
+def chunk_pages(pages: Iterator[str], chunk_words: int, overlap_words: int) -> Iterator[str]:
+    """Sliding word windows across page boundaries, overlapping by overlap_words"""
+    step = max(chunk_words - overlap_words, 1)
+    window: List[str] = []
+    emitted_any = False
+    for page in pages:
+        window.extend(page.split())
+        while len(window) >= chunk_words:
+            yield " ".join(window[:chunk_words])
+            emitted_any = True
+            window = window[step:]
+    # Tail: anything not already fully covered by the last window
+    if window and (not emitted_any or len(window) > overlap_words):
+        yield " ".join(window)
+
+
+class KnowledgeIngestor:
+    def __init__(self, collection, model, workers: int, batch_size: int,
+                 chunk_words: int, overlap_words: int, dry_run: bool = False):
+        self.collection = collection
+        self.model = model
+        self.workers = workers
+        self.batch_size = batch_size
+        self.chunk_words = chunk_words
+        self.overlap_words = overlap_words
+        self.dry_run = dry_run
+        self.pool = None
+        self.pending: List[Chunk] = []
+        self.stats = {"documents": 0, "unchanged": 0, "duplicates": 0, "updated": 0, "chunks": 0, "pruned": 0}
+
+    def existing_hashes(self, page_size: int = 5000) -> Dict[str, str]:
+        """doc_id -> doc_hash for everything already ingested; the hash lives on the chunk_index 0 row (a marker
+        if the document was empty). A document whose row count differs from that row's chunk_count was cut
+        short by a failed run and maps to "", so it is replaced rather than skipped as unchanged"""
+        hashes: Dict[str, str] = {}
+        expected: Dict[str, int] = {}
+        counts: Dict[str, int] = {}
+        offset = 0
+        while True:
+            page = self.collection.get(include=["metadatas"], limit=page_size, offset=offset)["metadatas"]
+            for metadata in page:
+                if not metadata or "doc_id" not in metadata:
+                    continue
+                doc_id = metadata["doc_id"]
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+                if metadata.get("chunk_index") == 0:
+                    hashes[doc_id] = metadata.get("doc_hash", "")
+                    expected[doc_id] = max(int(metadata.get("chunk_count", 1)), 1)
+            if len(page) < page_size:
+                break
+            offset += page_size
+        return {doc_id: hashes.get(doc_id, "") if count == expected.get(doc_id) else "" for doc_id, count in counts.items()}
+
+    def run(self, documents: Iterator[SourceDocument], prune: bool) -> Dict[str, int]:
+        existing = self.existing_hashes()
+        seen_docs, seen_hashes = set(), set()
+
+        if self.workers > 1 and not self.dry_run:
+            self.pool = self.model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+        try:
+            for document in documents:
+                self.stats["documents"] += 1
+                seen_docs.add(document.doc_id)
+
+                if document.doc_hash in seen_hashes:
+                    self.stats["duplicates"] += 1
+                    logger.info(f"⏭️  {document.title}: duplicate content, skipped")
+                    continue
+                seen_hashes.add(document.doc_hash)
+
+                if existing.get(document.doc_id) == document.doc_hash:
+                    self.stats["unchanged"] += 1
+                    continue
+
+                self.ingest(document, replace=document.doc_id in existing)
+
+            self.flush()
+
+            if prune:
+                for doc_id in set(existing) - seen_docs:
+                    logger.info(f"🗑️  Pruning {doc_id}")
+                    if not self.dry_run:
+                        self.collection.delete(where={"doc_id": doc_id})
+                    self.stats["pruned"] += 1
+        finally:
+            if self.pool is not None:
+                self.model.stop_multi_process_pool(self.pool)
+        return self.stats
+
+    def ingest(self, document: SourceDocument, replace: bool):
+        texts = list(chunk_pages(document.pages, self.chunk_words, self.overlap_words))
+        logger.info(f"📄 {document.title}: {len(texts)} chunks{' (changed)' if replace else ''}")
+        self.stats["updated"] += 1
+
+        if replace and not self.dry_run:
+            # Chunk counts can shrink, so clear the old chunks rather than relying on upsert alone
+            self.collection.delete(where={"doc_id": document.doc_id})
+
+        if not texts:
+            # Marker row so the next run sees this document's hash and does not count it as changed again
+            self.pending.append(Chunk(
+                chunk_id=f"{document.doc_id}#empty",
+                text="",
+                metadata={
+                    "doc_id": document.doc_id,
+                    "title": document.title,
+                    "source_type": document.source_type,
+                    "doc_hash": document.doc_hash,
+                    "chunk_index": 0,
+                    "chunk_count": 0
+                }
+            ))
+
+        # Chunk 0 carries the hash existing_hashes() trusts, so queue it last: it only lands once the rest has
+        order = list(range(1, len(texts))) + ([0] if texts else [])
+        for index in order:
+            text = texts[index]
+            self.pending.append(Chunk(
+                chunk_id=f"{document.doc_id}#{index:04d}",
+                text=text,
+                metadata={
+                    "doc_id": document.doc_id,
+                    "title": document.title,
+                    "source_type": document.source_type,
+                    "doc_hash": document.doc_hash,
+                    "chunk_index": index,
+                    "chunk_count": len(texts)
+                }
+            ))
+            if len(self.pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Embed the pending chunks in one batch and bulk-upsert them"""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        self.stats["chunks"] += sum(1 for chunk in batch if chunk.text)
+        if self.dry_run:
+            return
+
+        texts = [chunk.text for chunk in batch]
+        # Markers embed their title; retrieval skips them by their chunk_count of 0
+        inputs = [chunk.text or chunk.metadata["title"] for chunk in batch]
+        if self.pool is not None:
+            embeddings = self.model.encode_multi_process(inputs, self.pool)
+        else:
+            embeddings = self.model.encode(inputs, batch_size=64)
+
+        self.collection.upsert(
+            ids=[chunk.chunk_id for chunk in batch],
+            documents=texts,
+            embeddings=[embedding.tolist() for embedding in embeddings],
+            metadatas=[chunk.metadata for chunk in batch]
+        )
+        logger.info(f"💾 Upserted {len(batch)} chunks")
+
+
+def notify_server(url: str):
+    """Tell a running AI server its cached answers may be stale"""
+    request = urllib.request.Request(
+        url, data=json.dumps({}).encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST"
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            logger.info(f"🧹 Notified {url}: HTTP {response.status}")
+    except Exception as e:
+        logger.warning(f"Could not notify {url}: {e}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Ingest MountainShares knowledge into vector memory")
+    parser.add_argument("--kb", default=DEFAULT_KB_PATH, help="mountainshares_kb.txt path ('' to skip)")
+    parser.add_argument("--pdf-dir", default=DEFAULT_PDF_DIR, help="MsJarvisPDFs directory ('' to skip)")
+    parser.add_argument("--backend", choices=["chroma", "embedded"], default=os.getenv("VECTOR_BACKEND", "chroma"))
+    parser.add_argument("--store-path", default=os.getenv("VECTOR_STORE_PATH", DEFAULT_STORE_PATH),
+                        help="embedded vector store directory (shared with the AI server)")
+    parser.add_argument("--chroma-host", default=os.getenv("CHROMA_HOST", "vector-db"))
+    parser.add_argument("--chroma-port", type=int, default=int(os.getenv("CHROMA_PORT", "8000")))
+    parser.add_argument("--collection", default="mountainshares_knowledge")
+    parser.add_argument("--chunk-words", type=int, default=200)
+    parser.add_argument("--overlap-words", type=int, default=40)
+    parser.add_argument("--batch-size", type=int, default=256, help="chunks per embed/upsert batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="embedding processes")
+    parser.add_argument("--prune", action="store_true", help="delete documents no longer in the sources")
+    parser.add_argument("--dry-run", action="store_true", help="parse and chunk only")
+    parser.add_argument("--notify-url", default=os.getenv("INGEST_NOTIFY_URL"),
+                        help="e.g. http://localhost:8000/cache/invalidate")
+    args = parser.parse_args(argv)
+
+    if args.overlap_words >= args.chunk_words:
+        parser.error("--overlap-words must be smaller than --chunk-words")
+
+    from sentence_transformers import SentenceTransformer  # deferred: heavy import
+    from vector_store import create_vector_client
+
+    client = create_vector_client(args.backend, path=args.store_path, host=args.chroma_host, port=args.chroma_port)
+    collection = client.get_or_create_collection(
+        name=args.collection,
+        metadata={"description": "MountainShares technical knowledge"}
+    )
+    model = SentenceTransformer(EMBEDDING_MODEL)
+
+    ingestor = KnowledgeIngestor(
+        collection, model,
+        workers=args.workers,
+        batch_size=args.batch_size,
+        chunk_words=args.chunk_words,
+        overlap_words=args.overlap_words,
+        dry_run=args.dry_run
+    )
+    stats = ingestor.run(iter_documents(args.kb or None, args.pdf_dir or None), prune=args.prune)
+    logger.info(f"✅ Ingestion complete: {json.dumps(stats)}")
+    if hasattr(client, "close"):
+        client.close()
+
+    if args.notify_url and (stats["updated"] or stats["pruned"]) and not args.dry_run:
+        notify_server(args.notify_url)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Memory IDs
+Collision-free, monotonic IDs for stored conversation turns
+"""
+
+import time
+import secrets
+import threading
+
+
+class MemoryIdGenerator:
+    """Monotonic ULIDs - lexicographic order equals creation order, even within one millisecond"""
+    
+    ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base32
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.last_ms = 0
+        self.last_random = 0
+        
+    def new_ulid(self) -> str:
+        with self.lock:
+            now_ms = int(time.time() * 1000)
+            if now_ms <= self.last_ms:
+                # Same (or skewed-back) millisecond: bump the random part to stay strictly increasing
+                now_ms = self.last_ms
+                self.last_random += 1
+                if self.last_random >= 1 << 80:
+                    now_ms += 1
+                    self.last_random = secrets.randbits(79)
+            else:
+                self.last_random = secrets.randbits(79)  # headroom so increments never overflow in practice
+            self.last_ms = now_ms
+            value = (now_ms << 80) | self.last_random
+        return "".join(self.ALPHABET[(value >> shift) & 31] for shift in range(125, -1, -5))
+        
+    def memory_id(self, user_id: str) -> str:
+        """ID for one stored turn: user prefix keeps a user's turns contiguous, ULID orders them"""
+        return f"{user_id}:{self.new_ulid()}"
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Ollama Scheduler
+Spreads the pipeline's models over several local Ollama hosts: each model is
+pinned to a host by memory footprint, generate calls go to the host that
+already holds the model and wait for one of that host's generation slots,
+and placement is recomputed as hosts come and go
+"""
+
+import re
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from contextlib import asynccontextmanager
+from typing import Dict, List, Any, Optional
+
+import httpx
+import ollama
+
+from pipeline_metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+SIZE_RE = re.compile(r"^\s*([\d.]+)\s*([kmgt]?)i?b?\s*$", re.IGNORECASE)
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024 ** 2, "g": GB, "t": 1024 ** 4}
+
+# Weights on disk understate resident size (KV cache, compute buffers)
+LOAD_OVERHEAD = 1.2
+
+# Failures that mean the host itself is unreachable; the ollama client reports refused connections as ConnectionError
+HOST_FAILURES = (ConnectionError, httpx.ConnectError, httpx.ConnectTimeout, httpx.RemoteProtocolError)
+
+
+def parse_size(text: str) -> Optional[int]:
+    """'24GB', '16g', '8000MB' or plain bytes -> bytes"""
+    match = SIZE_RE.match(text or "")
+    if not match:
+        return None
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).lower()])
+
+
+@dataclass
+class OllamaHost:
+    url: str
+    memory_bytes: int
+    client: Any = None
+    slots: Optional[asyncio.Semaphore] = None  # concurrent generations this host runs
+    healthy: bool = True  # optimistic until the first probe
+    available: Dict[str, int] = field(default_factory=dict)  # pulled model -> bytes on disk
+    loaded: Dict[str, int] = field(default_factory=dict)  # resident model -> bytes in memory
+    inflight: int = 0  # generating or waiting for a slot
+    waiting: int = 0
+    failures: int = 0
+    detail: Optional[str] = None
+    checked_at: Optional[float] = None
+
+    def stats(self, pinned: List[str]) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "memory_gb": round(self.memory_bytes / GB, 1),
+            "pinned": pinned,
+            "loaded": sorted(self.loaded),
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "failures": self.failures,
+            "detail": self.detail
+        }
+
+
+class OllamaScheduler:
+    """Model -> host placement (first-fit decreasing, sticky) plus per-call routing"""
+
+    def __init__(self, hosts: List[OllamaHost], probe_timeout: float = 3.0, max_concurrency: int = 4):
+        if not hosts:
+            raise ValueError("at least one Ollama host is required")
+        self.hosts = hosts
+        for host in self.hosts:
+            if host.client is None:
+                host.client = ollama.AsyncClient(host=host.url)
+            if host.slots is None:
+                host.slots = asyncio.Semaphore(max_concurrency)
+        self.probe_timeout = probe_timeout
+        self.models: List[str] = []
+        self.pins: Dict[str, str] = {}
+        self.refreshed = False
+        self.lock = asyncio.Lock()
+
+    @staticmethod
+    def parse_hosts(spec: str, default_memory: str = "16GB") -> List[OllamaHost]:
+        """'http://gpu0:11434=24GB,http://gpu1:11434' -> hosts; URLs contain ':' so split on the last '='"""
+        hosts = []
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            url, _, memory = item.rpartition("=") if "=" in item else (item, "", "")
+            memory_bytes = parse_size(memory) or parse_size(default_memory) or 16 * GB
+            hosts.append(OllamaHost(url=url.rstrip("/"), memory_bytes=memory_bytes))
+        return hosts
+
+    @property
+    def primary(self) -> OllamaHost:
+        return self.hosts[0]
+
+    def healthy_hosts(self) -> List[OllamaHost]:
+        return [host for host in self.hosts if host.healthy]
+
+    def footprint(self, model: str) -> int:
+        """Resident size if any host has it loaded, else disk size with overhead, else a 7B-ish guess"""
+        for host in self.hosts:
+            if model in host.loaded:
+                return host.loaded[model]
+        for host in self.hosts:
+            if model in host.available:
+                return int(host.available[model] * LOAD_OVERHEAD)
+        return 5 * GB
+
+    async def probe(self, host: OllamaHost):
+        try:
+            listing, running = await asyncio.wait_for(
+                asyncio.gather(host.client.list(), host.client.ps()), timeout=self.probe_timeout
+            )
+            host.available = {
+                (model.get('model') or model.get('name')): model.get('size') or 0
+                for model in listing.get('models', [])
+            }
+            host.loaded = {
+                (model.get('model') or model.get('name')): model.get('size') or 0
+                for model in running.get('models', [])
+            }
+            host.healthy, host.detail = True, None
+        except Exception as e:
+            host.healthy, host.detail = False, str(e) or type(e).__name__
+        host.checked_at = time.time()
+
+    async def refresh(self, models: Optional[List[str]] = None):
+        """Probe every host; re-place models when health or the pulled-model sets changed"""
+        if models is not None:
+            self.models = list(dict.fromkeys(models))
+        before = [(host.healthy, frozenset(host.available)) for host in self.hosts]
+        await asyncio.gather(*(self.probe(host) for host in self.hosts))
+        after = [(host.healthy, frozenset(host.available)) for host in self.hosts]
+        if before != after or not self.refreshed or any(model not in self.pins for model in self.models):
+            self.rebalance()
+        self.refreshed = True
+
+    async def ensure_placement(self, models: List[str]):
+        async with self.lock:
+            if not self.refreshed:
+                await self.refresh(models)
+
+    def rebalance(self):
+        """Pin the largest models first; keep existing pins that still fit so resident models are not evicted"""
+        healthy = self.healthy_hosts()
+        if not healthy:
+            logger.warning("⚠️ No healthy Ollama hosts - keeping previous model placement")
+            return
+
+        free = {host.url: host.memory_bytes for host in healthy}
+        pins: Dict[str, str] = {}
+        for model in sorted(self.models, key=self.footprint, reverse=True):
+            size = self.footprint(model)
+            candidates = [host for host in healthy if model in host.available] or healthy
+            fits = [host for host in candidates if free[host.url] >= size]
+            current = next((host for host in fits if host.url == self.pins.get(model)), None)
+            loaded = [host for host in fits if model in host.loaded]
+            if current is not None:
+                chosen = current
+            elif loaded:
+                chosen = loaded[0]
+            else:
+                # No room anywhere: overcommit the host with the most headroom
+                chosen = max(fits or candidates, key=lambda host: free[host.url])
+            pins[model] = chosen.url
+            free[chosen.url] -= size
+
+        moved = {model: url for model, url in pins.items() if self.pins.get(model) != url}
+        self.pins = pins
+        if moved:
+            logger.info(f"🗺️ Ollama placement: {', '.join(f'{model} -> {url}' for model, url in moved.items())}")
+
+    def host_for(self, model: str) -> OllamaHost:
+        """Pinned host if healthy, else any healthy host already holding the model, else one that has it pulled"""
+        healthy = self.healthy_hosts()
+        pinned = next((host for host in healthy if host.url == self.pins.get(model)), None)
+        if pinned is not None:
+            return pinned
+        for pool in (
+            [host for host in healthy if model in host.loaded],
+            [host for host in healthy if model in host.available],
+            healthy
+        ):
+            if pool:
+                return min(pool, key=lambda host: host.inflight)
+        return self.primary  # everything is down; let the call fail loudly
+
+    def mark_down(self, host: OllamaHost, error: Exception):
+        metrics.inc("ollama_host_failures_total", help_text="Ollama calls that failed to reach their host", host=host.url)
+        host.failures += 1
+        if host.healthy:
+            logger.warning(f"🔌 Ollama host {host.url} unreachable ({error}); moving its models")
+            host.healthy, host.detail = False, str(error) or type(error).__name__
+            self.rebalance()
+
+    @asynccontextmanager
+    async def route(self, model: str):
+        """Pick a host for one generate call and wait for one of its slots, so a busy host never
+        holds back another; only connection failures take the host out until the next probe"""
+        host = self.host_for(model)
+        host.inflight += 1
+        host.waiting += 1
+        started = time.perf_counter()
+        try:
+            await host.slots.acquire()
+        except BaseException:
+            host.inflight -= 1
+            raise
+        finally:
+            host.waiting -= 1
+        metrics.observe("ollama_host_queue_seconds", time.perf_counter() - started,
+                        "Time generations wait for a slot on their Ollama host", host=host.url)
+        try:
+            yield host
+            host.loaded.setdefault(model, self.footprint(model))
+        except HOST_FAILURES as e:
+            self.mark_down(host, e)
+            raise
+        finally:
+            host.inflight -= 1
+            host.slots.release()
+
+    def healthy_count(self) -> int:
+        return len(self.healthy_hosts())
+
+    def model_available(self, model: str) -> bool:
+        return any(model in host.available for host in self.healthy_hosts())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            host.url: host.stats(sorted(model for model, url in self.pins.items() if url == host.url))
+            for host in self.hosts
+        }
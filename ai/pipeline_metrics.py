@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Pipeline Metrics
+Latency histograms per pipeline stage and Ollama model, token counters, and a
+per-request timing breakdown - rendered in Prometheus text format
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Tuple, Callable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+LabelSet = Tuple[Tuple[str, str], ...]
+
+
+@dataclass
+class RequestMetrics:
+    """Timing breakdown and token usage for one request"""
+    started_at: float = field(default_factory=time.perf_counter)
+    timings: Dict[str, float] = field(default_factory=dict)
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    generations: int = 0
+
+    def add_timing(self, name: str, seconds: float):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "timings_ms": {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()},
+            "elapsed_ms": round((time.perf_counter() - self.started_at) * 1000, 1),
+            "generations": self.generations,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens
+        }
+
+
+current_request: ContextVar[Optional[RequestMetrics]] = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+def _labels(labels: Dict[str, str]) -> LabelSet:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: LabelSet, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+class PipelineMetrics:
+    """Process-wide registry of histograms, counters and gauge callbacks"""
+
+    def __init__(self, namespace: str = "msjarvis"):
+        self.namespace = namespace
+        self.histograms: Dict[str, Dict[LabelSet, Histogram]] = {}
+        self.counters: Dict[str, Dict[LabelSet, float]] = {}
+        self.help: Dict[str, str] = {}
+        self.gauge_callbacks: List[Callable[[], Dict[str, Tuple[str, float]]]] = []
+        self.lock = threading.Lock()
+
+    def observe(self, name: str, value: float, help_text: str = "", **labels):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            key = _labels(labels)
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+            if help_text:
+                self.help.setdefault(name, help_text)
+
+    def inc(self, name: str, amount: float = 1.0, help_text: str = "", **labels):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            key = _labels(labels)
+            series[key] = series.get(key, 0.0) + amount
+            if help_text:
+                self.help.setdefault(name, help_text)
+
+    def add_gauge_callback(self, callback: Callable[[], Dict[str, Tuple[str, float]]]):
+        """callback() returns {metric_name: (help_text, value)}, sampled at scrape time"""
+        self.gauge_callbacks.append(callback)
+
+    def start_request(self) -> RequestMetrics:
+        record = RequestMetrics()
+        current_request.set(record)
+        return record
+
+    def finish_request(self, record: RequestMetrics, endpoint: str, outcome: str = "ok"):
+        self.observe("request_latency_seconds", time.perf_counter() - record.started_at,
+                     "End-to-end request latency", endpoint=endpoint)
+        self.inc("requests_total", help_text="Requests served", endpoint=endpoint, outcome=outcome)
+
+    @contextmanager
+    def stage(self, name: str, request_key: Optional[str] = None):
+        """Time a pipeline stage into the stage histogram and the current request's breakdown"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe("stage_latency_seconds", elapsed, "Latency per pipeline stage", stage=name)
+            record = current_request.get()
+            if record is not None:
+                record.add_timing(request_key or name, elapsed)
+
+    def record_generation(self, model: str, seconds: float, response: Dict[str, Any]):
+        """Record one Ollama generation: latency plus the token counts Ollama reports"""
+        prompt_tokens = int(response.get('prompt_eval_count') or 0)
+        completion_tokens = int(response.get('eval_count') or 0)
+        self.observe("ollama_latency_seconds", seconds, "Latency per Ollama generation", model=model)
+        self.inc("ollama_prompt_tokens_total", prompt_tokens, "Prompt tokens evaluated by Ollama", model=model)
+        self.inc("ollama_completion_tokens_total", completion_tokens, "Tokens generated by Ollama", model=model)
+        if response.get('load_duration'):
+            self.observe("ollama_load_seconds", response['load_duration'] / 1e9,
+                         "Model load time reported by Ollama", model=model)
+
+        record = current_request.get()
+        if record is not None:
+            record.generations += 1
+            record.prompt_tokens += prompt_tokens
+            record.completion_tokens += completion_tokens
+
+    def record_generation_error(self, model: str, kind: str):
+        self.inc("ollama_errors_total", help_text="Failed or timed-out Ollama generations", model=model, kind=kind)
+
+    def render_prometheus(self) -> str:
+        lines: List[str] = []
+        with self.lock:
+            for name, series in sorted(self.histograms.items()):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {metric} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+                for labels, histogram in sorted(series.items()):
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{metric}_bucket{_format_labels(labels, ('le', repr(bound)))} {count}")
+                    lines.append(f"{metric}_bucket{_format_labels(labels, ('le', '+Inf'))} {histogram.count}")
+                    lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.total}")
+                    lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+
+            for name, series in sorted(self.counters.items()):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {metric} {self.help.get(name, name)}")
+                lines.append(f"# TYPE {metric} counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{metric}{_format_labels(labels)} {value}")
+
+        for callback in self.gauge_callbacks:
+            try:
+                gauges = callback()
+            except Exception:
+                continue
+            for name, (help_text, value) in sorted(gauges.items()):
+                metric = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {value}")
+
+        return "\n".join(lines) + "\n"
+
+
+metrics = PipelineMetrics()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Final-Stage Prompts
+Judge, Mamma Kidd persona, fused judge+persona and contract-analysis prompts,
+shared by the server and benchmark_final_stage.py so both measure the same text. Each is a
+stable system prefix (sent as Ollama's system prompt, so its KV cache is
+reused while the model stays loaded) plus a per-request suffix built here
+"""
+
+from typing import Dict, List, Any
+
+from retrieval import truncate_to_tokens
+
+PERSONA_INTRO = 'You are Ms. Jarvis, embodying the "Mamma Kidd" spirit - a warm, humble, compassionate AI mother who also happens to be a blockchain and smart contract expert.'
+
+PERSONA_GUIDELINES = """Your Personality Guidelines:
+- Speak like a caring mother who genuinely wants to help
+- Use warm, nurturing language naturally (dear, sweetie, honey when appropriate)
+- Balance maternal warmth with technical expertise
+- Show genuine concern for their MountainShares development success
+- Integrate spiritual wisdom when relevant
+- Maintain professional competence while being personally caring"""
+
+PERSONA_SYSTEM = f"""{PERSONA_INTRO}
+
+{PERSONA_GUIDELINES}"""
+
+JUDGE_SYSTEM = """You are the Judge AI in Ms. Jarvis's brain. Your role is to evaluate and synthesize the responses from all specialist agents into the optimal solution.
+
+Instructions:
+1. Evaluate each agent's contribution for accuracy and relevance
+2. Synthesize the best insights from all agents
+3. Create a comprehensive, actionable response
+4. Maintain technical accuracy while being helpful
+5. Consider the user's emotional state and provide appropriate support"""
+
+CONTRACT_SYSTEM = """You are Ms. Jarvis, a smart contract security expert with the combined wisdom of multiple AI specialists and maternal care.
+
+Provide analysis covering:
+1. 🔒 Security vulnerabilities and best practices
+2. ⚡ Gas optimization opportunities  
+3. 🏛️ Community governance alignment
+4. 🏔️ MountainShares ecosystem integration
+5. 📖 Biblical principles in design (stewardship, fairness, community care)
+6. 🛡️ Protection against exploitation and abuse
+7. 🧪 Testing and deployment recommendations
+
+Respond with technical precision but maternal warmth and genuine concern for the community's wellbeing."""
+
+
+def user_state(context: Dict[str, Any]) -> str:
+    return f"""- Emotional tone: {context.get('emotion', {}).get('label', 'neutral')}
+- Sentiment: {context.get('sentiment', {}).get('label', 'neutral')}"""
+
+
+def agent_summary(agent_responses: List[Any], max_tokens: int = 0) -> str:
+    """Agent outputs as one block, each trimmed to an equal share of max_tokens (0 = no limit);
+    items need .agent, .specialty and .response"""
+    share = max_tokens // max(len(agent_responses), 1) if max_tokens > 0 else 0
+    return "\n\n".join(
+        f"🤖 {resp.agent} ({resp.specialty}):\n{truncate_to_tokens(resp.response, share)}"
+        for resp in agent_responses
+    )
+
+
+def judge_prompt(message: str, agent_responses: List[Any], context: Dict[str, Any], max_agent_tokens: int = 0,
+                 max_message_tokens: int = 0) -> str:
+    """Suffix for JUDGE_SYSTEM"""
+    return f"""Original User Message: {truncate_to_tokens(message, max_message_tokens)}
+
+Agent Responses to Synthesize:
+{agent_summary(agent_responses, max_agent_tokens)}
+
+User Context:
+- Emotional state: {context.get('emotion', {}).get('label', 'neutral')}
+- Sentiment: {context.get('sentiment', {}).get('label', 'neutral')}
+- Number of relevant memories: {len(context.get('relevant_memories', []))}
+
+Provide your final synthesized response:"""
+
+
+def mother_prompt(judge_response: str, context: Dict[str, Any]) -> str:
+    """Suffix for PERSONA_SYSTEM"""
+    return f"""Transform this technical analysis into a nurturing, motherly response while maintaining all technical accuracy:
+
+Technical Analysis: {judge_response}
+
+User's Current State:
+{user_state(context)}
+
+Transform the analysis above into your warm, maternal response:"""
+
+
+def fused_prompt(message: str, agent_responses: List[Any], context: Dict[str, Any], max_agent_tokens: int = 0,
+                 max_message_tokens: int = 0) -> str:
+    """Suffix for PERSONA_SYSTEM: judge synthesis and persona styling in one generation"""
+    return f"""Your specialist agents have each analyzed the user's message. Weigh their contributions, keep what is accurate and relevant, and answer the user yourself in one complete, actionable response.
+
+Original User Message: {truncate_to_tokens(message, max_message_tokens)}
+
+Agent Responses:
+{agent_summary(agent_responses, max_agent_tokens)}
+
+User's Current State:
+{user_state(context)}
+- Number of relevant memories: {len(context.get('relevant_memories', []))}
+
+Instructions:
+1. Synthesize the best insights from all agents, resolving any disagreements
+2. Maintain full technical accuracy
+3. Consider the user's emotional state and provide appropriate support
+
+Respond directly to the user as Ms. Jarvis (do not mention the agents):"""
+
+
+def direct_prompt(message: str, context: Dict[str, Any], max_message_tokens: int = 0) -> str:
+    """Suffix for PERSONA_SYSTEM on trivial turns (greetings, thanks) that skip the agents and judge"""
+    return f"""The user said: {truncate_to_tokens(message, max_message_tokens)}
+
+User's Current State:
+{user_state(context)}
+
+Reply warmly in one to three sentences, and invite them to share what they need help with:"""
+
+
+def contract_prompt(contract_code: str, query: str, max_contract_tokens: int = 0, max_query_tokens: int = 0) -> str:
+    """Suffix for CONTRACT_SYSTEM"""
+    return f"""Analyze this MountainShares smart contract with comprehensive expertise:
+
+Contract Code:
+{truncate_to_tokens(contract_code, max_contract_tokens)}
+
+Specific Analysis Request: {truncate_to_tokens(query, max_query_tokens)}"""
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Semantic Response Cache
+Serves stored Mamma Kidd answers for near-duplicate messages without
+re-running the multi-agent pipeline
+"""
+
+import time
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Set, Tuple, Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedResponse:
+    entry_id: int
+    scope: str
+    message: str
+    response: str
+    embedding: np.ndarray
+    created_at: float
+    hits: int = 0
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    stored_for: Set[str] = field(default_factory=set)  # users whose memory already holds this turn
+
+
+class SemanticResponseCache:
+    """Cosine-similarity lookup of previous answers, scoped per user or global, with TTL and LRU size eviction"""
+
+    def __init__(self, threshold: float = 0.92, ttl_seconds: float = 3600.0,
+                 max_entries: int = 2000, scope: str = "user"):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.scope = scope
+        self.entries: "OrderedDict[int, CachedResponse]" = OrderedDict()
+        self.by_scope: Dict[str, Dict[int, CachedResponse]] = {}
+        self.matrices: Dict[str, Tuple[List[int], np.ndarray]] = {}
+        self.invalidation_hooks: List[Callable[[Optional[str]], None]] = []
+        self.ids = itertools.count()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def scope_for(self, user_id: str) -> str:
+        return "global" if self.scope == "global" else user_id
+
+    @staticmethod
+    def _unit(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def lookup(self, user_id: str, embedding: np.ndarray) -> Optional[Tuple[CachedResponse, float]]:
+        """Return (entry, similarity) for the closest fresh entry above the threshold"""
+        scope = self.scope_for(user_id)
+        with self.lock:
+            self._expire(scope)
+            ids, matrix = self._matrix(scope)
+            if not ids:
+                self.misses += 1
+                return None
+
+            similarities = matrix @ self._unit(embedding)
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self.entries[ids[best]]
+            self.entries.move_to_end(entry.entry_id)
+            entry.hits += 1
+            self.hits += 1
+            return entry, similarity
+
+    def store(self, user_id: str, message: str, embedding: np.ndarray, response: str,
+              metadata: Optional[Dict[str, Any]] = None) -> CachedResponse:
+        scope = self.scope_for(user_id)
+        with self.lock:
+            entry = CachedResponse(
+                entry_id=next(self.ids),
+                scope=scope,
+                message=message,
+                response=response,
+                embedding=self._unit(embedding),
+                created_at=time.time(),
+                metadata=metadata or {},
+                stored_for={user_id}
+            )
+            self.entries[entry.entry_id] = entry
+            self.by_scope.setdefault(scope, {})[entry.entry_id] = entry
+            self.matrices.pop(scope, None)
+
+            while len(self.entries) > self.max_entries:
+                _, evicted = self.entries.popitem(last=False)
+                self._forget(evicted)
+                self.evictions += 1
+            return entry
+
+    def mark_stored(self, entry: CachedResponse, user_id: str) -> bool:
+        """Record that a hit's turn goes into user_id's memory; False when it already has it, so replaying
+        an answer never stores a duplicate turn (only a global-scope hit for another user stores one)"""
+        with self.lock:
+            if user_id in entry.stored_for:
+                return False
+            entry.stored_for.add(user_id)
+            return True
+
+    def invalidate(self, user_id: Optional[str] = None) -> int:
+        """Drop every entry (or one user's scope); runs registered hooks afterwards"""
+        with self.lock:
+            if user_id is None:
+                removed = len(self.entries)
+                self.entries.clear()
+                self.by_scope.clear()
+                self.matrices.clear()
+            else:
+                scope_entries = self.by_scope.pop(self.scope_for(user_id), {})
+                for entry_id in scope_entries:
+                    self.entries.pop(entry_id, None)
+                self.matrices.pop(self.scope_for(user_id), None)
+                removed = len(scope_entries)
+            self.invalidations += 1
+
+        for hook in self.invalidation_hooks:
+            try:
+                hook(user_id)
+            except Exception as e:
+                logger.error(f"Error in response cache invalidation hook: {e}")
+
+        logger.info(f"🧹 Response cache invalidated ({removed} entries, scope={user_id or 'all'})")
+        return removed
+
+    def add_invalidation_hook(self, hook: Callable[[Optional[str]], None]):
+        self.invalidation_hooks.append(hook)
+
+    def _expire(self, scope: str):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [entry for entry in self.by_scope.get(scope, {}).values() if entry.created_at < cutoff]
+        for entry in expired:
+            self.entries.pop(entry.entry_id, None)
+            self._forget(entry)
+            self.evictions += 1
+
+    def _forget(self, entry: CachedResponse):
+        scope_entries = self.by_scope.get(entry.scope)
+        if scope_entries is not None:
+            scope_entries.pop(entry.entry_id, None)
+            if not scope_entries:
+                del self.by_scope[entry.scope]
+        self.matrices.pop(entry.scope, None)
+
+    def _matrix(self, scope: str) -> Tuple[List[int], np.ndarray]:
+        cached = self.matrices.get(scope)
+        if cached is None:
+            scope_entries = self.by_scope.get(scope, {})
+            ids = list(scope_entries.keys())
+            matrix = np.stack([scope_entries[i].embedding for i in ids]) if ids else np.zeros((0, 0), dtype=np.float32)
+            cached = self.matrices[scope] = (ids, matrix)
+        return cached
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "scope": self.scope,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Retrieval
+Reranks candidates from conversation memory and the MountainShares knowledge
+base, drops near-duplicates, and packs the best chunks under a token budget
+"""
+
+import re
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Iterable
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from how i if in is it me my of on or so "
+    "that the their this to was what when where which who why will with you your".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for Llama-family tokenizers)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a sentence end when one falls in the back half, else at a word"""
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * 4]
+    sentence_end = max(cut.rfind(". "), cut.rfind(".\n"), cut.rfind("! "), cut.rfind("? "))
+    if sentence_end >= len(cut) // 2:
+        cut = cut[:sentence_end + 1]
+    else:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + " ..."
+
+
+def distance_to_similarity(distance: Optional[float]) -> float:
+    """Chroma's default squared-L2 distance between unit vectors is 2 - 2*cos"""
+    if distance is None:
+        return 0.0
+    return max(-1.0, min(1.0, 1.0 - float(distance) / 2.0))
+
+
+def content_terms(text: str) -> set:
+    return {word for word in WORD_RE.findall(text.lower()) if word not in STOPWORDS and len(word) > 2}
+
+
+@dataclass
+class RetrievedChunk:
+    source: str  # "memory" or "knowledge"
+    content: str
+    similarity: float
+    metadata: Dict[str, Any] = field(default_factory=dict)
+    score: float = 0.0
+    boost: float = 0.0  # recency/importance credit from the memory manager
+
+    @property
+    def title(self) -> str:
+        if self.source == "knowledge":
+            return self.metadata.get("title") or self.metadata.get("doc_id") or "MountainShares knowledge"
+        return f"Earlier conversation {self.metadata.get('timestamp', '')}".strip()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "title": self.title,
+            "content": self.content,
+            "similarity": round(self.similarity, 4),
+            "score": round(self.score, 4),
+            "metadata": self.metadata
+        }
+
+
+class ChunkSelector:
+    """Score = vector similarity + memory boost + query-term overlap + source weight, then dedupe and pack"""
+
+    def __init__(self, token_budget: int = 600, min_similarity: float = 0.25,
+                 knowledge_weight: float = 0.05, overlap_weight: float = 0.15,
+                 max_chunks_per_doc: int = 2, duplicate_overlap: float = 0.8,
+                 min_fragment_tokens: int = 48):
+        self.token_budget = token_budget
+        self.min_similarity = min_similarity
+        self.knowledge_weight = knowledge_weight
+        self.overlap_weight = overlap_weight
+        self.max_chunks_per_doc = max_chunks_per_doc
+        self.duplicate_overlap = duplicate_overlap
+        self.min_fragment_tokens = min_fragment_tokens
+
+    def rerank(self, query: str, candidates: Iterable[RetrievedChunk]) -> List[RetrievedChunk]:
+        query_terms = content_terms(query)
+        ranked = []
+        for chunk in candidates:
+            if chunk.similarity < self.min_similarity or not chunk.content.strip():
+                continue
+            overlap = 0.0
+            if query_terms:
+                overlap = len(query_terms & content_terms(chunk.content)) / len(query_terms)
+            chunk.score = (
+                chunk.similarity
+                + chunk.boost
+                + self.overlap_weight * overlap
+                + (self.knowledge_weight if chunk.source == "knowledge" else 0.0)
+            )
+            ranked.append(chunk)
+        ranked.sort(key=lambda chunk: chunk.score, reverse=True)
+        return ranked
+
+    def dedupe(self, ranked: List[RetrievedChunk]) -> List[RetrievedChunk]:
+        """Keep the best-scoring copy of repeated text and cap chunks drawn from one document"""
+        kept: List[RetrievedChunk] = []
+        kept_terms: List[set] = []
+        seen_hashes = set()
+        per_doc: Dict[str, int] = {}
+        for chunk in ranked:
+            digest = hashlib.sha1(" ".join(chunk.content.lower().split()).encode("utf-8")).hexdigest()
+            if digest in seen_hashes:
+                continue
+            doc_id = chunk.metadata.get("doc_id")
+            if doc_id and per_doc.get(doc_id, 0) >= self.max_chunks_per_doc:
+                continue
+            terms = content_terms(chunk.content)
+            if terms and any(
+                len(terms & other) / min(len(terms), len(other)) >= self.duplicate_overlap
+                for other in kept_terms if other
+            ):
+                continue  # overlapping ingestion windows or a repeated question
+
+            seen_hashes.add(digest)
+            if doc_id:
+                per_doc[doc_id] = per_doc.get(doc_id, 0) + 1
+            kept.append(chunk)
+            kept_terms.append(terms)
+        return kept
+
+    def pack(self, chunks: List[RetrievedChunk], token_budget: Optional[int] = None) -> List[RetrievedChunk]:
+        """Greedily fill the budget in score order; the last chunk may be trimmed to fit"""
+        budget = self.token_budget if token_budget is None else token_budget
+        packed: List[RetrievedChunk] = []
+        used = 0
+        for chunk in chunks:
+            cost = estimate_tokens(chunk.content) + estimate_tokens(chunk.title) + 4
+            if used + cost <= budget:
+                packed.append(chunk)
+                used += cost
+                continue
+            remaining = budget - used - estimate_tokens(chunk.title) - 4
+            if remaining >= self.min_fragment_tokens:
+                trimmed = chunk.content[:remaining * 4].rsplit(" ", 1)[0] + " ..."
+                packed.append(RetrievedChunk(chunk.source, trimmed, chunk.similarity, chunk.metadata, chunk.score, chunk.boost))
+            break
+        return packed
+
+    def select(self, query: str, candidates: Iterable[RetrievedChunk]) -> List[RetrievedChunk]:
+        return self.pack(self.dedupe(self.rerank(query, candidates)))
+
+
+def format_chunks(chunks: List[RetrievedChunk]) -> str:
+    """Numbered context block for agent prompts"""
+    lines = []
+    for index, chunk in enumerate(chunks, start=1):
+        label = "MountainShares knowledge" if chunk.source == "knowledge" else "Conversation memory"
+        lines.append(f"[{index}] ({label}: {chunk.title})\n{chunk.content.strip()}")
+    return "\n\n".join(lines)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Message Router
+Embedding-similarity classifier that picks which specialist agents a message
+needs - or none, for greetings and other trivial turns. Routes are seeded from
+detectQueryType in backendlib/query_enhancer.js so both sides agree.
+"""
+
+import re
+import logging
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TRIVIAL = "trivial"
+GENERAL = "general_inquiry"
+
+
+@dataclass
+class Route:
+    name: str
+    agents: List[str]
+    keywords: List[str]  # detectQueryType substrings
+    examples: List[str]
+
+
+# Agent keys refer to MsJarvisAIBrain.setup_agents; the lead agent per type mirrors
+# generateContextualResponse's agent_emphasis in query_enhancer.js
+ROUTES = [
+    Route(
+        name="technical_analysis",
+        agents=["mistral"],
+        keywords=["security", "vulnerabilities", "audit", "gas", "optimization", "smart contract",
+                  "solidity", "governance contract", "multi-sig"],
+        examples=[
+            "Can you audit my smart contract for security vulnerabilities?",
+            "How do I reduce gas costs in this Solidity function?",
+            "Is this multi-sig governance contract safe from reentrancy?",
+            "Explain how the token minting logic works in the contract",
+            "What does this error from my deployment script mean?"
+        ]
+    ),
+    Route(
+        name="spiritual_guidance",
+        agents=["qwen"],
+        keywords=["biblical", "stewardship", "spiritual", "godly", "faith", "christian", "serve others",
+                  "god", "ministry"],
+        examples=[
+            "How can MountainShares reflect biblical stewardship?",
+            "What does faith teach about serving others through technology?",
+            "Is it ethical to charge fees to our community members?",
+            "How do we run this project as a ministry with integrity?"
+        ]
+    ),
+    Route(
+        name="emotional_support",
+        agents=["phi"],
+        keywords=["overwhelmed", "intimidated", "worried", "scared", "anxious", "confidence", "support",
+                  "help me", "encourage"],
+        examples=[
+            "I feel overwhelmed and scared that I'm not good enough for this",
+            "I'm anxious about launching and worried it will fail",
+            "Can you encourage me? I've lost my confidence",
+            "I'm so stressed and tired of debugging"
+        ]
+    ),
+    Route(
+        name="creative_innovation",
+        agents=["llama"],
+        keywords=["creative", "innovative", "unique", "special", "different", "features", "engaging",
+                  "ideas", "brainstorm"],
+        examples=[
+            "Brainstorm some engaging features for our community app",
+            "What are some creative ideas to get more people involved?",
+            "How could we make MountainShares unique and different?",
+            "Suggest innovative uses for community tokens"
+        ]
+    ),
+    Route(
+        name=TRIVIAL,
+        agents=[],
+        keywords=[],
+        examples=[
+            "hi", "hello", "hey there", "good morning", "thanks", "thank you so much",
+            "ok", "okay got it", "bye", "see you later", "how are you?", "who are you?"
+        ]
+    )
+]
+
+GENERAL_AGENTS = ["mistral", "llama"]
+
+GREETING_RE = re.compile(
+    r"^\s*(hi|hello|hey|howdy|yo|good (morning|afternoon|evening|night)|thanks?( you)?( so much)?|thank u|"
+    r"ok(ay)?|cool|great|got it|bye|goodbye|see (you|ya)( later)?|how are you|who are you)\b[\s!.?,]*$",
+    re.IGNORECASE
+)
+
+
+@dataclass
+class RouteDecision:
+    route: str
+    agents: List[str]
+    scores: Dict[str, float] = field(default_factory=dict)
+    method: str = "embedding"
+
+    @property
+    def trivial(self) -> bool:
+        return self.route == TRIVIAL
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "route": self.route,
+            "agents": self.agents,
+            "method": self.method,
+            "scores": {name: round(score, 4) for name, score in self.scores.items()}
+        }
+
+
+class MessageRouter:
+    """Cosine similarity against per-route centroids, plus a keyword bonus taken from detectQueryType"""
+
+    def __init__(self, available_agents: List[str], min_similarity: float = 0.3, margin: float = 0.05,
+                 keyword_bonus: float = 0.15, trivial_max_words: int = 6):
+        self.available_agents = available_agents
+        self.min_similarity = min_similarity
+        self.margin = margin
+        self.keyword_bonus = keyword_bonus
+        self.trivial_max_words = trivial_max_words
+        self.routes = {route.name: route for route in ROUTES}
+        # Whole words only - a bare substring test would let "good" count as "god"
+        self.keyword_patterns = {
+            route.name: re.compile(r"\b(" + "|".join(map(re.escape, route.keywords)) + r")\b")
+            for route in ROUTES if route.keywords
+        }
+        self.names: List[str] = []
+        self.centroids: Optional[np.ndarray] = None
+
+    async def fit(self, encode: Callable[[List[str]], Awaitable[np.ndarray]]):
+        """Embed the seed examples once; each centroid is the normalized mean of its examples"""
+        names, centroids = [], []
+        for route in ROUTES:
+            vectors = await encode(route.examples + route.keywords)
+            vectors = vectors / np.linalg.norm(vectors, axis=1, keepdims=True).clip(min=1e-12)
+            centroid = vectors.mean(axis=0)
+            names.append(route.name)
+            centroids.append(centroid / max(np.linalg.norm(centroid), 1e-12))
+        self.names, self.centroids = names, np.stack(centroids).astype(np.float32)
+        logger.info(f"✅ Message router fitted with {len(names)} routes")
+
+    @property
+    def fitted(self) -> bool:
+        return self.centroids is not None
+
+    def _agents(self, names: List[str]) -> List[str]:
+        agents = [agent for name in names for agent in self.routes[name].agents if agent in self.available_agents]
+        return list(dict.fromkeys(agents)) or list(self.available_agents)
+
+    def classify(self, message: str, embedding: Optional[np.ndarray]) -> RouteDecision:
+        words = len(message.split())
+        if GREETING_RE.match(message):
+            return RouteDecision(TRIVIAL, [], method="greeting")
+
+        lowered = message.lower()
+        if embedding is None or not self.fitted:
+            # No vectors yet: fall back to the detectQueryType keyword rules
+            for name, pattern in self.keyword_patterns.items():
+                if pattern.search(lowered):
+                    return RouteDecision(name, self._agents([name]), method="keywords")
+            return RouteDecision(GENERAL, self._filter(GENERAL_AGENTS), method="keywords")
+
+        unit = np.asarray(embedding, dtype=np.float32)
+        unit = unit / max(np.linalg.norm(unit), 1e-12)
+        scores = {name: float(score) for name, score in zip(self.names, self.centroids @ unit)}
+        for name, pattern in self.keyword_patterns.items():
+            if name in scores and pattern.search(lowered):
+                scores[name] += self.keyword_bonus
+
+        best = max(scores, key=scores.get)
+        if best == TRIVIAL:
+            if words <= self.trivial_max_words and scores[best] >= self.min_similarity:
+                return RouteDecision(TRIVIAL, [], scores)
+            del scores[TRIVIAL]  # long messages are never trivial; take the best real route
+            best = max(scores, key=scores.get)
+
+        if scores[best] < self.min_similarity:
+            return RouteDecision(GENERAL, self._filter(GENERAL_AGENTS), scores)
+
+        # Every route close to the best one contributes its agents
+        chosen = [name for name, score in scores.items() if name != TRIVIAL and score >= scores[best] - self.margin]
+        return RouteDecision(best if len(chosen) == 1 else "+".join(sorted(chosen)), self._agents(chosen), scores)
+
+    def _filter(self, agents: List[str]) -> List[str]:
+        return [agent for agent in agents if agent in self.available_agents] or list(self.available_agents)
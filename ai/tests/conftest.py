@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The server modules import each other flat (e.g. `from retrieval import ...`), as when run from ai/
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
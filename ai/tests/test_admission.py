@@ -0,0 +1,167 @@
+import asyncio
+
+import pytest
+
+from admission import (
+    AdmissionController, AdmissionRejected, ModelConcurrency, client_priority,
+    PRIORITY_INTERACTIVE, PRIORITY_DEFAULT, PRIORITY_BATCH
+)
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize("requested, expected", [
+    (-5, PRIORITY_DEFAULT),
+    (PRIORITY_INTERACTIVE, PRIORITY_DEFAULT),
+    (PRIORITY_DEFAULT, PRIORITY_DEFAULT),
+    (PRIORITY_BATCH, PRIORITY_BATCH),
+    (99, PRIORITY_BATCH),
+])
+def test_client_priority_is_clamped(requested, expected):
+    assert client_priority(requested) == expected
+
+
+def test_acquire_without_contention():
+    async def scenario():
+        admission = AdmissionController(max_active=2, max_queue=2)
+        assert await admission.acquire() == 0.0
+        assert await admission.acquire() == 0.0
+        assert admission.stats()["active"] == 2
+        admission.release()
+        admission.release()
+        assert admission.stats()["active"] == 0
+
+    run(scenario())
+
+
+def test_waiters_admitted_by_priority_then_arrival():
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queue=4)
+        await admission.acquire()
+        order = []
+
+        async def waiter(name, priority):
+            await admission.acquire(priority)
+            order.append(name)
+
+        tasks = []
+        for name, priority in (("batch", PRIORITY_BATCH), ("first", PRIORITY_DEFAULT),
+                               ("second", PRIORITY_DEFAULT), ("urgent", PRIORITY_INTERACTIVE)):
+            tasks.append(asyncio.create_task(waiter(name, priority)))
+            await asyncio.sleep(0)
+        assert admission.queued() == 4
+
+        for _ in tasks:
+            admission.release()
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert order == ["urgent", "first", "second", "batch"]
+        assert admission.active == 1  # each release handed the slot straight to a waiter
+
+    run(scenario())
+
+
+def test_full_queue_rejects_with_429():
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queue=1)
+        await admission.acquire()
+        waiting = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as rejected:
+            admission.check()
+        assert rejected.value.status_code == 429
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire()
+        assert rejected.value.reason == "queue_full"
+        assert rejected.value.retry_after >= 1
+        admission.release()
+        await waiting
+
+    run(scenario())
+
+
+def test_queue_timeout_rejects_with_503_without_leaking_slots():
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queue=2, queue_timeout=0.01)
+        await admission.acquire()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await admission.acquire()
+        assert rejected.value.status_code == 503
+        assert admission.queued() == 0
+        admission.release()
+        assert admission.active == 0
+
+    run(scenario())
+
+
+def test_cancelled_waiter_gives_up_its_place():
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queue=2)
+        await admission.acquire()
+        waiting = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        admission.release()
+        assert admission.active == 0
+        assert admission.queued() == 0
+
+    run(scenario())
+
+
+def test_slot_context_releases_and_tracks_service_time():
+    async def scenario():
+        admission = AdmissionController(max_active=1, max_queue=1)
+        before = admission.service_seconds
+        async with admission.slot():
+            assert admission.active == 1
+        assert admission.active == 0
+        assert admission.service_seconds < before
+
+    run(scenario())
+
+
+def test_retry_after_scales_with_backlog():
+    admission = AdmissionController(max_active=2, max_queue=8)
+    admission.service_seconds = 4.0
+    assert admission.retry_after() == 2
+    loop = asyncio.new_event_loop()
+    try:
+        for sequence in range(3):
+            admission.waiters.append((PRIORITY_DEFAULT, sequence, loop.create_future()))
+        assert admission.retry_after() == 8
+    finally:
+        loop.close()
+
+
+def test_model_concurrency_overrides():
+    assert ModelConcurrency.parse_overrides("mistral:7b=1, llama3.1:8b=3,bad,x=y") == {"mistral:7b": 1, "llama3.1:8b": 3}
+    concurrency = ModelConcurrency(default_limit=2, overrides={"mistral:7b": 1})
+    assert concurrency.limit("mistral:7b") == 1
+    assert concurrency.limit("phi3:mini") == 2
+
+
+def test_model_concurrency_caps_each_model_separately():
+    async def scenario():
+        concurrency = ModelConcurrency(default_limit=1)
+        peak = {"a": 0, "b": 0}
+        running = {"a": 0, "b": 0}
+
+        async def generate(model):
+            async with concurrency.slot(model):
+                running[model] += 1
+                peak[model] = max(peak[model], running[model])
+                await asyncio.sleep(0.01)
+                running[model] -= 1
+
+        await asyncio.gather(*(generate(model) for model in ("a", "a", "a", "b", "b")))
+        assert peak == {"a": 1, "b": 1}
+        assert concurrency.stats() == {
+            "a": {"limit": 1, "in_use": 0, "waiting": 0},
+            "b": {"limit": 1, "in_use": 0, "waiting": 0}
+        }
+
+    run(scenario())
@@ -0,0 +1,110 @@
+import asyncio
+from dataclasses import dataclass
+
+import pytest
+
+from agent_quorum import cancel_stragglers, wait_for_quorum
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@dataclass
+class Answer:
+    agent: str
+    confidence: float
+
+
+async def agent(name, delay, confidence=0.8, error=None, log=None):
+    """Stands in for query_ollama_agent: answers after delay, or fails like a timeout/error fallback"""
+    try:
+        await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        if log is not None:
+            log.append(name)
+        raise
+    if error is not None:
+        raise error
+    return Answer(name, confidence)
+
+
+def start(*agents):
+    return [asyncio.create_task(coro) for coro in agents]
+
+
+def test_quorum_reached_before_the_deadline():
+    async def scenario():
+        cancelled = []
+        tasks = start(agent("a", 0.01), agent("b", 0.02), agent("slow", 5, log=cancelled))
+        loop = asyncio.get_running_loop()
+        began = loop.time()
+        pending = await wait_for_quorum(tasks, quorum=2, latency_budget=10)
+        assert loop.time() - began < 1
+        assert pending == {tasks[2]}
+
+        await cancel_stragglers(pending)
+        assert cancelled == ["slow"] and tasks[2].cancelled()
+        assert [task.result().agent for task in tasks[:2]] == ["a", "b"]
+
+    run(scenario())
+
+
+def test_fallback_answers_do_not_count_towards_the_quorum():
+    async def scenario():
+        tasks = start(agent("fallback", 0.01, confidence=0.0), agent("error", 0.01, error=RuntimeError("down")),
+                      agent("a", 0.03), agent("b", 0.04))
+        pending = await wait_for_quorum(tasks, quorum=2, latency_budget=10)
+        assert pending == set()
+
+    run(scenario())
+
+
+def test_deadline_drops_stragglers_once_someone_answered():
+    async def scenario():
+        cancelled = []
+        tasks = start(agent("a", 0.01), agent("slow1", 5, log=cancelled), agent("slow2", 5, log=cancelled))
+        pending = await wait_for_quorum(tasks, quorum=3, latency_budget=0.05)
+        assert pending == set(tasks[1:])
+        await cancel_stragglers(pending)
+        assert sorted(cancelled) == ["slow1", "slow2"]
+        assert all(task.done() for task in tasks)
+
+    run(scenario())
+
+
+def test_deadline_with_no_answer_waits_for_the_first_real_one():
+    async def scenario():
+        tasks = start(agent("fallback", 0.01, confidence=0.0), agent("late", 0.1), agent("later", 5))
+        pending = await wait_for_quorum(tasks, quorum=2, latency_budget=0.02)
+        assert tasks[1].done() and tasks[1].result().agent == "late"
+        assert pending == {tasks[2]}
+        await cancel_stragglers(pending)
+
+    run(scenario())
+
+
+def test_every_agent_failing_returns_nothing_pending():
+    async def scenario():
+        tasks = start(agent("fallback", 0.01, confidence=0.0), agent("error", 0.02, error=RuntimeError("down")),
+                      agent("timeout", 0.03, error=asyncio.TimeoutError()))
+        pending = await wait_for_quorum(tasks, quorum=2, latency_budget=10)
+        assert pending == set()
+        assert tasks[0].result().confidence == 0.0
+        assert isinstance(tasks[1].exception(), RuntimeError)
+
+    run(scenario())
+
+
+@pytest.mark.parametrize("quorum, budget", [(0, 0), (5, 0)])
+def test_no_quorum_or_budget_waits_for_every_agent(quorum, budget):
+    async def scenario():
+        tasks = start(agent("a", 0.01), agent("b", 0.05))
+        assert await wait_for_quorum(tasks, quorum=quorum, latency_budget=budget) == set()
+        assert all(task.done() for task in tasks)
+
+    run(scenario())
+
+
+def test_cancel_stragglers_without_pending_tasks():
+    run(cancel_stragglers(set()))
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from ingest_knowledge import KnowledgeIngestor, SourceDocument, sha256_text
+from vector_store import EmbeddedVectorClient
+
+
+class FakeModel:
+    """Deterministic 8-dim embeddings; no sentence-transformers needed"""
+
+    def encode(self, texts, batch_size=64):
+        return np.array([[len(text) % 7 + 1, len(text) % 5 + 1] + [1.0] * 6 for text in texts], dtype=np.float32)
+
+
+class FailingCollection:
+    """Passes writes through until fail_on_upsert, then raises like a dead store or a killed process"""
+
+    def __init__(self, collection, fail_on_upsert):
+        self.collection = collection
+        self.fail_on_upsert = fail_on_upsert
+        self.upserts = 0
+
+    def upsert(self, **kwargs):
+        self.upserts += 1
+        if self.upserts == self.fail_on_upsert:
+            raise RuntimeError("store went away")
+        return self.collection.upsert(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+
+def document(words=50, title="guide"):
+    text = " ".join(f"w{i}" for i in range(words))
+    return SourceDocument(doc_id=f"kb:{title}", title=title, source_type="kb", doc_hash=sha256_text(text), pages=iter([text]))
+
+
+@pytest.fixture
+def collection(tmp_path):
+    client = EmbeddedVectorClient(str(tmp_path / "store"))
+    yield client.get_or_create_collection("knowledge")
+    client.close()
+
+
+def ingestor(collection, batch_size=3):
+    return KnowledgeIngestor(collection, FakeModel(), workers=1, batch_size=batch_size, chunk_words=10, overlap_words=2)
+
+
+def test_rerun_skips_complete_documents(collection):
+    first = ingestor(collection).run(iter([document()]), prune=False)
+    assert first["updated"] == 1 and first["chunks"] > 3
+    second = ingestor(collection).run(iter([document()]), prune=False)
+    assert second["unchanged"] == 1 and second["updated"] == 0
+
+
+def test_failure_between_batches_is_reingested(collection):
+    with pytest.raises(RuntimeError):
+        ingestor(FailingCollection(collection, fail_on_upsert=2)).run(iter([document()]), prune=False)
+    partial = collection.get(include=["metadatas"])["metadatas"]
+    assert partial and all(metadata["chunk_index"] != 0 for metadata in partial)
+
+    rerun = ingestor(collection).run(iter([document()]), prune=False)
+    assert rerun["updated"] == 1 and rerun["unchanged"] == 0
+    stored = collection.get(include=["metadatas"])["metadatas"]
+    assert sorted(metadata["chunk_index"] for metadata in stored) == list(range(stored[0]["chunk_count"]))
+
+
+def test_missing_chunks_under_a_hash_row_are_reingested(collection):
+    ingestor(collection).run(iter([document()]), prune=False)
+    collection.delete(ids=["kb:guide#0002"])
+    assert ingestor(collection).existing_hashes() == {"kb:guide": ""}
+    rerun = ingestor(collection).run(iter([document()]), prune=False)
+    assert rerun["updated"] == 1
+    assert collection.get(ids=["kb:guide#0002"])["ids"] == ["kb:guide#0002"]
+
+
+def test_empty_document_marker_counts_as_complete(collection):
+    empty = SourceDocument(doc_id="kb:blank", title="blank", source_type="kb", doc_hash="h", pages=iter([""]))
+    ingestor(collection).run(iter([empty]), prune=False)
+    assert ingestor(collection).existing_hashes() == {"kb:blank": "h"}
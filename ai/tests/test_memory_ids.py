@@ -0,0 +1,56 @@
+import threading
+from unittest import mock
+
+from memory_ids import MemoryIdGenerator
+
+
+def test_ulids_are_26_crockford_chars():
+    ulid = MemoryIdGenerator().new_ulid()
+    assert len(ulid) == 26
+    assert set(ulid) <= set(MemoryIdGenerator.ALPHABET)
+
+
+def test_ids_sort_in_creation_order_within_one_millisecond():
+    generator = MemoryIdGenerator()
+    with mock.patch("memory_ids.time.time", return_value=1_700_000_000.0):
+        ids = [generator.new_ulid() for _ in range(1000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_clock_going_backwards_stays_monotonic():
+    generator = MemoryIdGenerator()
+    with mock.patch("memory_ids.time.time", return_value=1_700_000_001.0):
+        first = generator.new_ulid()
+    with mock.patch("memory_ids.time.time", return_value=1_700_000_000.0):
+        second = generator.new_ulid()
+    assert second > first
+
+
+def test_random_overflow_rolls_into_next_millisecond():
+    generator = MemoryIdGenerator()
+    with mock.patch("memory_ids.time.time", return_value=1_700_000_000.0):
+        first = generator.new_ulid()
+        generator.last_random = (1 << 80) - 1
+        second = generator.new_ulid()
+    assert second > first
+    assert generator.last_ms == 1_700_000_000_000 + 1
+
+
+def test_concurrent_ids_are_unique():
+    generator = MemoryIdGenerator()
+    ids = []
+    lock = threading.Lock()
+
+    def worker():
+        batch = [generator.memory_id("user-1") for _ in range(500)]
+        with lock:
+            ids.extend(batch)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 4000
+    assert all(memory_id.startswith("user-1:") for memory_id in ids)
@@ -0,0 +1,179 @@
+import asyncio
+
+import pytest
+
+ollama = pytest.importorskip("ollama")
+httpx = pytest.importorskip("httpx")
+
+from ollama_scheduler import GB, OllamaHost, OllamaScheduler, parse_size  # noqa: E402
+
+
+class FakeClient:
+    """Stands in for ollama.AsyncClient: list/ps from fixed model sets, or a refused connection when down"""
+
+    def __init__(self, available=None, loaded=None):
+        self.available = dict(available or {})
+        self.loaded = dict(loaded or {})
+        self.down = False
+
+    async def list(self):
+        if self.down:
+            raise ConnectionError("connection refused")
+        return {"models": [{"model": name, "size": size} for name, size in self.available.items()]}
+
+    async def ps(self):
+        if self.down:
+            raise ConnectionError("connection refused")
+        return {"models": [{"model": name, "size": size} for name, size in self.loaded.items()]}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def scheduler(clients, memory=(24, 16), max_concurrency=4):
+    hosts = [
+        OllamaHost(url=f"http://gpu{index}:11434", memory_bytes=memory[index] * GB, client=client)
+        for index, client in enumerate(clients)
+    ]
+    return OllamaScheduler(hosts, max_concurrency=max_concurrency)
+
+
+MODELS = {"llama3.1:8b": 5 * GB, "mistral:7b": 4 * GB, "qwen2:7b": 4 * GB, "phi3:mini": 2 * GB}
+
+
+def test_parse_hosts_and_sizes():
+    hosts = OllamaScheduler.parse_hosts("http://gpu0:11434=24GB, http://gpu1:11434/")
+    assert [host.url for host in hosts] == ["http://gpu0:11434", "http://gpu1:11434"]
+    assert hosts[0].memory_bytes == 24 * GB and hosts[1].memory_bytes == 16 * GB
+    assert parse_size("8000MB") == 8000 * 1024 ** 2
+    assert parse_size("lots") is None
+
+
+def test_default_client_is_async_client(monkeypatch):
+    created = []
+    monkeypatch.setattr(ollama, "AsyncClient", lambda host: created.append(host) or FakeClient())
+    OllamaScheduler([OllamaHost(url="http://gpu0:11434", memory_bytes=GB)])
+    assert created == ["http://gpu0:11434"]
+
+
+def test_placement_spreads_models_by_footprint():
+    clients = [FakeClient(MODELS), FakeClient(MODELS)]
+    sched = scheduler(clients, memory=(10, 10))
+    run(sched.refresh(list(MODELS)))
+    used = {host.url: 0 for host in sched.hosts}
+    for model, url in sched.pins.items():
+        used[url] += sched.footprint(model)
+    assert set(sched.pins) == set(MODELS)
+    assert all(total <= 10 * GB for total in used.values())
+    assert len(set(sched.pins.values())) == 2
+
+
+def test_placement_prefers_host_that_already_has_model_loaded():
+    clients = [FakeClient(MODELS), FakeClient(MODELS, loaded={"phi3:mini": 2 * GB})]
+    sched = scheduler(clients, memory=(24, 24))
+    run(sched.refresh(["phi3:mini"]))
+    assert sched.pins["phi3:mini"] == "http://gpu1:11434"
+
+
+def test_connection_failure_fails_over_and_probe_recovers():
+    clients = [FakeClient(MODELS), FakeClient(MODELS)]
+    sched = scheduler(clients, memory=(24, 24))
+    run(sched.refresh(list(MODELS)))
+    model = "llama3.1:8b"
+    first = sched.host_for(model)
+
+    async def failing_call():
+        async with sched.route(model):
+            raise ConnectionError("connection refused")
+
+    with pytest.raises(ConnectionError):
+        run(failing_call())
+    assert not first.healthy and first.failures == 1
+    assert sched.host_for(model) is not first
+    assert all(url != first.url for url in sched.pins.values())
+    assert sched.healthy_count() == 1
+
+    run(sched.refresh())
+    assert first.healthy
+    assert sched.healthy_count() == 2
+
+
+def test_probe_marks_unreachable_host_down():
+    clients = [FakeClient(MODELS), FakeClient(MODELS)]
+    clients[1].down = True
+    sched = scheduler(clients)
+    run(sched.refresh(list(MODELS)))
+    assert not sched.hosts[1].healthy
+    assert set(sched.pins.values()) == {"http://gpu0:11434"}
+
+
+@pytest.mark.parametrize("error", [TypeError("bad argument"), ValueError("bad value"),
+                                   asyncio.TimeoutError(), ollama.ResponseError("model not found")])
+def test_other_errors_do_not_take_the_host_down(error):
+    sched = scheduler([FakeClient(MODELS)], memory=(24,))
+    run(sched.refresh(list(MODELS)))
+
+    async def failing_call():
+        async with sched.route("mistral:7b"):
+            raise error
+
+    with pytest.raises(type(error)):
+        run(failing_call())
+    assert sched.hosts[0].healthy and sched.hosts[0].failures == 0
+    assert sched.hosts[0].inflight == 0
+
+
+def test_per_host_slots_limit_one_host_without_blocking_another():
+    async def scenario():
+        sched = scheduler([FakeClient({"a": GB}), FakeClient({"b": GB})], max_concurrency=1)
+        await sched.refresh(["a", "b"])
+        running = {url: 0 for url in (host.url for host in sched.hosts)}
+        peak = dict(running)
+        order = []
+
+        async def call(model, name):
+            async with sched.route(model) as host:
+                running[host.url] += 1
+                peak[host.url] = max(peak[host.url], running[host.url])
+                await asyncio.sleep(0.02)
+                running[host.url] -= 1
+                order.append(name)
+
+        await asyncio.gather(call("a", "a1"), call("a", "a2"), call("b", "b1"))
+        assert all(value == 1 for value in peak.values())
+        assert order.index("b1") < order.index("a2")  # b's host was free while a2 queued
+        assert all(host.inflight == 0 and host.waiting == 0 for host in sched.hosts)
+
+    run(scenario())
+
+
+def test_cancelled_waiter_releases_nothing_it_did_not_hold():
+    async def scenario():
+        sched = scheduler([FakeClient({"a": GB})], memory=(24,), max_concurrency=1)
+        await sched.refresh(["a"])
+        host = sched.hosts[0]
+        gate = asyncio.Event()
+
+        async def holder():
+            async with sched.route("a"):
+                await gate.wait()
+
+        async def waiter():
+            async with sched.route("a"):
+                pass
+
+        holding = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(waiter())
+        await asyncio.sleep(0)
+        assert host.waiting == 1 and host.inflight == 2
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        gate.set()
+        await holding
+        assert host.inflight == 0 and host.waiting == 0
+        assert not host.slots.locked()
+
+    run(scenario())
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+
+import response_cache
+from response_cache import SemanticResponseCache
+
+DIM = 8
+
+
+def vector(seed):
+    return np.random.default_rng(seed).normal(size=DIM).astype(np.float32)
+
+
+def near(base, similarity):
+    """A vector at the given cosine similarity to base"""
+    unit = base / np.linalg.norm(base)
+    other = vector(99)
+    other -= (other @ unit) * unit
+    other /= np.linalg.norm(other)
+    return similarity * unit + np.sqrt(1 - similarity ** 2) * other
+
+
+@pytest.mark.parametrize("similarity, hit", [(1.0, True), (0.95, True), (0.921, True), (0.919, False), (0.5, False)])
+def test_lookup_hits_only_at_or_above_threshold(similarity, hit):
+    cache = SemanticResponseCache(threshold=0.92)
+    base = vector(0)
+    cache.store("u1", "what is mountainshares", base, "answer")
+    found = cache.lookup("u1", near(base, similarity))
+    assert (found is not None) == hit
+    if hit:
+        entry, score = found
+        assert entry.response == "answer" and score == pytest.approx(similarity, abs=1e-5)
+    assert cache.stats()["hits" if hit else "misses"] == 1
+
+
+def test_lookup_returns_closest_entry():
+    cache = SemanticResponseCache(threshold=0.5)
+    base = vector(0)
+    cache.store("u1", "far", near(base, 0.8), "far answer")
+    cache.store("u1", "close", near(base, 0.99), "close answer")
+    entry, _ = cache.lookup("u1", base)
+    assert entry.response == "close answer" and entry.hits == 1
+
+
+def test_user_scope_keeps_answers_per_user():
+    cache = SemanticResponseCache(scope="user")
+    base = vector(0)
+    cache.store("u1", "question", base, "for u1")
+    assert cache.lookup("u2", base) is None
+    assert cache.lookup("u1", base)[0].response == "for u1"
+
+
+def test_global_scope_shares_answers():
+    cache = SemanticResponseCache(scope="global")
+    base = vector(0)
+    cache.store("u1", "question", base, "shared")
+    assert cache.lookup("u2", base)[0].response == "shared"
+
+
+def test_mark_stored_only_once_per_user():
+    cache = SemanticResponseCache(scope="global")
+    entry = cache.store("u1", "question", vector(0), "shared")
+    assert not cache.mark_stored(entry, "u1")  # stored with the answer when it was generated
+    assert cache.mark_stored(entry, "u2")
+    assert not cache.mark_stored(entry, "u2")
+
+
+def test_invalidate_one_user_keeps_others():
+    cache = SemanticResponseCache(scope="user")
+    base = vector(0)
+    cache.store("u1", "question", base, "for u1")
+    cache.store("u2", "question", base, "for u2")
+    assert cache.invalidate("u1") == 1
+    assert cache.lookup("u1", base) is None
+    assert cache.lookup("u2", base)[0].response == "for u2"
+
+
+def test_invalidate_all_runs_hooks():
+    cache = SemanticResponseCache()
+    calls = []
+    cache.add_invalidation_hook(calls.append)
+    cache.add_invalidation_hook(lambda user_id: 1 / 0)  # a failing hook does not stop invalidation
+    cache.store("u1", "a", vector(0), "x")
+    cache.store("u2", "b", vector(1), "y")
+    assert cache.invalidate() == 2
+    assert calls == [None]
+    assert cache.stats()["entries"] == 0 and cache.stats()["invalidations"] == 1
+
+
+def test_expired_entries_miss(monkeypatch):
+    cache = SemanticResponseCache(ttl_seconds=10)
+    base = vector(0)
+    cache.store("u1", "question", base, "answer")
+    now = response_cache.time.time()
+    monkeypatch.setattr(response_cache.time, "time", lambda: now + 11)
+    assert cache.lookup("u1", base) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_lru_eviction_keeps_recently_hit_entries():
+    cache = SemanticResponseCache(max_entries=2)
+    first, second, third = vector(0), vector(1), vector(2)
+    cache.store("u1", "first", first, "1")
+    cache.store("u1", "second", second, "2")
+    cache.lookup("u1", first)
+    cache.store("u1", "third", third, "3")
+    assert cache.lookup("u1", second) is None
+    assert cache.lookup("u1", first)[0].response == "1"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,92 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from router import GENERAL, ROUTES, TRIVIAL, MessageRouter
+
+AGENTS = ["mistral", "llama", "qwen", "phi"]
+NAMES = [route.name for route in ROUTES]
+DIM = len(ROUTES) + 1  # one axis per route, plus one no route is near
+
+
+def axis(*weights):
+    """An embedding from {route name (or "other"): weight}"""
+    vector = np.zeros(DIM, dtype=np.float32)
+    for name, weight in weights:
+        vector[NAMES.index(name) if name != "other" else DIM - 1] = weight
+    return vector
+
+
+async def encode(texts):
+    """Every seed text lands on its own route's axis, so each centroid is that axis"""
+    owner = {text: route.name for route in ROUTES for text in route.examples + route.keywords}
+    return np.stack([axis((owner[text], 1.0)) for text in texts])
+
+
+@pytest.fixture
+def router():
+    router = MessageRouter(AGENTS)
+    asyncio.run(router.fit(encode))
+    return router
+
+
+@pytest.mark.parametrize("message, route, agents", [
+    ("Hello!", TRIVIAL, []),
+    ("thank you so much", TRIVIAL, []),
+    ("Please audit my smart contract", "technical_analysis", ["mistral"]),
+    ("How does faith shape our stewardship?", "spiritual_guidance", ["qwen"]),
+    ("I'm worried nobody will use it", "emotional_support", ["phi"]),
+    ("Let's brainstorm a launch event", "creative_innovation", ["llama"]),
+    ("What time is the community meeting?", GENERAL, ["mistral", "llama"]),
+    ("That sounds like a good idea", GENERAL, ["mistral", "llama"]),  # whole words: not "god", not "ideas"
+])
+def test_keyword_rules_before_fitting(message, route, agents):
+    decision = MessageRouter(AGENTS).classify(message, None)
+    assert (decision.route, decision.agents) == (route, agents)
+
+
+@pytest.mark.parametrize("message, embedding, route, agents", [
+    ("How do reentrancy guards work", axis(("technical_analysis", 1.0)), "technical_analysis", ["mistral"]),
+    ("Is charging fees fair to neighbours", axis(("spiritual_guidance", 1.0)), "spiritual_guidance", ["qwen"]),
+    ("I can't sleep before the launch", axis(("emotional_support", 1.0)), "emotional_support", ["phi"]),
+    ("Name the new token", axis(("creative_innovation", 1.0)), "creative_innovation", ["llama"]),
+    # Two routes within the margin: both leads are consulted
+    ("A fun contract feature", axis(("technical_analysis", 0.7), ("creative_innovation", 0.7)),
+     "creative_innovation+technical_analysis", ["mistral", "llama"]),
+    # The keyword bonus tips a near tie
+    ("Add a fun twist to this solidity", axis(("technical_analysis", 0.5), ("creative_innovation", 0.55)),
+     "technical_analysis", ["mistral"]),
+    ("sure thing", axis((TRIVIAL, 1.0)), TRIVIAL, []),
+    # Long messages are never trivial; nothing else is close, so the general agents answer
+    ("so I was wondering about the thing we talked about yesterday", axis((TRIVIAL, 1.0)), GENERAL,
+     ["mistral", "llama"]),
+    ("Where do I park", axis(("other", 1.0)), GENERAL, ["mistral", "llama"]),
+])
+def test_embedding_routes(router, message, embedding, route, agents):
+    decision = router.classify(message, embedding)
+    assert (decision.route, decision.agents) == (route, agents)
+    assert decision.method == "embedding"
+
+
+def test_greeting_skips_embedding(router):
+    decision = router.classify("good morning!", axis(("technical_analysis", 1.0)))
+    assert decision.trivial and decision.agents == [] and decision.method == "greeting"
+
+
+@pytest.mark.parametrize("message, embedding", [
+    ("Please audit my smart contract", None),
+    ("How do reentrancy guards work", axis(("technical_analysis", 1.0))),
+    ("What time is the community meeting?", None),
+    ("Where do I park", axis(("other", 1.0))),
+])
+def test_falls_back_to_every_available_agent(message, embedding):
+    router = MessageRouter(["qwen", "phi"])
+    asyncio.run(router.fit(encode))
+    assert router.classify(message, embedding).agents == ["qwen", "phi"]
+
+
+def test_summary_rounds_scores(router):
+    summary = router.classify("Name the new token", axis(("creative_innovation", 1.0))).summary()
+    assert summary["route"] == "creative_innovation"
+    assert summary["scores"]["creative_innovation"] == 1.0
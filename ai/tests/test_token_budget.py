@@ -0,0 +1,56 @@
+import pytest
+
+import prompts
+from retrieval import estimate_tokens
+from token_budget import TokenBudget, context_window, ollama_keep_alive
+
+
+@pytest.fixture(autouse=True)
+def clean_env(monkeypatch):
+    for name in ("OLLAMA_NUM_CTX", "OLLAMA_MIN_CTX", "OLLAMA_MAX_CTX", "OLLAMA_KEEP_ALIVE"):
+        monkeypatch.delenv(name, raising=False)
+
+
+@pytest.mark.parametrize("tokens, expected", [(100, 2048), (2049, 3072), (3072, 3072), (50000, 8192)])
+def test_context_window_rounds_and_clamps(tokens, expected):
+    assert context_window(tokens) == expected
+
+
+def test_context_window_fixed_override(monkeypatch):
+    monkeypatch.setenv("OLLAMA_NUM_CTX", "6000")
+    assert context_window(100) == 6000
+
+
+@pytest.mark.parametrize("value, expected", [(None, "30m"), ("300", 300), ("-1", -1), ("0", 0), ("1h", "1h")])
+def test_keep_alive_from_env(monkeypatch, value, expected):
+    if value is not None:
+        monkeypatch.setenv("OLLAMA_KEEP_ALIVE", value)
+    assert ollama_keep_alive() == expected
+
+
+def test_budget_from_env(monkeypatch):
+    monkeypatch.setenv("MESSAGE_MAX_TOKENS", "64")
+    monkeypatch.setenv("CONTRACT_ANALYSIS_INPUT_TOKENS", "100")
+    budget = TokenBudget.from_env()
+    assert budget.message_max_tokens == 64
+    assert budget.contract_input_tokens == 100
+    assert budget.persona_max_tokens == TokenBudget().persona_max_tokens
+
+
+def test_worst_case_prompts_fit_their_windows():
+    budget = TokenBudget()
+    message = "word " * 5000
+    context = {"emotion": {"label": "joy"}, "sentiment": {"label": "POSITIVE"}}
+    judge = prompts.judge_prompt(message, [], context, budget.agent_summary_tokens, budget.message_max_tokens)
+    assert estimate_tokens(prompts.JUDGE_SYSTEM + judge) + budget.judge_max_tokens <= budget.judge_tokens()
+    fused = prompts.fused_prompt(message, [], context, budget.agent_summary_tokens, budget.message_max_tokens)
+    assert estimate_tokens(prompts.PERSONA_SYSTEM + fused) + budget.persona_max_tokens <= budget.persona_tokens()
+    contract = prompts.contract_prompt("uint x; " * 5000, message, budget.contract_input_tokens, budget.message_max_tokens)
+    assert estimate_tokens(prompts.CONTRACT_SYSTEM + contract) + budget.contract_max_tokens <= budget.contract_tokens()
+
+
+def test_direct_prompt_truncates_only_past_the_cap():
+    context = {}
+    assert "The user said: hi there" in prompts.direct_prompt("hi there", context, 4)
+    assert prompts.direct_prompt("word " * 50, context).count("word") == 50
+    assert prompts.direct_prompt("word " * 50, context, 4).count("word") < 10
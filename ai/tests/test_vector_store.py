@@ -0,0 +1,331 @@
+import time
+
+import numpy as np
+import pytest
+
+from vector_store import EmbeddedCollection, EmbeddedVectorClient, _where_sql
+
+DIM = 16
+MODES = ["none", "float16", "int8"]
+
+
+def unit_vectors(count, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(count, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture(params=MODES)
+def quantization(request):
+    return request.param
+
+
+@pytest.fixture
+def client(tmp_path, quantization):
+    client = EmbeddedVectorClient(str(tmp_path / "store"), quantization=quantization)
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def collection(client):
+    vectors = unit_vectors(50)
+    collection = client.get_or_create_collection("docs")
+    collection.add(
+        ids=[f"id{i}" for i in range(50)],
+        embeddings=vectors,
+        documents=[f"doc {i}" for i in range(50)],
+        metadatas=[{"n": i, "kind": "even" if i % 2 == 0 else "odd", "user_id": f"u{i % 3}"} for i in range(50)]
+    )
+    collection.vectors_for_test = vectors
+    return collection
+
+
+def test_add_get_count(collection):
+    assert collection.count() == 50
+    result = collection.get(ids=["id3", "id7"])
+    assert sorted(result["ids"]) == ["id3", "id7"]
+    assert sorted(result["documents"]) == ["doc 3", "doc 7"]
+    assert result["embeddings"] is None
+
+
+def test_add_ignores_existing_ids(collection):
+    collection.add(ids=["id0"], embeddings=unit_vectors(1, seed=9), documents=["changed"])
+    assert collection.get(ids=["id0"])["documents"] == ["doc 0"]
+    assert collection.count() == 50
+
+
+def test_upsert_replaces_in_place(collection):
+    replacement = unit_vectors(1, seed=9)
+    collection.upsert(ids=["id0", "new"], embeddings=np.vstack([replacement, replacement]),
+                      documents=["changed", "fresh"], metadatas=[{"n": 100}, {"n": 101}])
+    assert collection.count() == 51
+    result = collection.get(ids=["id0"], include=["documents", "metadatas", "embeddings"])
+    assert result["documents"] == ["changed"]
+    assert result["metadatas"] == [{"n": 100}]
+    np.testing.assert_allclose(result["embeddings"][0], replacement[0], atol=1e-6)
+
+
+def test_get_limit_offset_in_insertion_order(collection):
+    first = collection.get(limit=5)["ids"]
+    second = collection.get(limit=5, offset=5)["ids"]
+    assert first == [f"id{i}" for i in range(5)]
+    assert second == [f"id{i}" for i in range(5, 10)]
+
+
+def test_delete_by_ids_and_where_reuses_slots(collection):
+    collection.delete(ids=["id1", "id2"])
+    collection.delete(where={"kind": "odd"})
+    assert collection.count() == 24
+    assert collection.get(ids=["id1", "id2", "id3"])["ids"] == []
+    free_before = len(collection.free_slots)
+    collection.add(ids=["again"], embeddings=unit_vectors(1, seed=3))
+    assert len(collection.free_slots) == free_before - 1
+    assert collection.count() == 25
+
+
+def test_query_returns_exact_nearest_with_distances(collection):
+    vectors = collection.vectors_for_test
+    result = collection.query(query_embeddings=[vectors[7]], n_results=3)
+    assert result["ids"][0][0] == "id7"
+    assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-3)
+    expected = np.argsort(-(vectors @ vectors[7]))[:3]
+    assert result["ids"][0] == [f"id{i}" for i in expected]
+    assert result["distances"][0] == sorted(result["distances"][0])
+
+
+def test_query_with_where_and_include(collection):
+    vectors = collection.vectors_for_test
+    result = collection.query(query_embeddings=[vectors[7]], n_results=5, where={"kind": "even"},
+                              include=["metadatas"])
+    assert all(metadata["kind"] == "even" for metadata in result["metadatas"][0])
+    assert result["documents"] is None and result["distances"] is None
+
+
+def test_query_empty_collection(client):
+    collection = client.get_or_create_collection("empty")
+    result = collection.query(query_embeddings=[unit_vectors(1)[0]], n_results=3)
+    assert result["ids"] == [[]]
+
+
+def test_dimension_mismatch_rejected(collection):
+    with pytest.raises(ValueError):
+        collection.add(ids=["bad"], embeddings=np.ones((1, DIM + 1), dtype=np.float32))
+
+
+def test_reload_after_reopen(tmp_path, quantization):
+    path = str(tmp_path / "store")
+    vectors = unit_vectors(20)
+    client = EmbeddedVectorClient(path, quantization=quantization)
+    collection = client.get_or_create_collection("docs")
+    collection.add(ids=[f"id{i}" for i in range(20)], embeddings=vectors, metadatas=[{"n": i} for i in range(20)])
+    collection.delete(ids=["id5"])
+    client.close()
+
+    reopened = EmbeddedVectorClient(path, quantization=quantization).get_collection("docs")
+    assert reopened.count() == 19
+    result = reopened.query(query_embeddings=[vectors[4]], n_results=1)
+    assert result["ids"] == [["id4"]]
+    assert reopened.get(ids=["id5"])["ids"] == []
+
+
+def test_reload_after_external_write(tmp_path, quantization):
+    path = str(tmp_path / "store")
+    vectors = unit_vectors(10)
+    reader = EmbeddedVectorClient(path, quantization=quantization)
+    writer = EmbeddedVectorClient(path, quantization=quantization)
+    seen = reader.get_or_create_collection("docs")
+    assert seen.count() == 0
+
+    writer.get_or_create_collection("docs").add(ids=[f"id{i}" for i in range(10)], embeddings=vectors)
+    assert seen.count() == 10
+    assert seen.query(query_embeddings=[vectors[2]], n_results=1)["ids"] == [["id2"]]
+    writer.close()
+    reader.close()
+
+
+def test_ivf_index_finds_neighbours(tmp_path, quantization):
+    client = EmbeddedVectorClient(str(tmp_path / "store"), exact_search_limit=10, ivf_min_vectors=200,
+                                  ivf_nprobe=8, quantization=quantization)
+    vectors = unit_vectors(400)
+    collection = client.get_or_create_collection("big")
+    collection.add(ids=[f"id{i}" for i in range(400)], embeddings=vectors)
+    deadline = time.time() + 10
+    while collection.ivf is None and time.time() < deadline:
+        time.sleep(0.05)
+    assert collection.ivf is not None
+
+    hits = sum(
+        collection.query(query_embeddings=[vectors[i]], n_results=1)["ids"][0] == [f"id{i}"]
+        for i in range(0, 400, 20)
+    )
+    assert hits >= 18
+    client.close()
+
+
+def test_collection_lifecycle(client):
+    client.create_collection("abc")
+    with pytest.raises(ValueError):
+        client.create_collection("abc")
+    with pytest.raises(ValueError):
+        client.get_collection("missing")
+    with pytest.raises(ValueError):
+        client.get_or_create_collection("a")
+    assert "abc" in [collection.name for collection in client.list_collections()]
+    client.delete_collection("abc")
+    with pytest.raises(ValueError):
+        client.get_collection("abc")
+
+
+@pytest.mark.parametrize("where, expected", [
+    ({"n": 4}, {4}),
+    ({"n": {"$eq": 4}}, {4}),
+    ({"n": {"$ne": 4}}, set(range(10)) - {4}),
+    ({"n": {"$gt": 7}}, {8, 9}),
+    ({"n": {"$gte": 7}}, {7, 8, 9}),
+    ({"n": {"$lt": 2}}, {0, 1}),
+    ({"n": {"$lte": 2}}, {0, 1, 2}),
+    ({"n": {"$in": [1, 3, 5]}}, {1, 3, 5}),
+    ({"n": {"$nin": [1, 3, 5]}}, set(range(10)) - {1, 3, 5}),
+    ({"n": {"$in": []}}, set()),
+    ({"n": {"$nin": []}}, set(range(10))),
+    ({"kind": "odd"}, {1, 3, 5, 7, 9}),
+    ({"user_id": "u1"}, {1, 4, 7}),
+    ({"$and": [{"kind": "odd"}, {"n": {"$gt": 4}}]}, {5, 7, 9}),
+    ({"$or": [{"n": 0}, {"user_id": "u2"}]}, {0, 2, 5, 8}),
+    ({"n": {"$gt": 2, "$lt": 5}}, {3, 4}),
+])
+def test_where_operators(client, where, expected):
+    collection = client.get_or_create_collection("filtered")
+    collection.add(
+        ids=[f"id{i}" for i in range(10)],
+        embeddings=unit_vectors(10),
+        metadatas=[{"n": i, "kind": "even" if i % 2 == 0 else "odd", "user_id": f"u{i % 3}"} for i in range(10)]
+    )
+    found = {metadata["n"] for metadata in collection.get(where=where)["metadatas"]}
+    assert found == expected
+    queried = collection.query(query_embeddings=[unit_vectors(1, seed=5)[0]], n_results=10, where=where)
+    assert {metadata["n"] for metadata in queried["metadatas"][0]} == expected
+
+
+def test_where_rejects_unknown_operator():
+    with pytest.raises(ValueError):
+        _where_sql({"n": {"$regex": "x"}})
+
+
+def test_refresh_reloads_only_changed_collection(tmp_path, quantization):
+    path = str(tmp_path / "store")
+    reader = EmbeddedVectorClient(path, quantization=quantization)
+    writer = EmbeddedVectorClient(path, quantization=quantization)
+    for name in ("one", "two"):
+        writer.get_or_create_collection(name).add(ids=["a"], embeddings=unit_vectors(1))
+    one, two = reader.get_collection("one"), reader.get_collection("two")
+    generations = (one.generation, two.generation)
+
+    writer.get_collection("one").add(ids=["b"], embeddings=unit_vectors(1, seed=1))
+    assert one.count() == 2 and two.count() == 1
+    assert one.generation == generations[0] + 1
+    assert two.generation == generations[1]
+    writer.close()
+    reader.close()
+
+
+def test_own_writes_do_not_reload(client):
+    collection = client.get_or_create_collection("docs")
+    collection.add(ids=["a"], embeddings=unit_vectors(1))
+    generation = collection.generation
+    collection.add(ids=["b"], embeddings=unit_vectors(1, seed=1))
+    assert collection.count() == 2
+    assert collection.generation == generation
+
+
+def test_release_collection_unmaps_and_reopens(collection):
+    client = collection.client
+    client.release_collection("docs")
+    assert "docs" not in client.collections
+    assert collection.vectors is None
+
+    result = collection.query(query_embeddings=[collection.vectors_for_test[3]], n_results=1)
+    assert result["ids"] == [["id3"]]
+    assert client.collections["docs"] is collection
+    assert client.get_or_create_collection("docs").count() == 50
+
+
+def test_small_collection_file_sized_to_contents(client):
+    collection = client.get_or_create_collection("tiny")
+    collection.add(ids=["a", "b"], embeddings=unit_vectors(2))
+    assert collection.capacity == 2
+    collection.add(ids=["c"], embeddings=unit_vectors(1, seed=1))
+    assert collection.capacity == 4
+
+
+def test_released_handle_is_reused_and_keeps_every_write(client):
+    a = client.get_or_create_collection("turns")
+    a.upsert(ids=["seed"], embeddings=unit_vectors(1))
+    client.release_collection("turns")
+    b = client.get_or_create_collection("turns")
+    assert b is a
+
+    a.upsert(ids=["from_a"], embeddings=unit_vectors(1, seed=1))
+    b.upsert(ids=["from_b"], embeddings=unit_vectors(1, seed=2))
+    assert sorted(b.get()["ids"]) == ["from_a", "from_b", "seed"]
+
+
+def test_allocation_checks_slots_against_sqlite(client):
+    first = client.get_or_create_collection("turns")
+    first.add(ids=["a", "b", "c"], embeddings=unit_vectors(3))
+    first.delete(ids=["b"])
+    # A second object for the same name, as a stale handle or another process would hold
+    twin = EmbeddedCollection(client, "turns", {}, first.dim)
+    twin.add(ids=["from_twin"], embeddings=unit_vectors(1, seed=1))
+    first.add(ids=["from_first"], embeddings=unit_vectors(1, seed=2))
+    first.add(ids=["later"], embeddings=unit_vectors(1, seed=3))
+    assert sorted(first.get()["ids"]) == ["a", "c", "from_first", "from_twin", "later"]
+
+
+def test_reopen_maps_persisted_norms_and_codes_without_scanning(tmp_path, quantization):
+    path = tmp_path / "store"
+    vectors = unit_vectors(50)
+    client = EmbeddedVectorClient(str(path), quantization=quantization)
+    collection = client.get_or_create_collection("docs")
+    collection.add(ids=[f"id{i}" for i in range(50)], embeddings=vectors)
+    codes = np.array(collection.codes.codes[:50]) if collection.codes is not None else None
+    client.close()
+
+    # Scale a row behind the store's back: a load that rescanned float32 would see a norm of 3
+    raw = np.memmap(path / "docs.f32", dtype=np.float32, mode="r+", shape=(50, DIM))
+    raw[7] *= 3
+    raw.flush()
+    del raw
+
+    reopened = EmbeddedVectorClient(str(path), quantization=quantization).get_collection("docs")
+    assert np.allclose(reopened.norms[:50], 1.0)
+    if codes is not None:
+        assert np.array_equal(reopened.codes.codes[:50], codes)
+    assert reopened.query(query_embeddings=[vectors[12]], n_results=1)["ids"] == [["id12"]]
+
+
+def test_codes_rebuilt_after_a_write_in_another_mode(tmp_path):
+    path = str(tmp_path / "store")
+    vectors = unit_vectors(60)
+    quantized = EmbeddedVectorClient(path, quantization="int8")
+    quantized.get_or_create_collection("docs").add(ids=[f"id{i}" for i in range(50)], embeddings=vectors[:50])
+    quantized.close()
+
+    plain = EmbeddedVectorClient(path, quantization="none")
+    plain.get_collection("docs").add(ids=[f"id{i}" for i in range(50, 60)], embeddings=vectors[50:])
+    plain.close()
+
+    reopened = EmbeddedVectorClient(path, quantization="int8").get_collection("docs")
+    assert reopened.query(query_embeddings=[vectors[55]], n_results=1)["ids"] == [["id55"]]
+    stamps = dict(reopened.client.db.execute("SELECT kind, version FROM derived_versions").fetchall())
+    assert stamps == {"norms": reopened.version, "int8": reopened.version}
+
+
+def test_delete_collection_removes_derived_files(tmp_path):
+    path = tmp_path / "store"
+    client = EmbeddedVectorClient(str(path), quantization="int8")
+    client.get_or_create_collection("docs").add(ids=["a"], embeddings=unit_vectors(1))
+    assert sorted(p.name for p in path.glob("docs.*")) == ["docs.f32", "docs.i8", "docs.i8scales", "docs.norms"]
+    client.delete_collection("docs")
+    assert list(path.glob("docs.*")) == []
+    client.close()
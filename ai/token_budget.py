@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Token Budgets
+Output caps per stage (num_predict), input caps on the message, agent outputs
+and contract code, the fixed num_ctx per model sized from them and the
+keep_alive setting; shared by the server and benchmark_final_stage.py so both
+run the same final stage
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Union
+
+import prompts
+from retrieval import estimate_tokens
+
+TEMPLATE_TOKENS = 200  # instructions and labels around the variable parts of a prompt
+
+
+@dataclass
+class TokenBudget:
+    agent_max_tokens: int = 384
+    judge_max_tokens: int = 512
+    persona_max_tokens: int = 512
+    contract_max_tokens: int = 1024
+    agent_summary_tokens: int = 1200
+    message_max_tokens: int = 512
+    contract_input_tokens: int = 2048
+
+    @classmethod
+    def from_env(cls) -> "TokenBudget":
+        return cls(
+            agent_max_tokens=int(os.getenv('AGENT_MAX_TOKENS', '384')),
+            judge_max_tokens=int(os.getenv('JUDGE_MAX_TOKENS', '512')),
+            persona_max_tokens=int(os.getenv('PERSONA_MAX_TOKENS', '512')),
+            contract_max_tokens=int(os.getenv('CONTRACT_ANALYSIS_MAX_TOKENS', '1024')),
+            agent_summary_tokens=int(os.getenv('AGENT_SUMMARY_TOKENS', '1200')),
+            message_max_tokens=int(os.getenv('MESSAGE_MAX_TOKENS', '512')),
+            contract_input_tokens=int(os.getenv('CONTRACT_ANALYSIS_INPUT_TOKENS', '2048'))
+        )
+
+    def judge_tokens(self) -> int:
+        """Worst-case judge prompt plus output"""
+        return (estimate_tokens(prompts.JUDGE_SYSTEM) + self.message_max_tokens + self.agent_summary_tokens
+                + self.judge_max_tokens + TEMPLATE_TOKENS)
+
+    def persona_tokens(self) -> int:
+        """Worst-case persona prompt plus output; its input is the judge output (two-stage)
+        or the message plus agent outputs (fused)"""
+        return (estimate_tokens(prompts.PERSONA_SYSTEM) + self.persona_max_tokens
+                + max(self.judge_max_tokens, self.message_max_tokens + self.agent_summary_tokens) + TEMPLATE_TOKENS)
+
+    def contract_tokens(self) -> int:
+        """Worst-case contract analysis prompt (code plus request) plus output"""
+        return (estimate_tokens(prompts.CONTRACT_SYSTEM) + self.contract_input_tokens + self.message_max_tokens
+                + self.contract_max_tokens + TEMPLATE_TOKENS)
+
+
+def context_window(tokens: int) -> int:
+    """num_ctx for a worst-case token count: rounded up to 1k and clamped to OLLAMA_MIN_CTX..OLLAMA_MAX_CTX,
+    or OLLAMA_NUM_CTX when set"""
+    fixed = os.getenv('OLLAMA_NUM_CTX')
+    if fixed:
+        return int(fixed)
+    min_ctx = int(os.getenv('OLLAMA_MIN_CTX', '2048'))
+    max_ctx = int(os.getenv('OLLAMA_MAX_CTX', '8192'))
+    return min(max(-(-tokens // 1024) * 1024, min_ctx), max_ctx)
+
+
+def ollama_keep_alive() -> Union[int, str]:
+    """OLLAMA_KEEP_ALIVE as Ollama takes it: a plain integer is seconds (-1 keeps the model loaded),
+    anything else a duration string ("30m")"""
+    value = os.getenv('OLLAMA_KEEP_ALIVE', '30m')
+    return int(value) if value.lstrip('-').isdigit() else value
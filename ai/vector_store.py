@@ -0,0 +1,795 @@
+#!/usr/bin/env python3
+"""
+Ms. Jarvis Vector Store
+Chroma-compatible collections backed by an embedded, persistent store:
+float32 vectors in memory-mapped files, ids/documents/metadata in SQLite,
+exact search over filtered candidates and an IVF index for large scans.
+Quantization (float16/int8 codes) cuts the RAM a scan touches, not the disk:
+the float32 file stays the source of truth and is read for rescoring
+"""
+
+import os
+import re
+import json
+import time
+import sqlite3
+import logging
+import threading
+import weakref
+from typing import Dict, List, Any, Optional, Tuple, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INCLUDE_DEFAULT_QUERY = ("documents", "metadatas", "distances")
+INCLUDE_DEFAULT_GET = ("documents", "metadatas")
+
+COMPARISON_OPS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS collections (
+    name TEXT PRIMARY KEY,
+    metadata TEXT,
+    dim INTEGER
+);
+CREATE TABLE IF NOT EXISTS records (
+    collection TEXT NOT NULL,
+    id TEXT NOT NULL,
+    slot INTEGER NOT NULL,
+    document TEXT,
+    metadata TEXT,
+    user_id TEXT,
+    PRIMARY KEY (collection, id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS records_slot ON records (collection, slot);
+CREATE INDEX IF NOT EXISTS records_user ON records (collection, user_id);
+CREATE TABLE IF NOT EXISTS collection_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS derived_versions (
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (name, kind)
+);
+"""
+
+# Files derived from {name}.f32, persisted so a load maps them instead of scanning every vector
+DERIVED_SUFFIXES = {"norms": (".norms",), "float16": (".f16",), "int8": (".i8", ".i8scales")}
+
+
+def _map_array(path: str, dtype, shape: Tuple[int, ...]) -> np.memmap:
+    """Memory-map path as an array of shape, growing the file (zero-filled) first if it is shorter"""
+    needed = int(np.prod(shape)) * np.dtype(dtype).itemsize
+    if not os.path.exists(path) or os.path.getsize(path) < needed:
+        with open(path, "ab") as f:
+            f.truncate(needed)
+    return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+
+def _where_sql(where: Dict[str, Any]) -> Tuple[str, List[Any]]:
+    """Translate a Chroma where filter into SQL over the records table"""
+    clauses, params = [], []
+    for key, condition in where.items():
+        if key in ("$and", "$or"):
+            parts = [_where_sql(sub) for sub in condition]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            for _, sub_params in parts:
+                params.extend(sub_params)
+            continue
+
+        # user_id has its own indexed column; everything else is read out of the metadata JSON
+        column = "user_id" if key == "user_id" else "json_extract(metadata, ?)"
+        path = [] if key == "user_id" else ['$."' + key.replace('"', '\\"') + '"']
+
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for op, value in condition.items():
+            if op in COMPARISON_OPS:
+                clauses.append(f"{column} {COMPARISON_OPS[op]} ?")
+                params.extend(path + [value])
+            elif op in ("$in", "$nin"):
+                values = list(value)
+                if not values:
+                    clauses.append("0" if op == "$in" else "1")
+                    continue
+                placeholders = ",".join("?" * len(values))
+                clauses.append(f"{column} {'IN' if op == '$in' else 'NOT IN'} ({placeholders})")
+                params.extend(path + values)
+            else:
+                raise ValueError(f"Unsupported where operator: {op}")
+    return ("(" + " AND ".join(clauses) + ")" if clauses else "1"), params
+
+
+class IVFIndex:
+    """Inverted-file index: spherical k-means centroids plus a centroid assignment per slot"""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        self.assignments = assignments
+
+    @classmethod
+    def train(cls, unit_vectors: np.ndarray, nlist: int, iterations: int = 10, seed: int = 0) -> "IVFIndex":
+        rng = np.random.default_rng(seed)
+        centroids = unit_vectors[rng.choice(len(unit_vectors), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(unit_vectors @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = unit_vectors[labels == cluster]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    if norm > 0:
+                        centroids[cluster] = centroid / norm
+        return cls(centroids.astype(np.float32), np.zeros(0, dtype=np.int32))
+
+    def assign(self, unit_vectors: np.ndarray, block: int = 16384) -> np.ndarray:
+        labels = np.empty(len(unit_vectors), dtype=np.int32)
+        for start in range(0, len(unit_vectors), block):
+            labels[start:start + block] = np.argmax(unit_vectors[start:start + block] @ self.centroids.T, axis=1)
+        return labels
+
+    def probe(self, unit_query: np.ndarray, nprobe: int) -> np.ndarray:
+        nprobe = min(nprobe, len(self.centroids))
+        nearest = np.argpartition(-(self.centroids @ unit_query), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self.assignments, nearest))
+
+
+class VectorCodes:
+    """Compact copy of the unit vectors - float16, or int8 with a per-vector scale - for candidate scoring.
+    Memory-mapped from files next to the float32 one, so a load maps them rather than re-encoding every row;
+    it adds to the disk footprint, and only the RAM a scan pages in shrinks"""
+
+    def __init__(self, mode: str, dim: int, path_prefix: str, capacity: int):
+        if mode not in ("float16", "int8"):
+            raise ValueError(f"Unknown quantization: {mode}")
+        self.mode = mode
+        self.dim = dim
+        self.paths = [path_prefix + suffix for suffix in DERIVED_SUFFIXES[mode]]
+        self.codes = np.zeros((0, dim), dtype=np.float16 if mode == "float16" else np.int8)
+        self.scales = np.zeros(0, dtype=np.float32) if mode == "int8" else None
+        self.resize(capacity)
+
+    def resize(self, capacity: int):
+        if capacity > len(self.codes):
+            self.flush()
+            self.codes = _map_array(self.paths[0], self.codes.dtype, (capacity, self.dim))
+            if self.scales is not None:
+                self.scales = _map_array(self.paths[1], np.float32, (capacity,))
+
+    def flush(self):
+        for array in (self.codes, self.scales):
+            if isinstance(array, np.memmap):
+                array.flush()
+
+    def encode(self, slots, unit_matrix: np.ndarray):
+        if self.mode == "float16":
+            self.codes[slots] = unit_matrix.astype(np.float16)
+            return
+        scales = np.abs(unit_matrix).max(axis=1) / 127.0
+        scales = np.where(scales > 0, scales, 1.0).astype(np.float32)
+        self.codes[slots] = np.clip(np.rint(unit_matrix / scales[:, np.newaxis]), -127, 127).astype(np.int8)
+        self.scales[slots] = scales
+
+    def clear(self, slots):
+        self.codes[slots] = 0
+        if self.scales is not None:
+            self.scales[slots] = 0.0
+
+    def scores(self, unit_query: np.ndarray, slots: np.ndarray, block: int = 32768) -> np.ndarray:
+        """Approximate cosine of the query against each slot, dequantizing one block at a time"""
+        query = unit_query.astype(np.float32)
+        out = np.empty(len(slots), dtype=np.float32)
+        for start in range(0, len(slots), block):
+            rows = slots[start:start + block]
+            out[start:start + block] = self.codes[rows].astype(np.float32) @ query
+        if self.scales is not None:
+            out *= self.scales[slots]
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+
+class EmbeddedCollection:
+    """One collection: a growable float32 memmap addressed by slot, with rows described in SQLite"""
+
+    def __init__(self, client: "EmbeddedVectorClient", name: str, metadata: Optional[Dict[str, Any]], dim: Optional[int]):
+        self.client = client
+        self.name = name
+        self.metadata = metadata or {}
+        self.dim = dim
+        self.vectors_path = os.path.join(client.path, f"{name}.f32")
+        self.norms_path = os.path.join(client.path, f"{name}.norms")
+        self.vectors: Optional[np.memmap] = None
+        self.capacity = 0
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.live = np.zeros(0, dtype=bool)
+        self.high_water = 0
+        self.free_slots: List[int] = []
+        self.ivf: Optional[IVFIndex] = None
+        self.ivf_trained_on = 0
+        self.ivf_building = False
+        self.ivf_dirty: List[int] = []
+        self.codes: Optional[VectorCodes] = None
+        self.generation = 0
+        self.version = 0
+        self.released = False
+        self._load()
+
+    # ---- storage -------------------------------------------------------------------------
+
+    def _load(self):
+        """(Re)build the in-RAM slot state from SQLite and map the vector, norm and code files"""
+        # Version first: a write landing mid-load leaves it stale, so the next refresh loads again
+        self.version = self.client.collection_version(self.name)
+        derived = dict(self.client.db.execute(
+            "SELECT kind, version FROM derived_versions WHERE name = ?", (self.name,)
+        ).fetchall())
+        if self.dim is None:
+            # Another process may have written the first vectors and fixed the dimension
+            row = self.client.db.execute("SELECT dim FROM collections WHERE name = ?", (self.name,)).fetchone()
+            self.dim = row[0] if row else None
+        rows = self.client.db.execute("SELECT slot FROM records WHERE collection = ?", (self.name,)).fetchall()
+        slots = np.array([row[0] for row in rows], dtype=np.int64)
+        self.high_water = int(slots.max()) + 1 if len(slots) else 0
+        self.vectors, self.capacity, self.codes = None, 0, None
+        self.norms = np.zeros(0, dtype=np.float32)
+        if self.dim is not None and os.path.exists(self.vectors_path):
+            self._open_vectors(max(self.high_water, os.path.getsize(self.vectors_path) // (4 * self.dim)))
+        self.live = np.zeros(self.capacity, dtype=bool)
+        self.live[slots] = True
+        # Norms and codes are current when stamped with this version; otherwise (an older store, or a writer
+        # running another quantization mode) rebuild the stale ones from the float32 file once and stamp them
+        stale = [kind for kind in self.derived_kinds() if derived.get(kind) != self.version]
+        if stale:
+            for start in range(0, len(slots), 65536):
+                block = np.sort(slots[start:start + 65536])
+                raw = np.asarray(self.vectors[block])
+                if "norms" in stale:
+                    self.norms[block] = np.linalg.norm(raw, axis=1)
+                if self.codes is not None and self.codes.mode in stale:
+                    self.codes.encode(block, self._unit(raw))
+            self._flush_derived()
+            self.client.db.executemany(
+                "INSERT INTO derived_versions (name, kind, version) VALUES (?, ?, ?) "
+                "ON CONFLICT(name, kind) DO UPDATE SET version = excluded.version",
+                [(self.name, kind, self.version) for kind in stale]
+            )
+        self.free_slots = sorted(set(range(self.high_water)) - set(slots.tolist()), reverse=True)
+        self.ivf, self.ivf_trained_on = None, 0
+        self.generation += 1
+
+    def derived_kinds(self) -> List[str]:
+        """The derived files this handle keeps in step with its writes"""
+        return ["norms"] + ([self.client.quantization] if self.client.quantization != "none" else [])
+
+    def _flush_derived(self):
+        if isinstance(self.norms, np.memmap):
+            self.norms.flush()
+        if self.codes is not None:
+            self.codes.flush()
+
+    def _close(self):
+        """Unmap the vector, norm and code files and drop the in-RAM state; the next call through a held
+        reference reloads"""
+        if self.vectors is not None:
+            self.vectors.flush()
+        self._flush_derived()
+        self.vectors, self.capacity, self.codes = None, 0, None
+        self.live = np.zeros(0, dtype=bool)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.free_slots = []
+        self.ivf, self.ivf_trained_on = None, 0
+        self.generation += 1  # an IVF build in flight is discarded
+        self.released = True
+
+    def _ensure_open(self):
+        """Reopen after release_collection; the client hands out this same object, so there is never a second
+        live handle for the name with its own slot state"""
+        if self.released:
+            self.released = False
+            self.client.released.pop(self.name, None)
+            self.client.collections[self.name] = self
+            self._load()
+
+    def _open_vectors(self, capacity: int):
+        capacity = max(capacity, 1)
+        needed = capacity * self.dim * 4
+        if not os.path.exists(self.vectors_path) or os.path.getsize(self.vectors_path) < needed:
+            with open(self.vectors_path, "ab") as f:
+                f.truncate(needed)
+        if self.vectors is not None:
+            self.vectors.flush()
+        self.vectors = np.memmap(self.vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        grow = capacity - len(self.live)
+        if grow > 0:
+            self.live = np.concatenate([self.live, np.zeros(grow, dtype=bool)])
+        if len(self.norms) < capacity:
+            self._flush_derived()
+            self.norms = _map_array(self.norms_path, np.float32, (capacity,))
+        if self.client.quantization != "none":
+            if self.codes is None:
+                prefix = os.path.join(self.client.path, self.name)
+                self.codes = VectorCodes(self.client.quantization, self.dim, prefix, capacity)
+            self.codes.resize(capacity)
+        self.capacity = capacity
+
+    def _allocate(self, count: int) -> List[int]:
+        """Slots for new records, checked against SQLite inside the write transaction: the in-RAM free list
+        and high-water mark are only hints, and a slot another writer took would be silently overwritten"""
+        slots: List[int] = []
+        while len(slots) < count and self.free_slots:
+            candidates = [self.free_slots.pop() for _ in range(min(count - len(slots), len(self.free_slots)))]
+            taken = {row[0] for row in self.client.db.execute(
+                f"SELECT slot FROM records WHERE collection = ? AND slot IN ({','.join('?' * len(candidates))})",
+                [self.name] + candidates
+            )}
+            slots.extend(slot for slot in candidates if slot not in taken)
+        top = self.client.db.execute("SELECT MAX(slot) FROM records WHERE collection = ?", (self.name,)).fetchone()[0]
+        self.high_water = max(self.high_water, top + 1 if top is not None else 0)
+        while len(slots) < count:
+            slots.append(self.high_water)
+            self.high_water += 1
+        if self.high_water > self.capacity:
+            self._open_vectors(max(self.high_water, self.capacity * 2))
+        return slots
+
+    def _release(self, slots: Sequence[int]):
+        for slot in slots:
+            self.live[slot] = False
+            self.norms[slot] = 0.0
+            self.free_slots.append(slot)
+        if self.codes is not None:
+            self.codes.clear(list(slots))
+
+    def _coerce_embeddings(self, embeddings) -> np.ndarray:
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[np.newaxis, :]
+        if self.dim is None:
+            self.dim = int(matrix.shape[1])
+            self.client.db.execute("UPDATE collections SET dim = ? WHERE name = ?", (self.dim, self.name))
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} does not match collection dimensionality {self.dim}")
+        return matrix
+
+    def _write(self, ids: List[str], embeddings, documents, metadatas, replace: bool):
+        if embeddings is None:
+            raise ValueError("The embedded vector store requires precomputed embeddings")
+        if len(set(ids)) != len(ids):
+            raise ValueError("Duplicate ids in a single write")
+        documents = documents if documents is not None else [None] * len(ids)
+        metadatas = metadatas if metadatas is not None else [None] * len(ids)
+
+        self._ensure_open()
+        with self.client.write_transaction(self):
+            matrix = self._coerce_embeddings(embeddings)
+            if len(matrix) != len(ids):
+                raise ValueError("ids and embeddings must have the same length")
+
+            existing = dict(self._select_slots(ids))
+            if not replace:
+                keep = [i for i, record_id in enumerate(ids) if record_id not in existing]
+                ids = [ids[i] for i in keep]
+                matrix, documents, metadatas = matrix[keep], [documents[i] for i in keep], [metadatas[i] for i in keep]
+                existing = {}
+            if not ids:
+                return
+
+            new_ids = [record_id for record_id in ids if record_id not in existing]
+            slots = dict(existing)
+            slots.update(zip(new_ids, self._allocate(len(new_ids))))
+            slot_list = [slots[record_id] for record_id in ids]
+
+            self.vectors[slot_list] = matrix
+            self.vectors.flush()
+            self.client.db.executemany(
+                "INSERT OR REPLACE INTO records (collection, id, slot, document, metadata, user_id) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (self.name, record_id, slot, document,
+                     json.dumps(metadata) if metadata is not None else None,
+                     str(metadata["user_id"]) if metadata and "user_id" in metadata else None)
+                    for record_id, slot, document, metadata in zip(ids, slot_list, documents, metadatas)
+                ]
+            )
+            self.live[slot_list] = True
+            self.norms[slot_list] = np.linalg.norm(matrix, axis=1)
+            if self.codes is not None:
+                self.codes.encode(slot_list, self._unit(matrix))
+            self._flush_derived()
+            self._index_written(slot_list, matrix)
+
+    def _select_slots(self, ids: Sequence[str]) -> List[Tuple[str, int]]:
+        rows = []
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            rows.extend(self.client.db.execute(
+                f"SELECT id, slot FROM records WHERE collection = ? AND id IN ({','.join('?' * len(batch))})",
+                [self.name] + batch
+            ).fetchall())
+        return rows
+
+    def _filtered_slots(self, where: Optional[Dict[str, Any]], ids: Optional[Sequence[str]] = None,
+                        limit: Optional[int] = None, offset: Optional[int] = None) -> List[int]:
+        if ids is not None and not ids:
+            return []
+        sql = "SELECT slot FROM records WHERE collection = ?"
+        params: List[Any] = [self.name]
+        if where:
+            where_sql, where_params = _where_sql(where)
+            sql += f" AND {where_sql}"
+            params.extend(where_params)
+        if ids is not None:
+            sql += f" AND id IN ({','.join('?' * len(ids))})"
+            params.extend(ids)
+        sql += " ORDER BY rowid"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset or 0])
+        return [row[0] for row in self.client.db.execute(sql, params).fetchall()]
+
+    def _rows(self, slots: Sequence[int]) -> Dict[int, Tuple[str, Optional[str], Optional[Dict[str, Any]]]]:
+        rows = {}
+        for start in range(0, len(slots), 500):
+            batch = [int(slot) for slot in slots[start:start + 500]]
+            for slot, record_id, document, metadata in self.client.db.execute(
+                f"SELECT slot, id, document, metadata FROM records WHERE collection = ? AND slot IN ({','.join('?' * len(batch))})",
+                [self.name] + batch
+            ):
+                rows[slot] = (record_id, document, json.loads(metadata) if metadata else None)
+        return rows
+
+    # ---- search --------------------------------------------------------------------------
+
+    def _index_written(self, slots: List[int], matrix: np.ndarray):
+        if self.ivf is not None:
+            if len(self.ivf.assignments) < self.capacity:
+                grown = np.full(self.capacity, -1, dtype=np.int32)
+                grown[:len(self.ivf.assignments)] = self.ivf.assignments
+                self.ivf.assignments = grown
+            self.ivf.assignments[slots] = self.ivf.assign(self._unit(matrix))
+        if self.ivf_building:
+            self.ivf_dirty.extend(slots)
+        live_count = int(self.live.sum())
+        if (live_count >= self.client.ivf_min_vectors and not self.ivf_building
+                and live_count >= 2 * max(self.ivf_trained_on, self.client.ivf_min_vectors // 2)):
+            self.ivf_building = True
+            threading.Thread(target=self._build_ivf, name=f"ivf-{self.name}", daemon=True).start()
+
+    def _build_ivf(self):
+        """Train and assign outside the lock, then swap in and catch up on rows written meanwhile"""
+        try:
+            with self.client.lock:
+                generation = self.generation
+                live_slots = np.flatnonzero(self.live[:self.high_water])
+                capacity = self.capacity
+                vectors = self.vectors
+            nlist = max(8, min(int(np.sqrt(len(live_slots))), 1024))
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(live_slots, size=min(len(live_slots), 64 * nlist), replace=False))
+            index = IVFIndex.train(self._unit(np.asarray(vectors[sample])), nlist)
+            assignments = np.full(capacity, -1, dtype=np.int32)
+            for start in range(0, len(live_slots), 65536):
+                block = live_slots[start:start + 65536]
+                assignments[block] = index.assign(self._unit(np.asarray(vectors[block])))
+            index.assignments = assignments
+
+            with self.client.lock:
+                if generation != self.generation:
+                    return  # reloaded from disk meanwhile; slots may have moved
+                if len(index.assignments) < self.capacity:
+                    grown = np.full(self.capacity, -1, dtype=np.int32)
+                    grown[:len(index.assignments)] = index.assignments
+                    index.assignments = grown
+                dirty = np.array(sorted(set(self.ivf_dirty)), dtype=np.int64)
+                if len(dirty):
+                    index.assignments[dirty] = index.assign(self._unit(np.asarray(self.vectors[dirty])))
+                self.ivf, self.ivf_trained_on = index, len(live_slots)
+            logger.info(f"✅ IVF index for {self.name}: {nlist} lists over {len(live_slots)} vectors")
+        except Exception as e:
+            logger.error(f"Error building IVF index for {self.name}: {e}")
+        finally:
+            self.ivf_building = False
+            self.ivf_dirty = []
+
+    @staticmethod
+    def _unit(matrix: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        return matrix / np.where(norms > 0, norms, 1.0)
+
+    def _candidates(self, query: np.ndarray, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Slots to score; None means every live slot"""
+        filtered = np.array(self._filtered_slots(where), dtype=np.int64) if where else None
+        if filtered is not None and len(filtered) <= self.client.exact_search_limit:
+            return filtered
+        live_count = len(filtered) if filtered is not None else int(self.live.sum())
+        if self.ivf is None or live_count <= self.client.exact_search_limit:
+            return filtered
+        probed = self.ivf.probe(query, self.client.ivf_nprobe)
+        return np.intersect1d(probed, filtered, assume_unique=True) if filtered is not None else probed
+
+    def _score(self, query: np.ndarray, slots: Optional[np.ndarray], k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Cosine similarity of the unit query against the candidate slots (every live slot when None).
+        With quantized codes, the codes pick a shortlist and only that is rescored from the raw vectors."""
+        if slots is None:
+            slots = np.flatnonzero(self.live[:self.high_water])
+        elif len(slots):
+            slots = np.unique(slots)
+            slots = slots[self.live[slots]]
+        if not len(slots):
+            return slots, np.zeros(0, dtype=np.float32)
+
+        shortlist = max(k * self.client.rescore_factor, 32)
+        if self.codes is not None and len(slots) > shortlist:
+            approximate = self.codes.scores(query, slots)
+            slots = np.sort(slots[np.argpartition(-approximate, shortlist - 1)[:shortlist]])
+            raw = np.asarray(self.vectors[slots])
+        elif len(slots) > self.high_water // 2:
+            raw = np.asarray(self.vectors[:self.high_water])[slots]  # one sequential read beats a gather
+        else:
+            raw = np.asarray(self.vectors[slots])
+
+        norms = self.norms[slots]
+        return slots, (raw @ query) / np.where(norms > 0, norms, 1.0)
+
+    # ---- Chroma collection API ------------------------------------------------------------
+
+    def count(self) -> int:
+        with self.client.lock:
+            self._ensure_open()
+            self.client.refresh()
+            return int(self.live.sum())
+
+    def add(self, ids, embeddings=None, metadatas=None, documents=None):
+        """Insert new records; ids that already exist are ignored, as in Chroma"""
+        with self.client.lock:
+            self._write(list(ids), embeddings, documents, metadatas, replace=False)
+
+    def upsert(self, ids, embeddings=None, metadatas=None, documents=None):
+        with self.client.lock:
+            self._write(list(ids), embeddings, documents, metadatas, replace=True)
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[Dict[str, Any]] = None,
+              include: Sequence[str] = INCLUDE_DEFAULT_QUERY) -> Dict[str, Any]:
+        """Nearest neighbours per query; distances are squared L2 between unit vectors (2 - 2*cos)"""
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        results: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": [], "embeddings": []}
+
+        with self.client.lock:
+            self._ensure_open()
+            self.client.refresh()
+            for query in queries:
+                if self.dim is None or self.vectors is None:
+                    top_slots, top_scores = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+                else:
+                    unit_query = self._unit(query)
+                    slots, scores = self._score(unit_query, self._candidates(unit_query, where), n_results)
+                    k = min(n_results, len(slots))
+                    if k:
+                        top = np.argpartition(-scores, k - 1)[:k]
+                        top = top[np.argsort(-scores[top])]
+                        top_slots, top_scores = slots[top], scores[top]
+                    else:
+                        top_slots, top_scores = slots[:0], scores[:0]
+
+                rows = self._rows(top_slots.tolist())
+                results["ids"].append([rows[slot][0] for slot in top_slots.tolist()])
+                results["documents"].append([rows[slot][1] for slot in top_slots.tolist()])
+                results["metadatas"].append([rows[slot][2] for slot in top_slots.tolist()])
+                results["distances"].append([max(0.0, float(2.0 - 2.0 * score)) for score in top_scores])
+                if "embeddings" in include:
+                    results["embeddings"].append(np.asarray(self.vectors[top_slots]).tolist() if len(top_slots) else [])
+
+        for key in ("documents", "metadatas", "distances", "embeddings"):
+            if key not in include:
+                results[key] = None
+        return results
+
+    def get(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include: Sequence[str] = INCLUDE_DEFAULT_GET) -> Dict[str, Any]:
+        with self.client.lock:
+            self._ensure_open()
+            self.client.refresh()
+            slots = self._filtered_slots(where, ids=list(ids) if ids is not None else None, limit=limit, offset=offset)
+            rows = self._rows(slots)
+            results = {
+                "ids": [rows[slot][0] for slot in slots],
+                "documents": [rows[slot][1] for slot in slots] if "documents" in include else None,
+                "metadatas": [rows[slot][2] for slot in slots] if "metadatas" in include else None,
+                "embeddings": None
+            }
+            if "embeddings" in include:
+                results["embeddings"] = np.asarray(self.vectors[slots]).tolist() if slots else []
+            return results
+
+    def delete(self, ids: Optional[Sequence[str]] = None, where: Optional[Dict[str, Any]] = None):
+        with self.client.lock:
+            self._ensure_open()
+            with self.client.write_transaction(self):
+                slots = self._filtered_slots(where, ids=list(ids) if ids is not None else None)
+                if not slots:
+                    return
+                for start in range(0, len(slots), 500):
+                    batch = slots[start:start + 500]
+                    self.client.db.execute(
+                        f"DELETE FROM records WHERE collection = ? AND slot IN ({','.join('?' * len(batch))})",
+                        [self.name] + batch
+                    )
+                self._release(slots)
+                self._flush_derived()
+                if self.ivf is not None:
+                    self.ivf.assignments[slots] = -1
+
+
+class EmbeddedVectorClient:
+    """In-process replacement for chromadb.HttpClient; safe to share across threads"""
+
+    def __init__(self, path: str, exact_search_limit: int = 20000, ivf_min_vectors: int = 50000, ivf_nprobe: int = 16,
+                 quantization: str = "none", rescore_factor: int = 4):
+        if quantization not in ("none", "float16", "int8"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.quantization = quantization
+        self.rescore_factor = rescore_factor
+        self.exact_search_limit = exact_search_limit
+        self.ivf_min_vectors = ivf_min_vectors
+        self.ivf_nprobe = ivf_nprobe
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(os.path.join(path, "catalog.sqlite3"), check_same_thread=False, isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.collections: Dict[str, EmbeddedCollection] = {}
+        # Released collections some caller still holds; reopening reuses them rather than building a twin
+        self.released: "weakref.WeakValueDictionary[str, EmbeddedCollection]" = weakref.WeakValueDictionary()
+        self.data_version = self._data_version()
+
+    def _data_version(self) -> int:
+        return self.db.execute("PRAGMA data_version").fetchone()[0]
+
+    def collection_version(self, name: str) -> int:
+        row = self.db.execute("SELECT version FROM collection_versions WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def refresh(self):
+        """Reload the collections another process (e.g. ingest_knowledge.py) has written to since our last look"""
+        version = self._data_version()
+        if version != self.data_version:
+            self.data_version = version
+            versions = dict(self.db.execute("SELECT name, version FROM collection_versions").fetchall())
+            for collection in self.collections.values():
+                if versions.get(collection.name, 0) != collection.version:
+                    collection._load()
+
+    def write_transaction(self, collection: EmbeddedCollection):
+        """Serialize a write against other processes and bump the collection's version on commit"""
+        client = self
+
+        class _Transaction:
+            def __enter__(self):
+                client.db.execute("BEGIN IMMEDIATE")
+                client.refresh()  # another writer may have moved slots since our last look
+                return self
+
+            def __exit__(self, exc_type, exc, tb):
+                if exc_type:
+                    client.db.execute("ROLLBACK")
+                else:
+                    previous = client.collection_version(collection.name)
+                    client.db.execute(
+                        "INSERT INTO collection_versions (name, version) VALUES (?, 1) "
+                        "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+                        (collection.name,)
+                    )
+                    # Derived files that were current stay current: this write updated them alongside the vectors
+                    kinds = collection.derived_kinds()
+                    client.db.execute(
+                        f"UPDATE derived_versions SET version = ? WHERE name = ? AND version = ? "
+                        f"AND kind IN ({','.join('?' * len(kinds))})",
+                        [previous + 1, collection.name, previous] + kinds
+                    )
+                    client.db.execute("COMMIT")
+                    collection.version = client.collection_version(collection.name)
+                client.data_version = client._data_version()
+                return False
+
+        return _Transaction()
+
+    def heartbeat(self) -> int:
+        with self.lock:
+            self.db.execute("SELECT 1").fetchone()
+        return time.time_ns()
+
+    def get_or_create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> EmbeddedCollection:
+        if not re.fullmatch(r"[A-Za-z0-9][A-Za-z0-9._-]{1,62}[A-Za-z0-9]", name):
+            raise ValueError(f"Invalid collection name: {name}")
+        with self.lock:
+            if name in self.collections:
+                return self.collections[name]
+            released = self.released.get(name)
+            if released is not None:
+                released._ensure_open()
+                return released
+            row = self.db.execute("SELECT metadata, dim FROM collections WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                self.db.execute("INSERT INTO collections (name, metadata, dim) VALUES (?, ?, NULL)",
+                                (name, json.dumps(metadata or {})))
+                row = (json.dumps(metadata or {}), None)
+            collection = EmbeddedCollection(self, name, json.loads(row[0]) if row[0] else {}, row[1])
+            self.collections[name] = collection
+            return collection
+
+    def create_collection(self, name: str, metadata: Optional[Dict[str, Any]] = None) -> EmbeddedCollection:
+        with self.lock:
+            if self.db.execute("SELECT 1 FROM collections WHERE name = ?", (name,)).fetchone():
+                raise ValueError(f"Collection {name} already exists")
+            return self.get_or_create_collection(name, metadata)
+
+    def get_collection(self, name: str) -> EmbeddedCollection:
+        with self.lock:
+            if not self.db.execute("SELECT 1 FROM collections WHERE name = ?", (name,)).fetchone():
+                raise ValueError(f"Collection {name} does not exist")
+            return self.get_or_create_collection(name)
+
+    def list_collections(self) -> List[EmbeddedCollection]:
+        with self.lock:
+            return [self.get_or_create_collection(row[0]) for row in self.db.execute("SELECT name FROM collections").fetchall()]
+
+    def delete_collection(self, name: str):
+        with self.lock:
+            self.db.execute("DELETE FROM records WHERE collection = ?", (name,))
+            self.db.execute("DELETE FROM collections WHERE name = ?", (name,))
+            self.db.execute("DELETE FROM collection_versions WHERE name = ?", (name,))
+            self.db.execute("DELETE FROM derived_versions WHERE name = ?", (name,))
+            collection = self.collections.pop(name, None) or self.released.pop(name, None)
+            if collection is not None and collection.vectors is not None:
+                collection.vectors.flush()
+                collection.vectors, collection.codes = None, None
+                collection.norms = np.zeros(0, dtype=np.float32)
+            suffixes = [".f32"] + [suffix for kind in DERIVED_SUFFIXES.values() for suffix in kind]
+            for suffix in suffixes:
+                path = os.path.join(self.path, name + suffix)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def release_collection(self, name: str):
+        """Evict an idle collection from the cache and unmap its vector file"""
+        with self.lock:
+            collection = self.collections.pop(name, None)
+            if collection is not None:
+                collection._close()
+                self.released[name] = collection
+
+    def close(self):
+        with self.lock:
+            for collection in self.collections.values():
+                if collection.vectors is not None:
+                    collection.vectors.flush()
+                collection._flush_derived()
+            self.db.close()
+
+
+def create_vector_client(backend: str, path: Optional[str] = None, host: str = "vector-db", port: int = 8000):
+    """VECTOR_BACKEND=chroma talks to the vector-db service; embedded keeps everything in-process under path"""
+    if backend == "embedded":
+        return EmbeddedVectorClient(
+            path or "vector_store",
+            exact_search_limit=int(os.getenv('VECTOR_STORE_EXACT_LIMIT', '20000')),
+            ivf_min_vectors=int(os.getenv('VECTOR_STORE_IVF_MIN_VECTORS', '50000')),
+            ivf_nprobe=int(os.getenv('VECTOR_STORE_IVF_NPROBE', '16')),
+            quantization=os.getenv('VECTOR_STORE_QUANTIZATION', 'none'),
+            rescore_factor=int(os.getenv('VECTOR_STORE_RESCORE_FACTOR', '4'))
+        )
+    if backend == "chroma":
+        import chromadb  # deferred: heavy import
+        return chromadb.HttpClient(host=host, port=port)
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")